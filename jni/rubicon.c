@@ -1,6 +1,9 @@
 #define __STDC_FORMAT_MACROS
 #include <inttypes.h>
+#include <pthread.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
 
 #include <jni.h>
 #ifdef LIBPYTHON_RTLD_GLOBAL
@@ -125,706 +128,2089 @@ PyInit_android(void)
  **************************************************************************
  *************************************************************************/
 
-// The JNIEnv associated with the Python runtime
-JNIEnv *java = NULL;
+// The Java VM hosting the Python runtime
+static JavaVM *java_vm = NULL;
+
+// The JNIEnv for the current thread. A JNIEnv can only be used on the
+// thread where it was obtained, so it is kept in thread-local storage.
+static __thread JNIEnv *thread_env = NULL;
+
+// Threads that are attached to the Java VM by Rubicon are detached when
+// they exit, using the destructor associated with this key.
+static pthread_key_t detach_key;
+static pthread_once_t detach_key_once = PTHREAD_ONCE_INIT;
+
+// The class loader that loaded Rubicon. Threads attached by Rubicon use
+// the system class loader, which may not be able to find app classes.
+static jobject class_loader = NULL;
+static jmethodID class_loader__loadClass = NULL;
+
+static void detach_current_thread(void *value) {
+    JavaVM *vm = (JavaVM *) value;
+    LOG_D("Detaching thread from Java VM...");
+    (*vm)->DetachCurrentThread(vm);
+}
+
+static void create_detach_key(void) {
+    pthread_key_create(&detach_key, detach_current_thread);
+}
+
+/**************************************************************************
+ * Return the JNIEnv for the current thread.
+ *
+ * If the current thread isn't attached to the Java VM, it is attached
+ * (as a daemon, so it doesn't prevent the VM from shutting down), and
+ * will be detached when the thread exits.
+ *************************************************************************/
+static JNIEnv *java_env(void) {
+    JNIEnv *env = thread_env;
+    jint result;
+
+    if (env != NULL) {
+        return env;
+    }
+    if (java_vm == NULL) {
+        LOG_E("Python runtime doesn't appear to be running");
+        return NULL;
+    }
+
+    result = (*java_vm)->GetEnv(java_vm, (void **) &env, JNI_VERSION_1_6);
+    if (result == JNI_EDETACHED) {
+        LOG_D("Attaching thread to Java VM...");
+#ifdef __ANDROID__
+        result = (*java_vm)->AttachCurrentThreadAsDaemon(java_vm, &env, NULL);
+#else
+        result = (*java_vm)->AttachCurrentThreadAsDaemon(java_vm, (void **) &env, NULL);
+#endif
+        if (result != JNI_OK) {
+            LOG_E("Unable to attach thread to Java VM");
+            return NULL;
+        }
+        pthread_once(&detach_key_once, create_detach_key);
+        pthread_setspecific(detach_key, java_vm);
+    } else if (result != JNI_OK) {
+        LOG_E("Unable to get JNIEnv for thread");
+        return NULL;
+    }
+
+    thread_env = env;
+    return env;
+}
+
+/**************************************************************************
+ * Find a class using the class loader that loaded Rubicon.
+ *
+ * The name is in the format used by FindClass (e.g., java/lang/String).
+ * If the class can't be found, the exception raised by the class loader
+ * is left pending, and NULL is returned.
+ *************************************************************************/
+static jclass find_class_with_loader(JNIEnv *env, const char *name) {
+    char *binary_name;
+    char *c;
+    jstring jname;
+    jclass cls;
+
+    binary_name = strdup(name);
+    if (binary_name == NULL) {
+        return NULL;
+    }
+    for (c = binary_name; *c; c++) {
+        if (*c == '/') {
+            *c = '.';
+        }
+    }
+    jname = (*env)->NewStringUTF(env, binary_name);
+    free(binary_name);
+    if (jname == NULL) {
+        return NULL;
+    }
+    cls = (jclass) (*env)->CallObjectMethod(env, class_loader, class_loader__loadClass, jname);
+    (*env)->DeleteLocalRef(env, jname);
+    if ((*env)->ExceptionCheck(env)) {
+        return NULL;
+    }
+    return cls;
+}
 
 // The Python method dispatch handler
 static PyObject *method_handler = NULL;
 
 /**************************************************************************
- * Wrappers around JNI methods, bound to the JNIEnv associated with the
- * Python runtime.
+ * Wrappers around JNI methods, bound to the JNIEnv for the calling thread.
  *
  * These methods should not be invoked until the Python runtime
  * has been started.
  *************************************************************************/
 jint GetVersion() {
-    return (*java)->GetVersion(java);
+    JNIEnv *env = java_env();
+    return (*env)->GetVersion(env);
 }
 jclass DefineClass(const char *name, jobject loader, const jbyte *buf, jsize len) {
-    return (*java)->DefineClass(java, name, loader, buf, len);
+    JNIEnv *env = java_env();
+    return (*env)->DefineClass(env, name, loader, buf, len);
 }
 jclass FindClass(const char *name) {
-    return (*java)->FindClass(java, name);
+    JNIEnv *env = java_env();
+    jclass cls = (*env)->FindClass(env, name);
+    if (cls == NULL && class_loader != NULL) {
+        (*env)->ExceptionClear(env);
+        cls = find_class_with_loader(env, name);
+    }
+    return cls;
 }
 jmethodID FromReflectedMethod(jobject method) {
-    return (*java)->FromReflectedMethod(java, method);
+    JNIEnv *env = java_env();
+    return (*env)->FromReflectedMethod(env, method);
 }
 jfieldID FromReflectedField(jobject field) {
-    return (*java)->FromReflectedField(java, field);
+    JNIEnv *env = java_env();
+    return (*env)->FromReflectedField(env, field);
 }
 
 jobject ToReflectedMethod(jclass cls, jmethodID methodID, jboolean isStatic) {
-    return (*java)->ToReflectedMethod(java, cls, methodID, isStatic);
+    JNIEnv *env = java_env();
+    return (*env)->ToReflectedMethod(env, cls, methodID, isStatic);
 }
 
 jclass GetSuperclass(jclass sub) {
-    return (*java)->GetSuperclass(java, sub);
+    JNIEnv *env = java_env();
+    return (*env)->GetSuperclass(env, sub);
 }
 jboolean IsAssignableFrom(jclass sub, jclass sup) {
-    return (*java)->IsAssignableFrom(java, sub, sup);
+    JNIEnv *env = java_env();
+    return (*env)->IsAssignableFrom(env, sub, sup);
 }
 
 jobject ToReflectedField(jclass cls, jfieldID fieldID, jboolean isStatic) {
-    return (*java)->ToReflectedField(java, cls, fieldID, isStatic);
+    JNIEnv *env = java_env();
+    return (*env)->ToReflectedField(env, cls, fieldID, isStatic);
 }
 
 jint Throw(jthrowable obj) {
-    return (*java)->Throw(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->Throw(env, obj);
 }
 jint ThrowNew(jclass cls, const char *msg) {
-    return (*java)->ThrowNew(java, cls, msg);
+    JNIEnv *env = java_env();
+    return (*env)->ThrowNew(env, cls, msg);
 }
 jthrowable ExceptionOccurred() {
-    return (*java)->ExceptionOccurred(java);
+    JNIEnv *env = java_env();
+    return (*env)->ExceptionOccurred(env);
 }
 void ExceptionDescribe() {
-    (*java)->ExceptionDescribe(java);
+    JNIEnv *env = java_env();
+    (*env)->ExceptionDescribe(env);
 }
 void ExceptionClear() {
-    (*java)->ExceptionClear(java);
+    JNIEnv *env = java_env();
+    (*env)->ExceptionClear(env);
 }
 void FatalError(const char *msg) {
-    (*java)->FatalError(java, msg);
+    JNIEnv *env = java_env();
+    (*env)->FatalError(env, msg);
 }
 
 jint PushLocalFrame(jint capacity) {
-    return (*java)->PushLocalFrame(java, capacity);
+    JNIEnv *env = java_env();
+    return (*env)->PushLocalFrame(env, capacity);
 }
 jobject PopLocalFrame(jobject result) {
-    return (*java)->PopLocalFrame(java, result);
+    JNIEnv *env = java_env();
+    return (*env)->PopLocalFrame(env, result);
 }
 
 jobject NewGlobalRef(jobject lobj) {
-    return (*java)->NewGlobalRef(java, lobj);
+    JNIEnv *env = java_env();
+    return (*env)->NewGlobalRef(env, lobj);
 }
 void DeleteGlobalRef(jobject gref) {
-    (*java)->DeleteGlobalRef(java, gref);
+    JNIEnv *env = java_env();
+    (*env)->DeleteGlobalRef(env, gref);
+}
+// Delete a batch of global references with a single call.
+void DeleteGlobalRefs(jobject *grefs, jsize count) {
+    JNIEnv *env = java_env();
+    jsize i;
+    for (i = 0; i < count; i++) {
+        (*env)->DeleteGlobalRef(env, grefs[i]);
+    }
 }
 void DeleteLocalRef(jobject obj) {
-    (*java)->DeleteLocalRef(java, obj);
+    JNIEnv *env = java_env();
+    (*env)->DeleteLocalRef(env, obj);
 }
 
 jboolean IsSameObject(jobject obj1, jobject obj2) {
-    return (*java)->IsSameObject(java, obj1, obj2);
+    JNIEnv *env = java_env();
+    return (*env)->IsSameObject(env, obj1, obj2);
 }
 
 jobject NewLocalRef(jobject ref) {
-    return (*java)->NewLocalRef(java, ref);
+    JNIEnv *env = java_env();
+    return (*env)->NewLocalRef(env, ref);
 }
 jint EnsureLocalCapacity(jint capacity) {
-    return (*java)->EnsureLocalCapacity(java, capacity);
+    JNIEnv *env = java_env();
+    return (*env)->EnsureLocalCapacity(env, capacity);
 }
 
 jobject AllocObject(jclass cls) {
-    return (*java)->AllocObject(java, cls);
+    JNIEnv *env = java_env();
+    return (*env)->AllocObject(env, cls);
 }
 jobject NewObject(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jobject result;
     va_start(args, methodID);
-    result = (*java)->NewObjectV(java, cls, methodID, args);
+    result = (*env)->NewObjectV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
+jobject NewObjectA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->NewObjectA(env, cls, methodID, args);
+}
 
 jclass GetObjectClass(jobject obj) {
-    return (*java)->GetObjectClass(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->GetObjectClass(env, obj);
 }
 jboolean IsInstanceOf(jobject obj, jclass cls) {
-    return (*java)->IsInstanceOf(java, obj, cls);
+    JNIEnv *env = java_env();
+    return (*env)->IsInstanceOf(env, obj, cls);
 }
 
 jmethodID GetMethodID(jclass cls, const char *name, const char *sig) {
-    return (*java)->GetMethodID(java, cls, name, sig);
+    JNIEnv *env = java_env();
+    return (*env)->GetMethodID(env, cls, name, sig);
 }
 
 jobject CallObjectMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jobject result;
     va_start(args, methodID);
-    result = (*java)->CallObjectMethodV(java, obj, methodID, args);
+    result = (*env)->CallObjectMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jboolean CallBooleanMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jboolean result;
     va_start(args, methodID);
-    result = (*java)->CallBooleanMethodV(java, obj, methodID, args);
+    result = (*env)->CallBooleanMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jbyte CallByteMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jbyte result;
     va_start(args, methodID);
-    result = (*java)->CallByteMethodV(java, obj, methodID, args);
+    result = (*env)->CallByteMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jchar CallCharMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jchar result;
     va_start(args, methodID);
-    result = (*java)->CallCharMethodV(java, obj, methodID, args);
+    result = (*env)->CallCharMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jshort CallShortMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jshort result;
     va_start(args, methodID);
-    result = (*java)->CallShortMethodV(java, obj, methodID, args);
+    result = (*env)->CallShortMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jint CallIntMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jint result;
     va_start(args, methodID);
-    result = (*java)->CallIntMethodV(java, obj, methodID, args);
+    result = (*env)->CallIntMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jlong CallLongMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jlong result;
     va_start(args, methodID);
-    result = (*java)->CallLongMethodV(java, obj, methodID, args);
+    result = (*env)->CallLongMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jfloat CallFloatMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jfloat result;
     va_start(args, methodID);
-    result = (*java)->CallFloatMethodV(java, obj, methodID, args);
+    result = (*env)->CallFloatMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 jdouble CallDoubleMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jdouble result;
     va_start(args, methodID);
-    result = (*java)->CallDoubleMethodV(java, obj, methodID, args);
+    result = (*env)->CallDoubleMethodV(env, obj, methodID, args);
     va_end(args);
     return result;
 }
 void CallVoidMethod(jobject obj, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     va_start(args, methodID);
-    (*java)->CallVoidMethodV(java, obj, methodID, args);
+    (*env)->CallVoidMethodV(env, obj, methodID, args);
     va_end(args);
 }
 
+jobject CallObjectMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallObjectMethodA(env, obj, methodID, args);
+}
+jboolean CallBooleanMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallBooleanMethodA(env, obj, methodID, args);
+}
+jbyte CallByteMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallByteMethodA(env, obj, methodID, args);
+}
+jchar CallCharMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallCharMethodA(env, obj, methodID, args);
+}
+jshort CallShortMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallShortMethodA(env, obj, methodID, args);
+}
+jint CallIntMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallIntMethodA(env, obj, methodID, args);
+}
+jlong CallLongMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallLongMethodA(env, obj, methodID, args);
+}
+jfloat CallFloatMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallFloatMethodA(env, obj, methodID, args);
+}
+jdouble CallDoubleMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallDoubleMethodA(env, obj, methodID, args);
+}
+void CallVoidMethodA(jobject obj, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    (*env)->CallVoidMethodA(env, obj, methodID, args);
+}
+
 jobject CallNonvirtualObjectMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jobject result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualObjectMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualObjectMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jboolean CallNonvirtualBooleanMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jboolean result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualBooleanMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualBooleanMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jbyte CallNonvirtualByteMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jbyte result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualByteMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualByteMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jchar CallNonvirtualCharMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jchar result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualCharMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualCharMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jshort CallNonvirtualShortMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jshort result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualShortMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualShortMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jint CallNonvirtualIntMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jint result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualIntMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualIntMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jlong CallNonvirtualLongMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jlong result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualLongMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualLongMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jfloat CallNonvirtualFloatMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jfloat result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualFloatMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualFloatMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 jdouble CallNonvirtualDoubleMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jdouble result;
     va_start(args, methodID);
-    result = (*java)->CallNonvirtualDoubleMethodV(java, obj, cls, methodID, args);
+    result = (*env)->CallNonvirtualDoubleMethodV(env, obj, cls, methodID, args);
     va_end(args);
     return result;
 }
 void CallNonvirtualVoidMethod(jobject obj, jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     va_start(args, methodID);
-    (*java)->CallNonvirtualVoidMethodV(java, obj, cls, methodID, args);
+    (*env)->CallNonvirtualVoidMethodV(env, obj, cls, methodID, args);
     va_end(args);
 }
 
 jfieldID GetFieldID(jclass cls, const char *name, const char *sig) {
-    return (*java)->GetFieldID(java, cls, name, sig);
+    JNIEnv *env = java_env();
+    return (*env)->GetFieldID(env, cls, name, sig);
 }
 
 jobject GetObjectField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetObjectField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetObjectField(env, obj, fieldID);
 }
 jboolean GetBooleanField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetBooleanField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetBooleanField(env, obj, fieldID);
 }
 jbyte GetByteField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetByteField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetByteField(env, obj, fieldID);
 }
 jchar GetCharField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetCharField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetCharField(env, obj, fieldID);
 }
 jshort GetShortField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetShortField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetShortField(env, obj, fieldID);
 }
 jint GetIntField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetIntField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetIntField(env, obj, fieldID);
 }
 jlong GetLongField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetLongField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetLongField(env, obj, fieldID);
 }
 jfloat GetFloatField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetFloatField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetFloatField(env, obj, fieldID);
 }
 jdouble GetDoubleField(jobject obj, jfieldID fieldID) {
-    return (*java)->GetDoubleField(java, obj, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetDoubleField(env, obj, fieldID);
 }
 
 void SetObjectField(jobject obj, jfieldID fieldID, jobject val) {
-    (*java)->SetObjectField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetObjectField(env, obj, fieldID, val);
 }
 void SetBooleanField(jobject obj, jfieldID fieldID, jboolean val) {
-    (*java)->SetBooleanField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetBooleanField(env, obj, fieldID, val);
 }
 void SetByteField(jobject obj, jfieldID fieldID, jbyte val) {
-    (*java)->SetByteField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetByteField(env, obj, fieldID, val);
 }
 void SetCharField(jobject obj, jfieldID fieldID, jchar val) {
-    (*java)->SetCharField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetCharField(env, obj, fieldID, val);
 }
 void SetShortField(jobject obj, jfieldID fieldID, jshort val) {
-    (*java)->SetShortField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetShortField(env, obj, fieldID, val);
 }
 void SetIntField(jobject obj, jfieldID fieldID, jint val) {
-    (*java)->SetIntField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetIntField(env, obj, fieldID, val);
 }
 void SetLongField(jobject obj, jfieldID fieldID, jlong val) {
-    (*java)->SetLongField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetLongField(env, obj, fieldID, val);
 }
 void SetFloatField(jobject obj, jfieldID fieldID, jfloat val) {
-    (*java)->SetFloatField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetFloatField(env, obj, fieldID, val);
 }
 void SetDoubleField(jobject obj, jfieldID fieldID, jdouble val) {
-    (*java)->SetDoubleField(java, obj, fieldID, val);
+    JNIEnv *env = java_env();
+    (*env)->SetDoubleField(env, obj, fieldID, val);
 }
 
 jmethodID GetStaticMethodID(jclass cls, const char *name, const char *sig) {
-    return (*java)->GetStaticMethodID(java, cls, name, sig);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticMethodID(env, cls, name, sig);
 }
 
 jobject CallStaticObjectMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jobject result;
     va_start(args, methodID);
-    result = (*java)->CallStaticObjectMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticObjectMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jboolean CallStaticBooleanMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jboolean result;
     va_start(args, methodID);
-    result = (*java)->CallStaticBooleanMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticBooleanMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jbyte CallStaticByteMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jbyte result;
     va_start(args, methodID);
-    result = (*java)->CallStaticByteMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticByteMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jchar CallStaticCharMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jchar result;
     va_start(args, methodID);
-    result = (*java)->CallStaticCharMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticCharMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jshort CallStaticShortMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jshort result;
     va_start(args, methodID);
-    result = (*java)->CallStaticShortMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticShortMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jint CallStaticIntMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jint result;
     va_start(args, methodID);
-    result = (*java)->CallStaticIntMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticIntMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jlong CallStaticLongMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jlong result;
     va_start(args, methodID);
-    result = (*java)->CallStaticLongMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticLongMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jfloat CallStaticFloatMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jfloat result;
     va_start(args, methodID);
-    result = (*java)->CallStaticFloatMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticFloatMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 jdouble CallStaticDoubleMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     jdouble result;
     va_start(args, methodID);
-    result = (*java)->CallStaticDoubleMethodV(java, cls, methodID, args);
+    result = (*env)->CallStaticDoubleMethodV(env, cls, methodID, args);
     va_end(args);
     return result;
 }
 void CallStaticVoidMethod(jclass cls, jmethodID methodID, ...) {
+    JNIEnv *env = java_env();
     va_list args;
     va_start(args, methodID);
-    (*java)->CallStaticVoidMethodV(java, cls, methodID, args);
+    (*env)->CallStaticVoidMethodV(env, cls, methodID, args);
     va_end(args);
 }
 
+jobject CallStaticObjectMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticObjectMethodA(env, cls, methodID, args);
+}
+jboolean CallStaticBooleanMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticBooleanMethodA(env, cls, methodID, args);
+}
+jbyte CallStaticByteMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticByteMethodA(env, cls, methodID, args);
+}
+jchar CallStaticCharMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticCharMethodA(env, cls, methodID, args);
+}
+jshort CallStaticShortMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticShortMethodA(env, cls, methodID, args);
+}
+jint CallStaticIntMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticIntMethodA(env, cls, methodID, args);
+}
+jlong CallStaticLongMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticLongMethodA(env, cls, methodID, args);
+}
+jfloat CallStaticFloatMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticFloatMethodA(env, cls, methodID, args);
+}
+jdouble CallStaticDoubleMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    return (*env)->CallStaticDoubleMethodA(env, cls, methodID, args);
+}
+void CallStaticVoidMethodA(jclass cls, jmethodID methodID, const jvalue *args) {
+    JNIEnv *env = java_env();
+    (*env)->CallStaticVoidMethodA(env, cls, methodID, args);
+}
+
 jfieldID GetStaticFieldID(jclass cls, const char *name, const char *sig) {
-    return (*java)->GetStaticFieldID(java, cls, name, sig);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticFieldID(env, cls, name, sig);
 }
 jobject GetStaticObjectField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticObjectField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticObjectField(env, cls, fieldID);
 }
 jboolean GetStaticBooleanField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticBooleanField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticBooleanField(env, cls, fieldID);
 }
 jbyte GetStaticByteField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticByteField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticByteField(env, cls, fieldID);
 }
 jchar GetStaticCharField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticCharField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticCharField(env, cls, fieldID);
 }
 jshort GetStaticShortField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticShortField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticShortField(env, cls, fieldID);
 }
 jint GetStaticIntField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticIntField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticIntField(env, cls, fieldID);
 }
 jlong GetStaticLongField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticLongField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticLongField(env, cls, fieldID);
 }
 jfloat GetStaticFloatField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticFloatField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticFloatField(env, cls, fieldID);
 }
 jdouble GetStaticDoubleField(jclass cls, jfieldID fieldID) {
-    return (*java)->GetStaticDoubleField(java, cls, fieldID);
+    JNIEnv *env = java_env();
+    return (*env)->GetStaticDoubleField(env, cls, fieldID);
 }
 
 void SetStaticObjectField(jclass cls, jfieldID fieldID, jobject value) {
-    (*java)->SetStaticObjectField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticObjectField(env, cls, fieldID, value);
 }
 void SetStaticBooleanField(jclass cls, jfieldID fieldID, jboolean value) {
-    (*java)->SetStaticBooleanField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticBooleanField(env, cls, fieldID, value);
 }
 void SetStaticByteField(jclass cls, jfieldID fieldID, jbyte value) {
-    (*java)->SetStaticByteField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticByteField(env, cls, fieldID, value);
 }
 void SetStaticCharField(jclass cls, jfieldID fieldID, jchar value) {
-    (*java)->SetStaticCharField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticCharField(env, cls, fieldID, value);
 }
 void SetStaticShortField(jclass cls, jfieldID fieldID, jshort value) {
-    (*java)->SetStaticShortField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticShortField(env, cls, fieldID, value);
 }
 void SetStaticIntField(jclass cls, jfieldID fieldID, jint value) {
-    (*java)->SetStaticIntField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticIntField(env, cls, fieldID, value);
 }
 void SetStaticLongField(jclass cls, jfieldID fieldID, jlong value) {
-    (*java)->SetStaticLongField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticLongField(env, cls, fieldID, value);
 }
 void SetStaticFloatField(jclass cls, jfieldID fieldID, jfloat value) {
-    (*java)->SetStaticFloatField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticFloatField(env, cls, fieldID, value);
 }
 void SetStaticDoubleField(jclass cls, jfieldID fieldID, jdouble value) {
-    (*java)->SetStaticDoubleField(java, cls, fieldID, value);
+    JNIEnv *env = java_env();
+    (*env)->SetStaticDoubleField(env, cls, fieldID, value);
 }
 
 jstring NewString(const jchar *unicode, jsize len) {
-    return (*java)->NewString(java, unicode, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewString(env, unicode, len);
 }
 jsize GetStringLength(jstring str) {
-    return (*java)->GetStringLength(java, str);
+    JNIEnv *env = java_env();
+    return (*env)->GetStringLength(env, str);
 }
 const jchar *GetStringChars(jstring str, jboolean *isCopy) {
-    return (*java)->GetStringChars(java, str, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetStringChars(env, str, isCopy);
 }
 void ReleaseStringChars(jstring str, const jchar *chars) {
-    (*java)->ReleaseStringChars(java, str, chars);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseStringChars(env, str, chars);
 }
 
 jstring NewStringUTF(const char *utf) {
-    return (*java)->NewStringUTF(java, utf);
+    JNIEnv *env = java_env();
+    return (*env)->NewStringUTF(env, utf);
 }
 jsize GetStringUTFLength(jstring str) {
-    return (*java)->GetStringUTFLength(java, str);
+    JNIEnv *env = java_env();
+    return (*env)->GetStringUTFLength(env, str);
 }
 const char *GetStringUTFChars(jstring str, jboolean *isCopy) {
-    return (*java)->GetStringUTFChars(java, str, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetStringUTFChars(env, str, isCopy);
 }
 void ReleaseStringUTFChars(jstring str, const char *chars) {
-    (*java)->ReleaseStringUTFChars(java, str, chars);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseStringUTFChars(env, str, chars);
 }
 
 jsize GetArrayLength(jarray array) {
-    return (*java)->GetArrayLength(java, array);
+    JNIEnv *env = java_env();
+    return (*env)->GetArrayLength(env, array);
 }
 
 jobjectArray NewObjectArray(jsize len, jclass cls, jobject init) {
-    return (*java)->NewObjectArray(java, len, cls, init);
+    JNIEnv *env = java_env();
+    return (*env)->NewObjectArray(env, len, cls, init);
 }
 jobject GetObjectArrayElement(jobjectArray array, jsize index) {
-    return (*java)->GetObjectArrayElement(java, array, index);
+    JNIEnv *env = java_env();
+    return (*env)->GetObjectArrayElement(env, array, index);
 }
 void SetObjectArrayElement(jobjectArray array, jsize index, jobject val) {
-    (*java)->SetObjectArrayElement(java, array, index, val);
+    JNIEnv *env = java_env();
+    (*env)->SetObjectArrayElement(env, array, index, val);
 }
 
 jbooleanArray NewBooleanArray(jsize len) {
-    return (*java)->NewBooleanArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewBooleanArray(env, len);
 }
 jbyteArray NewByteArray(jsize len) {
-    return (*java)->NewByteArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewByteArray(env, len);
 }
 jcharArray NewCharArray(jsize len) {
-    return (*java)->NewCharArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewCharArray(env, len);
 }
 jshortArray NewShortArray(jsize len) {
-    return (*java)->NewShortArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewShortArray(env, len);
 }
 jintArray NewIntArray(jsize len) {
-    return (*java)->NewIntArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewIntArray(env, len);
 }
 jlongArray NewLongArray(jsize len) {
-    return (*java)->NewLongArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewLongArray(env, len);
 }
 jfloatArray NewFloatArray(jsize len) {
-    return (*java)->NewFloatArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewFloatArray(env, len);
 }
 jdoubleArray NewDoubleArray(jsize len) {
-    return (*java)->NewDoubleArray(java, len);
+    JNIEnv *env = java_env();
+    return (*env)->NewDoubleArray(env, len);
 }
 
 jboolean *GetBooleanArrayElements(jbooleanArray array, jboolean *isCopy) {
-    return (*java)->GetBooleanArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetBooleanArrayElements(env, array, isCopy);
 }
 jbyte *GetByteArrayElements(jbyteArray array, jboolean *isCopy) {
-    return (*java)->GetByteArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetByteArrayElements(env, array, isCopy);
 }
 jchar *GetCharArrayElements(jcharArray array, jboolean *isCopy) {
-    return (*java)->GetCharArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetCharArrayElements(env, array, isCopy);
 }
 jshort *GetShortArrayElements(jshortArray array, jboolean *isCopy) {
-    return (*java)->GetShortArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetShortArrayElements(env, array, isCopy);
 }
 jint *GetIntArrayElements(jintArray array, jboolean *isCopy) {
-    return (*java)->GetIntArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetIntArrayElements(env, array, isCopy);
 }
 jlong *GetLongArrayElements(jlongArray array, jboolean *isCopy) {
-    return (*java)->GetLongArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetLongArrayElements(env, array, isCopy);
 }
 jfloat *GetFloatArrayElements(jfloatArray array, jboolean *isCopy) {
-    return (*java)->GetFloatArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetFloatArrayElements(env, array, isCopy);
 }
 jdouble *GetDoubleArrayElements(jdoubleArray array, jboolean *isCopy) {
-    return (*java)->GetDoubleArrayElements(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetDoubleArrayElements(env, array, isCopy);
 }
 
 void ReleaseBooleanArrayElements(jbooleanArray array, jboolean *elems, jint mode) {
-    (*java)->ReleaseBooleanArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseBooleanArrayElements(env, array, elems, mode);
 }
 void ReleaseByteArrayElements(jbyteArray array, jbyte *elems, jint mode) {
-    (*java)->ReleaseByteArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseByteArrayElements(env, array, elems, mode);
 }
 void ReleaseCharArrayElements(jcharArray array, jchar *elems, jint mode) {
-    (*java)->ReleaseCharArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseCharArrayElements(env, array, elems, mode);
 }
 void ReleaseShortArrayElements(jshortArray array, jshort *elems, jint mode) {
-    (*java)->ReleaseShortArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseShortArrayElements(env, array, elems, mode);
 }
 void ReleaseIntArrayElements(jintArray array, jint *elems, jint mode) {
-    (*java)->ReleaseIntArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseIntArrayElements(env, array, elems, mode);
 }
 void ReleaseLongArrayElements(jlongArray array, jlong *elems, jint mode) {
-    (*java)->ReleaseLongArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseLongArrayElements(env, array, elems, mode);
 }
 void ReleaseFloatArrayElements(jfloatArray array, jfloat *elems, jint mode) {
-    (*java)->ReleaseFloatArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseFloatArrayElements(env, array, elems, mode);
 }
 void ReleaseDoubleArrayElements(jdoubleArray array, jdouble *elems, jint mode) {
-    (*java)->ReleaseDoubleArrayElements(java, array, elems, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseDoubleArrayElements(env, array, elems, mode);
 }
 
 void GetBooleanArrayRegion(jbooleanArray array, jsize start, jsize len, jboolean *buf) {
-    (*java)->GetBooleanArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetBooleanArrayRegion(env, array, start, len, buf);
 }
 void GetByteArrayRegion(jbyteArray array, jsize start, jsize len, jbyte *buf) {
-    (*java)->GetByteArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetByteArrayRegion(env, array, start, len, buf);
 }
 void GetCharArrayRegion(jcharArray array, jsize start, jsize len, jchar *buf) {
-    (*java)->GetCharArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetCharArrayRegion(env, array, start, len, buf);
 }
 void GetShortArrayRegion(jshortArray array, jsize start, jsize len, jshort *buf) {
-    (*java)->GetShortArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetShortArrayRegion(env, array, start, len, buf);
 }
 void GetIntArrayRegion(jintArray array, jsize start, jsize len, jint *buf) {
-    (*java)->GetIntArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetIntArrayRegion(env, array, start, len, buf);
 }
 void GetLongArrayRegion(jlongArray array, jsize start, jsize len, jlong *buf) {
-    (*java)->GetLongArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetLongArrayRegion(env, array, start, len, buf);
 }
 void GetFloatArrayRegion(jfloatArray array, jsize start, jsize len, jfloat *buf) {
-    (*java)->GetFloatArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetFloatArrayRegion(env, array, start, len, buf);
 }
 void GetDoubleArrayRegion(jdoubleArray array, jsize start, jsize len, jdouble *buf) {
-    (*java)->GetDoubleArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetDoubleArrayRegion(env, array, start, len, buf);
 }
 
 void SetBooleanArrayRegion(jbooleanArray array, jsize start, jsize len, const jboolean *buf) {
-    (*java)->SetBooleanArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetBooleanArrayRegion(env, array, start, len, buf);
 }
 void SetByteArrayRegion(jbyteArray array, jsize start, jsize len, const jbyte *buf) {
-    (*java)->SetByteArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetByteArrayRegion(env, array, start, len, buf);
 }
 void SetCharArrayRegion(jcharArray array, jsize start, jsize len, const jchar *buf) {
-    (*java)->SetCharArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetCharArrayRegion(env, array, start, len, buf);
 }
 void SetShortArrayRegion(jshortArray array, jsize start, jsize len, const jshort *buf) {
-    (*java)->SetShortArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetShortArrayRegion(env, array, start, len, buf);
 }
 void SetIntArrayRegion(jintArray array, jsize start, jsize len, const jint *buf) {
-    (*java)->SetIntArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetIntArrayRegion(env, array, start, len, buf);
 }
 void SetLongArrayRegion(jlongArray array, jsize start, jsize len, const jlong *buf) {
-    (*java)->SetLongArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetLongArrayRegion(env, array, start, len, buf);
 }
 void SetFloatArrayRegion(jfloatArray array, jsize start, jsize len, const jfloat *buf) {
-    (*java)->SetFloatArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetFloatArrayRegion(env, array, start, len, buf);
 }
 void SetDoubleArrayRegion(jdoubleArray array, jsize start, jsize len, const jdouble *buf) {
-    (*java)->SetDoubleArrayRegion(java, array, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->SetDoubleArrayRegion(env, array, start, len, buf);
 }
 
 jint RegisterNatives(jclass cls, const JNINativeMethod *methods, jint nMethods) {
-    return (*java)->RegisterNatives(java, cls, methods, nMethods);
+    JNIEnv *env = java_env();
+    return (*env)->RegisterNatives(env, cls, methods, nMethods);
 }
 jint UnregisterNatives(jclass cls) {
-    return (*java)->UnregisterNatives(java, cls);
+    JNIEnv *env = java_env();
+    return (*env)->UnregisterNatives(env, cls);
 }
 
 jint MonitorEnter(jobject obj) {
-    return (*java)->MonitorEnter(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->MonitorEnter(env, obj);
 }
 jint MonitorExit(jobject obj) {
-    return (*java)->MonitorExit(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->MonitorExit(env, obj);
 }
 
 jint GetJavaVM(JavaVM **vm) {
-    return (*java)->GetJavaVM(java, vm);
+    JNIEnv *env = java_env();
+    return (*env)->GetJavaVM(env, vm);
 }
 
 void GetStringRegion(jstring str, jsize start, jsize len, jchar *buf) {
-    (*java)->GetStringRegion(java, str, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetStringRegion(env, str, start, len, buf);
 }
 void GetStringUTFRegion(jstring str, jsize start, jsize len, char *buf) {
-    (*java)->GetStringUTFRegion(java, str, start, len, buf);
+    JNIEnv *env = java_env();
+    (*env)->GetStringUTFRegion(env, str, start, len, buf);
 }
 
 void *GetPrimitiveArrayCritical(jarray array, jboolean *isCopy) {
-    return (*java)->GetPrimitiveArrayCritical(java, array, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetPrimitiveArrayCritical(env, array, isCopy);
 }
 void ReleasePrimitiveArrayCritical(jarray array, void *carray, jint mode) {
-    (*java)->ReleasePrimitiveArrayCritical(java, array, carray, mode);
+    JNIEnv *env = java_env();
+    (*env)->ReleasePrimitiveArrayCritical(env, array, carray, mode);
 }
 
 const jchar *GetStringCritical(jstring string, jboolean *isCopy) {
-    return (*java)->GetStringCritical(java, string, isCopy);
+    JNIEnv *env = java_env();
+    return (*env)->GetStringCritical(env, string, isCopy);
 }
 void ReleaseStringCritical(jstring string, const jchar *cstring) {
-    (*java)->ReleaseStringCritical(java, string, cstring);
+    JNIEnv *env = java_env();
+    (*env)->ReleaseStringCritical(env, string, cstring);
 }
 
 jweak NewWeakGlobalRef(jobject obj) {
-    return (*java)->NewWeakGlobalRef(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->NewWeakGlobalRef(env, obj);
 }
 void DeleteWeakGlobalRef(jweak ref) {
-    (*java)->DeleteWeakGlobalRef(java, ref);
+    JNIEnv *env = java_env();
+    (*env)->DeleteWeakGlobalRef(env, ref);
 }
 
 jboolean ExceptionCheck() {
-    return (*java)->ExceptionCheck(java);
+    JNIEnv *env = java_env();
+    return (*env)->ExceptionCheck(env);
 }
 
 jobject NewDirectByteBuffer(void *address, jlong capacity) {
-    return (*java)->NewDirectByteBuffer(java, address, capacity);
+    JNIEnv *env = java_env();
+    return (*env)->NewDirectByteBuffer(env, address, capacity);
 }
 void *GetDirectBufferAddress(jobject buf) {
-    return (*java)->GetDirectBufferAddress(java, buf);
+    JNIEnv *env = java_env();
+    return (*env)->GetDirectBufferAddress(env, buf);
 }
 jlong GetDirectBufferCapacity(jobject buf) {
-    return (*java)->GetDirectBufferCapacity(java, buf);
+    JNIEnv *env = java_env();
+    return (*env)->GetDirectBufferCapacity(env, buf);
 }
 jobjectRefType GetObjectRefType(jobject obj) {
-    return (*java)->GetObjectRefType(java, obj);
+    JNIEnv *env = java_env();
+    return (*env)->GetObjectRefType(env, obj);
+}
+
+/**************************************************************************
+ **************************************************************************
+ * Native invocation module
+ *
+ * The `_rubicon` builtin module exposes typed invokers that take Python
+ * values directly, pack them into a jvalue array, and invoke the JNI
+ * method. This avoids the ctypes foreign call (and the ctypes objects
+ * created to marshal each argument) on the method invocation hot path.
+ * If the module isn't available, the Python side falls back to ctypes.
+ **************************************************************************
+ *************************************************************************/
+
+// The number of arguments that can be marshalled without a heap allocation.
+#define NATIVE_STACK_ARGS 16
+
+/**
+ * Convert a Python object into a raw pointer.
+ *
+ * Accepts None (NULL), an integer address, or any object that ctypes would
+ * accept as a pointer argument (an object with an `_as_parameter_`
+ * attribute, or a ctypes pointer type exposing `value`).
+ */
+static int native_as_pointer(PyObject *obj, void **result) {
+    PyObject *value;
+    int depth;
+    int ret;
+
+    // Follow at most one level of `_as_parameter_` indirection, followed
+    // by the `value` of the ctypes pointer.
+    Py_INCREF(obj);
+    for (depth = 0; depth < 3; depth++) {
+        if (obj == Py_None) {
+            Py_DECREF(obj);
+            *result = NULL;
+            return 0;
+        }
+        if (PyLong_Check(obj)) {
+            *result = PyLong_AsVoidPtr(obj);
+            ret = (*result == NULL && PyErr_Occurred()) ? -1 : 0;
+            Py_DECREF(obj);
+            return ret;
+        }
+        // ctypes instances support the buffer protocol; anything else
+        // (e.g., a JavaInstance) must provide `_as_parameter_`.
+        if (PyObject_CheckBuffer(obj)) {
+            value = PyObject_GetAttrString(obj, "value");
+        } else {
+            value = PyObject_GetAttrString(obj, "_as_parameter_");
+        }
+        if (value == NULL) {
+            PyErr_Clear();
+            break;
+        }
+        Py_DECREF(obj);
+        obj = value;
+    }
+    PyErr_Format(PyExc_TypeError, "Can't convert %R into a Java reference", obj);
+    Py_DECREF(obj);
+    return -1;
+}
+
+/**
+ * Convert a Python object into a primitive Python value.
+ *
+ * Python ints, floats and strings are returned as-is; ctypes primitives
+ * (jint, jdouble, ...) are unwrapped using their `value` attribute.
+ * Returns a new reference.
+ */
+static PyObject *native_primitive(PyObject *obj) {
+    if (PyLong_Check(obj) || PyFloat_Check(obj) || PyUnicode_Check(obj)) {
+        Py_INCREF(obj);
+        return obj;
+    }
+    return PyObject_GetAttrString(obj, "value");
+}
+
+/**
+ * Populate a jvalue from a Python object, according to a JNI type code.
+ *
+ * The type code is the first character of the JNI type signature of the
+ * argument, except that all reference types (objects and arrays) use 'L'.
+ */
+static int native_to_jvalue(PyObject *obj, char code, jvalue *result) {
+    PyObject *value;
+    long long ival;
+    Py_UCS4 ch;
+    int truth;
+
+    if (code == 'L') {
+        return native_as_pointer(obj, (void **) &result->l);
+    }
+
+    value = native_primitive(obj);
+    if (value == NULL) {
+        return -1;
+    }
+
+    switch (code) {
+        case 'Z':
+            truth = PyObject_IsTrue(value);
+            if (truth < 0) {
+                Py_DECREF(value);
+                return -1;
+            }
+            result->z = truth ? JNI_TRUE : JNI_FALSE;
+            break;
+        case 'C':
+            if (PyUnicode_Check(value)) {
+                if (PyUnicode_GET_LENGTH(value) != 1) {
+                    PyErr_SetString(PyExc_ValueError, "Java char arguments must be a single character");
+                    Py_DECREF(value);
+                    return -1;
+                }
+                ch = PyUnicode_READ_CHAR(value, 0);
+            } else {
+                ch = (Py_UCS4) PyLong_AsUnsignedLong(value);
+                if (ch == (Py_UCS4) -1 && PyErr_Occurred()) {
+                    Py_DECREF(value);
+                    return -1;
+                }
+            }
+            if (ch > 0xFFFF) {
+                PyErr_SetString(PyExc_ValueError, "Character can't be represented as a Java char");
+                Py_DECREF(value);
+                return -1;
+            }
+            result->c = (jchar) ch;
+            break;
+        case 'F':
+            result->f = (jfloat) PyFloat_AsDouble(value);
+            break;
+        case 'D':
+            result->d = (jdouble) PyFloat_AsDouble(value);
+            break;
+        case 'B':
+        case 'S':
+        case 'I':
+        case 'J':
+            ival = PyLong_AsLongLong(value);
+            if (code == 'B') {
+                result->b = (jbyte) ival;
+            } else if (code == 'S') {
+                result->s = (jshort) ival;
+            } else if (code == 'I') {
+                result->i = (jint) ival;
+            } else {
+                result->j = (jlong) ival;
+            }
+            break;
+        default:
+            PyErr_Format(PyExc_ValueError, "Unknown JNI type code '%c'", code);
+            Py_DECREF(value);
+            return -1;
+    }
+    Py_DECREF(value);
+    return PyErr_Occurred() ? -1 : 0;
+}
+
+/**
+ * Convert a Java object reference into a Python integer address
+ * (or None, for a NULL reference).
+ */
+static PyObject *native_from_jobject(jobject obj) {
+    if (obj == NULL) {
+        Py_RETURN_NONE;
+    }
+    return PyLong_FromVoidPtr(obj);
+}
+
+// The kinds of method invocation supported by the native invokers.
+#define NATIVE_INSTANCE 0
+#define NATIVE_STATIC 1
+#define NATIVE_CONSTRUCTOR 2
+
+/**
+ * Invoke a Java method.
+ *
+ * The Python arguments are (target, methodID, shorty, args), where:
+ *  * target is the object (or class, for static methods and constructors)
+ *  * methodID is the method to invoke
+ *  * shorty is a bytes object containing one JNI type code per argument
+ *  * args is a sequence of Python values, one per argument
+ */
+static PyObject *native_invoke(PyObject *pargs, char return_type, int kind) {
+    PyObject *ptarget;
+    PyObject *pmethod;
+    PyObject *pshorty;
+    PyObject *pvalues;
+    PyObject *values;
+    jobject target;
+    jmethodID method;
+    const char *shorty;
+    Py_ssize_t argc;
+    Py_ssize_t i;
+    jvalue stack_args[NATIVE_STACK_ARGS];
+    jvalue *jargs = stack_args;
+    JNIEnv *env = java_env();
+    PyObject *result = NULL;
+
+    jboolean z_result = 0;
+    jbyte b_result = 0;
+    jchar c_result = 0;
+    jshort s_result = 0;
+    jint i_result = 0;
+    jlong j_result = 0;
+    jfloat f_result = 0;
+    jdouble d_result = 0;
+    jobject l_result = NULL;
+
+    if (!PyArg_UnpackTuple(pargs, "invoke", 4, 4, &ptarget, &pmethod, &pshorty, &pvalues)) {
+        return NULL;
+    }
+    if (!PyBytes_Check(pshorty)) {
+        PyErr_SetString(PyExc_TypeError, "Argument shorty must be a bytes object");
+        return NULL;
+    }
+    if (native_as_pointer(ptarget, (void **) &target) < 0) {
+        return NULL;
+    }
+    if (native_as_pointer(pmethod, (void **) &method) < 0) {
+        return NULL;
+    }
+    if (method == NULL) {
+        PyErr_SetString(PyExc_ValueError, "Can't invoke a NULL method ID");
+        return NULL;
+    }
+
+    values = PySequence_Fast(pvalues, "Arguments must be a sequence");
+    if (values == NULL) {
+        return NULL;
+    }
+
+    shorty = PyBytes_AS_STRING(pshorty);
+    argc = PySequence_Fast_GET_SIZE(values);
+    if (argc != PyBytes_GET_SIZE(pshorty)) {
+        PyErr_Format(PyExc_ValueError, "Expected %zd arguments; got %zd", PyBytes_GET_SIZE(pshorty), argc);
+        goto done;
+    }
+
+    if (argc > NATIVE_STACK_ARGS) {
+        jargs = PyMem_Malloc(sizeof(jvalue) * argc);
+        if (jargs == NULL) {
+            PyErr_NoMemory();
+            goto done;
+        }
+    }
+
+    for (i = 0; i < argc; i++) {
+        if (native_to_jvalue(PySequence_Fast_GET_ITEM(values, i), shorty[i], &jargs[i]) < 0) {
+            goto done;
+        }
+    }
+
+    // Release the GIL for the duration of the call, so that Java code can
+    // call back into Python on other threads.
+    Py_BEGIN_ALLOW_THREADS
+    if (kind == NATIVE_CONSTRUCTOR) {
+        l_result = (*env)->NewObjectA(env, target, method, jargs);
+    } else if (kind == NATIVE_STATIC) {
+        switch (return_type) {
+            case 'V': (*env)->CallStaticVoidMethodA(env, target, method, jargs); break;
+            case 'Z': z_result = (*env)->CallStaticBooleanMethodA(env, target, method, jargs); break;
+            case 'B': b_result = (*env)->CallStaticByteMethodA(env, target, method, jargs); break;
+            case 'C': c_result = (*env)->CallStaticCharMethodA(env, target, method, jargs); break;
+            case 'S': s_result = (*env)->CallStaticShortMethodA(env, target, method, jargs); break;
+            case 'I': i_result = (*env)->CallStaticIntMethodA(env, target, method, jargs); break;
+            case 'J': j_result = (*env)->CallStaticLongMethodA(env, target, method, jargs); break;
+            case 'F': f_result = (*env)->CallStaticFloatMethodA(env, target, method, jargs); break;
+            case 'D': d_result = (*env)->CallStaticDoubleMethodA(env, target, method, jargs); break;
+            default: l_result = (*env)->CallStaticObjectMethodA(env, target, method, jargs); break;
+        }
+    } else {
+        switch (return_type) {
+            case 'V': (*env)->CallVoidMethodA(env, target, method, jargs); break;
+            case 'Z': z_result = (*env)->CallBooleanMethodA(env, target, method, jargs); break;
+            case 'B': b_result = (*env)->CallByteMethodA(env, target, method, jargs); break;
+            case 'C': c_result = (*env)->CallCharMethodA(env, target, method, jargs); break;
+            case 'S': s_result = (*env)->CallShortMethodA(env, target, method, jargs); break;
+            case 'I': i_result = (*env)->CallIntMethodA(env, target, method, jargs); break;
+            case 'J': j_result = (*env)->CallLongMethodA(env, target, method, jargs); break;
+            case 'F': f_result = (*env)->CallFloatMethodA(env, target, method, jargs); break;
+            case 'D': d_result = (*env)->CallDoubleMethodA(env, target, method, jargs); break;
+            default: l_result = (*env)->CallObjectMethodA(env, target, method, jargs); break;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    switch (return_type) {
+        case 'V': result = Py_None; Py_INCREF(result); break;
+        case 'Z': result = PyBool_FromLong(z_result); break;
+        case 'B': result = PyLong_FromLong(b_result); break;
+        case 'C': result = PyUnicode_FromOrdinal(c_result); break;
+        case 'S': result = PyLong_FromLong(s_result); break;
+        case 'I': result = PyLong_FromLong(i_result); break;
+        case 'J': result = PyLong_FromLongLong(j_result); break;
+        case 'F': result = PyFloat_FromDouble(f_result); break;
+        case 'D': result = PyFloat_FromDouble(d_result); break;
+        default: result = native_from_jobject(l_result); break;
+    }
+
+done:
+    if (jargs != stack_args) {
+        PyMem_Free(jargs);
+    }
+    Py_DECREF(values);
+    return result;
+}
+
+#define NATIVE_INVOKER(name, return_type, kind)                 \
+    static PyObject *native_##name(PyObject *self, PyObject *args) { \
+        return native_invoke(args, return_type, kind);          \
+    }
+
+NATIVE_INVOKER(CallObjectMethod, 'L', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallBooleanMethod, 'Z', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallByteMethod, 'B', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallCharMethod, 'C', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallShortMethod, 'S', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallIntMethod, 'I', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallLongMethod, 'J', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallFloatMethod, 'F', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallDoubleMethod, 'D', NATIVE_INSTANCE)
+NATIVE_INVOKER(CallVoidMethod, 'V', NATIVE_INSTANCE)
+
+NATIVE_INVOKER(CallStaticObjectMethod, 'L', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticBooleanMethod, 'Z', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticByteMethod, 'B', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticCharMethod, 'C', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticShortMethod, 'S', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticIntMethod, 'I', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticLongMethod, 'J', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticFloatMethod, 'F', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticDoubleMethod, 'D', NATIVE_STATIC)
+NATIVE_INVOKER(CallStaticVoidMethod, 'V', NATIVE_STATIC)
+
+NATIVE_INVOKER(NewObject, 'L', NATIVE_CONSTRUCTOR)
+
+/**
+ * Create a Java primitive array holding a copy of the contents of a buffer.
+ *
+ * The Python arguments are (type_code, obj), where type_code is a bytes
+ * object containing the JNI type code of the array items, and obj is any
+ * object supporting the buffer protocol. The buffer is copied into the new
+ * array with a single Set<Type>ArrayRegion call.
+ *
+ * Returns the address of a new local reference to the array.
+ */
+static PyObject *native_NewArrayFromBuffer(PyObject *self, PyObject *args) {
+    const char *code;
+    Py_ssize_t code_len;
+    PyObject *obj;
+    Py_buffer view;
+    Py_ssize_t item_size;
+    jsize length;
+    jarray array = NULL;
+    JNIEnv *env = java_env();
+
+    if (!PyArg_ParseTuple(args, "y#O:NewArrayFromBuffer", &code, &code_len, &obj)) {
+        return NULL;
+    }
+    if (code_len != 1) {
+        PyErr_SetString(PyExc_ValueError, "Array type code must be a single byte");
+        return NULL;
+    }
+    switch (code[0]) {
+        case 'Z': case 'B': item_size = 1; break;
+        case 'C': case 'S': item_size = 2; break;
+        case 'I': case 'F': item_size = 4; break;
+        case 'J': case 'D': item_size = 8; break;
+        default:
+            PyErr_Format(PyExc_ValueError, "Unknown JNI array type code '%c'", code[0]);
+            return NULL;
+    }
+
+    if (PyObject_GetBuffer(obj, &view, PyBUF_C_CONTIGUOUS) < 0) {
+        return NULL;
+    }
+    if (view.len % item_size != 0) {
+        PyErr_Format(PyExc_ValueError, "Buffer of %zd bytes can't be divided into %zd byte items", view.len, item_size);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    if (view.len / item_size > INT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "Buffer is too large for a Java array");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    length = (jsize) (view.len / item_size);
+
+    Py_BEGIN_ALLOW_THREADS
+    switch (code[0]) {
+        case 'Z':
+            array = (*env)->NewBooleanArray(env, length);
+            if (array) (*env)->SetBooleanArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'B':
+            array = (*env)->NewByteArray(env, length);
+            if (array) (*env)->SetByteArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'C':
+            array = (*env)->NewCharArray(env, length);
+            if (array) (*env)->SetCharArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'S':
+            array = (*env)->NewShortArray(env, length);
+            if (array) (*env)->SetShortArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'I':
+            array = (*env)->NewIntArray(env, length);
+            if (array) (*env)->SetIntArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'J':
+            array = (*env)->NewLongArray(env, length);
+            if (array) (*env)->SetLongArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'F':
+            array = (*env)->NewFloatArray(env, length);
+            if (array) (*env)->SetFloatArrayRegion(env, array, 0, length, view.buf);
+            break;
+        case 'D':
+            array = (*env)->NewDoubleArray(env, length);
+            if (array) (*env)->SetDoubleArrayRegion(env, array, 0, length, view.buf);
+            break;
+    }
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&view);
+    if (array == NULL) {
+        (*env)->ExceptionClear(env);
+        return PyErr_NoMemory();
+    }
+    return native_from_jobject(array);
+}
+
+// The longest string that is read into a buffer on the stack; longer
+// strings are read into a temporary buffer on the heap.
+#define NATIVE_STRING_REGION 256
+
+/**
+ * Create a Java String from a Python string.
+ *
+ * The cheapest conversion is chosen based on the storage kind of the
+ * Python string:
+ *  * ASCII strings (without embedded NULs) are valid modified UTF-8, and are
+ *    passed to NewStringUTF without conversion;
+ *  * 2-byte strings are already UTF-16, and are passed to NewString as-is;
+ *  * other 1-byte strings are widened, and 4-byte strings are encoded as
+ *    UTF-16 (with surrogate pairs for characters outside the BMP).
+ *
+ * Returns the address of a new local reference to the String.
+ */
+static PyObject *native_NewString(PyObject *self, PyObject *args) {
+    PyObject *str;
+    Py_ssize_t length;
+    Py_ssize_t utf16_length;
+    Py_ssize_t i;
+    jchar stack_chars[NATIVE_STRING_REGION];
+    jchar *chars = NULL;
+    jstring result = NULL;
+    JNIEnv *env = java_env();
+
+    if (!PyArg_ParseTuple(args, "U:NewString", &str)) {
+        return NULL;
+    }
+    length = PyUnicode_GET_LENGTH(str);
+
+    switch (PyUnicode_KIND(str)) {
+        case PyUnicode_2BYTE_KIND:
+            utf16_length = length;
+            break;
+        case PyUnicode_4BYTE_KIND:
+            utf16_length = length;
+            for (i = 0; i < length; i++) {
+                if (PyUnicode_4BYTE_DATA(str)[i] > 0xFFFF) {
+                    utf16_length++;
+                }
+            }
+            break;
+        default:
+            if (PyUnicode_IS_ASCII(str) && strlen((const char *) PyUnicode_1BYTE_DATA(str)) == (size_t) length) {
+                result = (*env)->NewStringUTF(env, (const char *) PyUnicode_1BYTE_DATA(str));
+                goto done;
+            }
+            utf16_length = length;
+            break;
+    }
+    if (utf16_length > INT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "String is too long for a Java String");
+        return NULL;
+    }
+
+    if (PyUnicode_KIND(str) == PyUnicode_2BYTE_KIND) {
+        result = (*env)->NewString(env, (const jchar *) PyUnicode_2BYTE_DATA(str), (jsize) length);
+        goto done;
+    }
+
+    if (utf16_length <= NATIVE_STRING_REGION) {
+        chars = stack_chars;
+    } else {
+        chars = PyMem_Malloc(utf16_length * sizeof(jchar));
+        if (chars == NULL) {
+            return PyErr_NoMemory();
+        }
+    }
+    if (PyUnicode_KIND(str) == PyUnicode_1BYTE_KIND) {
+        for (i = 0; i < length; i++) {
+            chars[i] = PyUnicode_1BYTE_DATA(str)[i];
+        }
+    } else {
+        Py_ssize_t j = 0;
+        for (i = 0; i < length; i++) {
+            Py_UCS4 ch = PyUnicode_4BYTE_DATA(str)[i];
+            if (ch > 0xFFFF) {
+                ch -= 0x10000;
+                chars[j++] = (jchar) (0xD800 + (ch >> 10));
+                chars[j++] = (jchar) (0xDC00 + (ch & 0x3FF));
+            } else {
+                chars[j++] = (jchar) ch;
+            }
+        }
+    }
+    result = (*env)->NewString(env, chars, (jsize) utf16_length);
+    if (chars != stack_chars) {
+        PyMem_Free(chars);
+    }
+
+done:
+    if (result == NULL) {
+        (*env)->ExceptionClear(env);
+        return PyErr_NoMemory();
+    }
+    return native_from_jobject(result);
+}
+
+/**
+ * Decode UTF-16 Java characters into a Python string.
+ *
+ * Unpaired surrogates (which are legal in a Java String) are preserved.
+ */
+static PyObject *native_decode_chars(const jchar *chars, jsize length) {
+#if PY_LITTLE_ENDIAN
+    int byteorder = -1;
+#else
+    int byteorder = 1;
+#endif
+    return PyUnicode_DecodeUTF16((const char *) chars, (Py_ssize_t) length * sizeof(jchar), "surrogatepass", &byteorder);
+}
+
+/**
+ * Convert a (non-NULL) Java String into a Python string.
+ *
+ * The characters are copied with GetStringRegion (onto the stack for short
+ * strings, or into a temporary buffer for longer strings), and decoded once
+ * the copy is complete.
+ */
+static PyObject *native_string_value(JNIEnv *env, jstring str) {
+    jsize length;
+    jchar *chars;
+    jchar stack_chars[NATIVE_STRING_REGION];
+    PyObject *result;
+
+    length = (*env)->GetStringLength(env, str);
+    if (length <= NATIVE_STRING_REGION) {
+        // The region is always within bounds, so this can't fail.
+        (*env)->GetStringRegion(env, str, 0, length, stack_chars);
+        return native_decode_chars(stack_chars, length);
+    }
+
+    // Decoding allocates Python objects, which can run the garbage
+    // collector (and any __del__ that calls into Java), so the characters
+    // are copied out of the String before they are decoded.
+    chars = PyMem_Malloc((size_t) length * sizeof(jchar));
+    if (chars == NULL) {
+        return PyErr_NoMemory();
+    }
+    (*env)->GetStringRegion(env, str, 0, length, chars);
+    result = native_decode_chars(chars, length);
+    PyMem_Free(chars);
+    return result;
+}
+
+/**
+ * Convert a Java String into a Python string.
+ *
+ * The Python argument is a reference to the String. The reference is not
+ * released.
+ */
+static PyObject *native_GetString(PyObject *self, PyObject *args) {
+    PyObject *pstr;
+    jstring str;
+
+    if (!PyArg_ParseTuple(args, "O:GetString", &pstr)) {
+        return NULL;
+    }
+    if (native_as_pointer(pstr, (void **) &str) < 0) {
+        return NULL;
+    }
+    if (str == NULL) {
+        PyErr_SetString(PyExc_ValueError, "Can't convert a NULL reference into a string");
+        return NULL;
+    }
+    return native_string_value(java_env(), str);
+}
+
+/**
+ * Describe a Java exception, using its toString(), as a Python string.
+ *
+ * The reference to the exception is released. Returns NULL (with a
+ * Python exception set) if the exception can't be described.
+ */
+static PyObject *native_describe_throwable(JNIEnv *env, jthrowable exception) {
+    jclass cls;
+    jmethodID to_string;
+    jstring description = NULL;
+    PyObject *result;
+
+    cls = (*env)->GetObjectClass(env, exception);
+    to_string = (*env)->GetMethodID(env, cls, "toString", "()Ljava/lang/String;");
+    if (to_string != NULL) {
+        description = (*env)->CallObjectMethod(env, exception, to_string);
+    }
+    (*env)->DeleteLocalRef(env, cls);
+    (*env)->DeleteLocalRef(env, exception);
+    if (description == NULL) {
+        (*env)->ExceptionClear(env);
+        PyErr_SetString(PyExc_RuntimeError, "Unable to describe Java exception");
+        return NULL;
+    }
+    result = native_string_value(env, description);
+    (*env)->DeleteLocalRef(env, description);
+    return result;
+}
+
+/**
+ * Create a Java object array holding a sequence of references.
+ *
+ * The Python arguments are (element_class, values), where element_class is
+ * a reference to the class of the array elements, and values is a sequence
+ * of references (or None); the array is created and populated in a single
+ * call. The references in values are not released.
+ *
+ * Returns the address of a new local reference to the array.
+ */
+static PyObject *native_NewObjectArray(PyObject *self, PyObject *args) {
+    PyObject *pclass;
+    PyObject *pvalues;
+    PyObject *values;
+    jclass cls;
+    jobjectArray array;
+    Py_ssize_t length;
+    Py_ssize_t i;
+    void *item;
+    JNIEnv *env = java_env();
+
+    if (!PyArg_ParseTuple(args, "OO:NewObjectArray", &pclass, &pvalues)) {
+        return NULL;
+    }
+    if (native_as_pointer(pclass, (void **) &cls) < 0) {
+        return NULL;
+    }
+    values = PySequence_Fast(pvalues, "Array values must be a sequence");
+    if (values == NULL) {
+        return NULL;
+    }
+    length = PySequence_Fast_GET_SIZE(values);
+    if (length > INT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "Sequence is too large for a Java array");
+        Py_DECREF(values);
+        return NULL;
+    }
+
+    // Any exception left pending by an earlier call would be mistaken
+    // for a failure to store an element.
+    (*env)->ExceptionClear(env);
+    array = (*env)->NewObjectArray(env, (jsize) length, cls, NULL);
+    if (array == NULL) {
+        (*env)->ExceptionClear(env);
+        Py_DECREF(values);
+        return PyErr_NoMemory();
+    }
+    for (i = 0; i < length; i++) {
+        if (native_as_pointer(PySequence_Fast_GET_ITEM(values, i), &item) < 0) {
+            (*env)->DeleteLocalRef(env, array);
+            Py_DECREF(values);
+            return NULL;
+        }
+        (*env)->SetObjectArrayElement(env, array, (jsize) i, (jobject) item);
+        if ((*env)->ExceptionCheck(env)) {
+            // An ArrayStoreException; the element is the wrong type.
+            (*env)->ExceptionClear(env);
+            (*env)->DeleteLocalRef(env, array);
+            PyErr_Format(PyExc_TypeError, "Array element %zd can't be stored in the array", i);
+            Py_DECREF(values);
+            return NULL;
+        }
+    }
+    Py_DECREF(values);
+    return native_from_jobject(array);
+}
+
+/**
+ * Retrieve a range of the elements of a Java object array.
+ *
+ * The Python arguments are (array, start, length). The elements are returned
+ * as a list of the addresses of new global references (or None, for NULL
+ * elements), so that the number of local references doesn't grow with the
+ * number of elements.
+ */
+static PyObject *native_GetObjectArrayElements(PyObject *self, PyObject *args) {
+    PyObject *parray;
+    jobjectArray array;
+    int start;
+    int length;
+    int i;
+    jobject local;
+    jobject global;
+    PyObject *result;
+    PyObject *item;
+    JNIEnv *env = java_env();
+
+    if (!PyArg_ParseTuple(args, "Oii:GetObjectArrayElements", &parray, &start, &length)) {
+        return NULL;
+    }
+    if (native_as_pointer(parray, (void **) &array) < 0) {
+        return NULL;
+    }
+    if (start < 0 || length < 0 || (jlong) start + length > (*env)->GetArrayLength(env, array)) {
+        PyErr_SetString(PyExc_IndexError, "Array range out of bounds");
+        return NULL;
+    }
+
+    result = PyList_New(length);
+    if (result == NULL) {
+        return NULL;
+    }
+    for (i = 0; i < length; i++) {
+        local = (*env)->GetObjectArrayElement(env, array, start + i);
+        if (local == NULL) {
+            if ((*env)->ExceptionCheck(env)) {
+                (*env)->ExceptionClear(env);
+                PyErr_SetString(PyExc_RuntimeError, "Unable to retrieve array element");
+                goto error;
+            }
+            Py_INCREF(Py_None);
+            item = Py_None;
+        } else {
+            global = (*env)->NewGlobalRef(env, local);
+            (*env)->DeleteLocalRef(env, local);
+            if (global == NULL) {
+                PyErr_NoMemory();
+                goto error;
+            }
+            item = native_from_jobject(global);
+            if (item == NULL) {
+                (*env)->DeleteGlobalRef(env, global);
+                goto error;
+            }
+        }
+        PyList_SET_ITEM(result, i, item);
+    }
+    return result;
+
+error:
+    // Release the references collected so far; the caller never sees them.
+    while (i-- > 0) {
+        item = PyList_GET_ITEM(result, i);
+        if (item != Py_None) {
+            (*env)->DeleteGlobalRef(env, (jobject) PyLong_AsVoidPtr(item));
+        }
+    }
+    Py_DECREF(result);
+    return NULL;
+}
+
+/**
+ * Invoke an instance method on each object in a sequence.
+ *
+ * The Python arguments are (targets, methodID, return_type, shorty, args),
+ * where return_type is a bytes object containing the JNI type code of the
+ * return value ('L' for all reference types), and the other arguments are
+ * as for native_invoke. The same arguments are used for every invocation.
+ *
+ * Returns a list of results. References are returned as the addresses of
+ * new global references, so that the number of local references doesn't
+ * grow with the number of targets.
+ */
+static PyObject *native_MapMethod(PyObject *self, PyObject *pargs) {
+    PyObject *ptargets;
+    PyObject *pmethod;
+    PyObject *preturn_type;
+    PyObject *pshorty;
+    PyObject *pvalues;
+    PyObject *targets = NULL;
+    PyObject *values = NULL;
+    PyObject *result = NULL;
+    PyObject *item;
+    PyObject *description;
+    jobject *jtargets = NULL;
+    jvalue *jresults = NULL;
+    jthrowable exception = NULL;
+    jmethodID method;
+    const char *shorty;
+    char return_type;
+    Py_ssize_t count;
+    Py_ssize_t argc;
+    Py_ssize_t i;
+    Py_ssize_t completed = 0;
+    jvalue stack_args[NATIVE_STACK_ARGS];
+    jvalue *jargs = stack_args;
+    JNIEnv *env = java_env();
+
+    if (!PyArg_UnpackTuple(pargs, "MapMethod", 5, 5, &ptargets, &pmethod, &preturn_type, &pshorty, &pvalues)) {
+        return NULL;
+    }
+    if (!PyBytes_Check(preturn_type) || PyBytes_GET_SIZE(preturn_type) != 1) {
+        PyErr_SetString(PyExc_TypeError, "Argument return_type must be a single byte");
+        return NULL;
+    }
+    if (!PyBytes_Check(pshorty)) {
+        PyErr_SetString(PyExc_TypeError, "Argument shorty must be a bytes object");
+        return NULL;
+    }
+    if (native_as_pointer(pmethod, (void **) &method) < 0) {
+        return NULL;
+    }
+    if (method == NULL) {
+        PyErr_SetString(PyExc_ValueError, "Can't invoke a NULL method ID");
+        return NULL;
+    }
+    return_type = PyBytes_AS_STRING(preturn_type)[0];
+    shorty = PyBytes_AS_STRING(pshorty);
+
+    targets = PySequence_Fast(ptargets, "Targets must be a sequence");
+    if (targets == NULL) {
+        goto done;
+    }
+    values = PySequence_Fast(pvalues, "Arguments must be a sequence");
+    if (values == NULL) {
+        goto done;
+    }
+
+    argc = PySequence_Fast_GET_SIZE(values);
+    if (argc != PyBytes_GET_SIZE(pshorty)) {
+        PyErr_Format(PyExc_ValueError, "Expected %zd arguments; got %zd", PyBytes_GET_SIZE(pshorty), argc);
+        goto done;
+    }
+    if (argc > NATIVE_STACK_ARGS) {
+        jargs = PyMem_Malloc(sizeof(jvalue) * argc);
+        if (jargs == NULL) {
+            PyErr_NoMemory();
+            goto done;
+        }
+    }
+    for (i = 0; i < argc; i++) {
+        if (native_to_jvalue(PySequence_Fast_GET_ITEM(values, i), shorty[i], &jargs[i]) < 0) {
+            goto done;
+        }
+    }
+
+    count = PySequence_Fast_GET_SIZE(targets);
+    jtargets = PyMem_Malloc(sizeof(jobject) * (count ? count : 1));
+    jresults = PyMem_Malloc(sizeof(jvalue) * (count ? count : 1));
+    if (jtargets == NULL || jresults == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < count; i++) {
+        if (native_as_pointer(PySequence_Fast_GET_ITEM(targets, i), (void **) &jtargets[i]) < 0) {
+            goto done;
+        }
+        if (jtargets[i] == NULL) {
+            PyErr_Format(PyExc_ValueError, "Can't invoke a method on NULL (item %zd)", i);
+            goto done;
+        }
+    }
+
+    // An exception left pending by an earlier JNI call would otherwise be
+    // reported as having been raised by the first invocation.
+    (*env)->ExceptionClear(env);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < count; i++) {
+        jobject target = jtargets[i];
+        jobject local;
+        switch (return_type) {
+            case 'V': (*env)->CallVoidMethodA(env, target, method, jargs); break;
+            case 'Z': jresults[i].z = (*env)->CallBooleanMethodA(env, target, method, jargs); break;
+            case 'B': jresults[i].b = (*env)->CallByteMethodA(env, target, method, jargs); break;
+            case 'C': jresults[i].c = (*env)->CallCharMethodA(env, target, method, jargs); break;
+            case 'S': jresults[i].s = (*env)->CallShortMethodA(env, target, method, jargs); break;
+            case 'I': jresults[i].i = (*env)->CallIntMethodA(env, target, method, jargs); break;
+            case 'J': jresults[i].j = (*env)->CallLongMethodA(env, target, method, jargs); break;
+            case 'F': jresults[i].f = (*env)->CallFloatMethodA(env, target, method, jargs); break;
+            case 'D': jresults[i].d = (*env)->CallDoubleMethodA(env, target, method, jargs); break;
+            default:
+                local = (*env)->CallObjectMethodA(env, target, method, jargs);
+                jresults[i].l = NULL;
+                if (local != NULL) {
+                    jresults[i].l = (*env)->NewGlobalRef(env, local);
+                    (*env)->DeleteLocalRef(env, local);
+                }
+                break;
+        }
+        // Stop at the first exception; no further JNI calls can be made
+        // until it has been handled.
+        exception = (*env)->ExceptionOccurred(env);
+        if (exception != NULL) {
+            (*env)->ExceptionClear(env);
+            break;
+        }
+        completed++;
+    }
+    Py_END_ALLOW_THREADS
+
+    if (completed != count) {
+        description = native_describe_throwable(env, exception);
+        if (description != NULL) {
+            PyErr_Format(
+                PyExc_RuntimeError, "Java exception raised invoking method on item %zd: %U", completed, description
+            );
+            Py_DECREF(description);
+        }
+        if (return_type == 'L') {
+            for (i = 0; i < completed; i++) {
+                if (jresults[i].l != NULL) {
+                    (*env)->DeleteGlobalRef(env, jresults[i].l);
+                }
+            }
+        }
+        goto done;
+    }
+
+    result = PyList_New(count);
+    if (result == NULL) {
+        goto done;
+    }
+    for (i = 0; i < count; i++) {
+        switch (return_type) {
+            case 'V': item = Py_None; Py_INCREF(item); break;
+            case 'Z': item = PyBool_FromLong(jresults[i].z); break;
+            case 'B': item = PyLong_FromLong(jresults[i].b); break;
+            case 'C': item = PyUnicode_FromOrdinal(jresults[i].c); break;
+            case 'S': item = PyLong_FromLong(jresults[i].s); break;
+            case 'I': item = PyLong_FromLong(jresults[i].i); break;
+            case 'J': item = PyLong_FromLongLong(jresults[i].j); break;
+            case 'F': item = PyFloat_FromDouble(jresults[i].f); break;
+            case 'D': item = PyFloat_FromDouble(jresults[i].d); break;
+            default: item = native_from_jobject(jresults[i].l); break;
+        }
+        if (item == NULL) {
+            Py_CLEAR(result);
+            goto done;
+        }
+        PyList_SET_ITEM(result, i, item);
+    }
+
+done:
+    if (jargs != stack_args) {
+        PyMem_Free(jargs);
+    }
+    PyMem_Free(jtargets);
+    PyMem_Free(jresults);
+    Py_XDECREF(targets);
+    Py_XDECREF(values);
+    return result;
+}
+
+#define NATIVE_METHOD(name, doc) {#name, native_##name, METH_VARARGS, doc}
+
+static PyMethodDef native_methods[] = {
+    NATIVE_METHOD(CallObjectMethod, "Invoke an instance method returning an object."),
+    NATIVE_METHOD(CallBooleanMethod, "Invoke an instance method returning a boolean."),
+    NATIVE_METHOD(CallByteMethod, "Invoke an instance method returning a byte."),
+    NATIVE_METHOD(CallCharMethod, "Invoke an instance method returning a char."),
+    NATIVE_METHOD(CallShortMethod, "Invoke an instance method returning a short."),
+    NATIVE_METHOD(CallIntMethod, "Invoke an instance method returning an int."),
+    NATIVE_METHOD(CallLongMethod, "Invoke an instance method returning a long."),
+    NATIVE_METHOD(CallFloatMethod, "Invoke an instance method returning a float."),
+    NATIVE_METHOD(CallDoubleMethod, "Invoke an instance method returning a double."),
+    NATIVE_METHOD(CallVoidMethod, "Invoke an instance method returning void."),
+    NATIVE_METHOD(CallStaticObjectMethod, "Invoke a static method returning an object."),
+    NATIVE_METHOD(CallStaticBooleanMethod, "Invoke a static method returning a boolean."),
+    NATIVE_METHOD(CallStaticByteMethod, "Invoke a static method returning a byte."),
+    NATIVE_METHOD(CallStaticCharMethod, "Invoke a static method returning a char."),
+    NATIVE_METHOD(CallStaticShortMethod, "Invoke a static method returning a short."),
+    NATIVE_METHOD(CallStaticIntMethod, "Invoke a static method returning an int."),
+    NATIVE_METHOD(CallStaticLongMethod, "Invoke a static method returning a long."),
+    NATIVE_METHOD(CallStaticFloatMethod, "Invoke a static method returning a float."),
+    NATIVE_METHOD(CallStaticDoubleMethod, "Invoke a static method returning a double."),
+    NATIVE_METHOD(CallStaticVoidMethod, "Invoke a static method returning void."),
+    NATIVE_METHOD(NewObject, "Invoke a constructor, returning the new object."),
+    NATIVE_METHOD(MapMethod, "Invoke an instance method on each object in a sequence."),
+    NATIVE_METHOD(NewArrayFromBuffer, "Create a Java primitive array from the contents of a buffer."),
+    NATIVE_METHOD(NewString, "Create a Java String from a Python string."),
+    NATIVE_METHOD(GetString, "Convert a Java String into a Python string."),
+    NATIVE_METHOD(NewObjectArray, "Create a Java object array from a sequence of references."),
+    NATIVE_METHOD(GetObjectArrayElements, "Retrieve a range of the elements of a Java object array."),
+    {NULL, NULL, 0, NULL}};
+
+static struct PyModuleDef native_definition = {
+    PyModuleDef_HEAD_INIT,
+    "_rubicon",
+    "Native method invocation for rubicon-java",
+    -1,
+    native_methods,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+};
+
+PyMODINIT_FUNC
+PyInit__rubicon(void)
+{
+    return PyModule_Create(&native_definition);
 }
 
 /**************************************************************************
@@ -835,7 +2221,24 @@ JNIEXPORT jint JNICALL Java_org_beeware_rubicon_Python_init(JNIEnv *env, jobject
     char pythonPathVar[512];
 
     LOG_I("Start Python runtime...");
-    java = env;
+    if ((*env)->GetJavaVM(env, &java_vm) != JNI_OK) {
+        LOG_E("Couldn't get Java VM");
+        return -3;
+    }
+    thread_env = env;
+
+    // Retain the class loader that loaded Rubicon (`thisObj` is the Python class).
+    jclass Class = (*env)->FindClass(env, "java/lang/Class");
+    jmethodID Class__getClassLoader = (*env)->GetMethodID(env, Class, "getClassLoader", "()Ljava/lang/ClassLoader;");
+    jclass ClassLoader = (*env)->FindClass(env, "java/lang/ClassLoader");
+    class_loader__loadClass = (*env)->GetMethodID(env, ClassLoader, "loadClass", "(Ljava/lang/String;)Ljava/lang/Class;");
+    jobject loader = (*env)->CallObjectMethod(env, thisObj, Class__getClassLoader);
+    if (loader != NULL) {
+        class_loader = (*env)->NewGlobalRef(env, loader);
+        (*env)->DeleteLocalRef(env, loader);
+    }
+    (*env)->DeleteLocalRef(env, ClassLoader);
+    (*env)->DeleteLocalRef(env, Class);
 
 #ifdef LIBPYTHON_RTLD_GLOBAL
     // make libpython symbols availiable for everyone
@@ -861,6 +2264,13 @@ JNIEXPORT jint JNICALL Java_org_beeware_rubicon_Python_init(JNIEnv *env, jobject
         LOG_D("Using default PYTHONPATH");
     }
 
+    // Register the native invocation module, so that rubicon.java can
+    // avoid ctypes on the method invocation hot path.
+    LOG_D("Adding native invocation module to default modules...");
+    if (PyImport_AppendInittab("_rubicon", PyInit__rubicon) == -1) {
+        LOG_E("Error: could not append native invocation module to default modules");
+    }
+
 #ifdef __ANDROID__
     // If we're on android, we need to specify the location of the Rubicon
     // shared library as part of the environment.
@@ -925,7 +2335,7 @@ JNIEXPORT jint JNICALL Java_org_beeware_rubicon_Python_init(JNIEnv *env, jobject
         LOG_E("Couldn't import rubicon python module");
         PyErr_Print();
         PyErr_Clear();
-        java = NULL;
+        java_vm = NULL;
         return -1;
     }
     LOG_V("Got rubicon python module");
@@ -935,7 +2345,7 @@ JNIEXPORT jint JNICALL Java_org_beeware_rubicon_Python_init(JNIEnv *env, jobject
         LOG_E("Couldn't find method dispatch handler");
         PyErr_Print();
         PyErr_Clear();
-        java = NULL;
+        java_vm = NULL;
         return -2;
     }
     LOG_V("Got method dispatch handler");
@@ -1037,10 +2447,15 @@ JNIEXPORT jint JNICALL Java_org_beeware_rubicon_Python_run(JNIEnv *env, jobject
  * Method to stop the Python runtime.
  *************************************************************************/
 JNIEXPORT void JNICALL Java_org_beeware_rubicon_Python_stop(JNIEnv *env, jobject thisObj) {
-    if (java) {
+    if (java_vm) {
         LOG_D("Finalizing Python runtime...");
         Py_Finalize();
-        java = NULL;
+        java_vm = NULL;
+        thread_env = NULL;
+        if (class_loader != NULL) {
+            (*env)->DeleteGlobalRef(env, class_loader);
+            class_loader = NULL;
+        }
         Py_XDECREF(method_handler);
         LOG_I("Python runtime stopped.");
     } else {
@@ -1058,6 +2473,10 @@ JNIEXPORT void JNICALL Java_org_beeware_rubicon_Python_stop(JNIEnv *env, jobject
  * In those cases, it returns a boxed java.lang.Integer or java.lang.Boolean.
  *************************************************************************/
 JNIEXPORT jobject JNICALL Java_org_beeware_rubicon_PythonInstance_invoke(JNIEnv *env, jobject thisObj, jobject proxy, jobject method, jobjectArray jargs) {
+    // The invocation may be on a Java thread that hasn't used Python before;
+    // any calls back into Java from Python will use this thread's JNIEnv.
+    thread_env = env;
+
     jclass PythonInstance = (*env)->FindClass(env, "org/beeware/rubicon/PythonInstance");
     jfieldID PythonInstance__id = (*env)->GetFieldID(env, PythonInstance, "instance", "J");
 
@@ -1067,8 +2486,9 @@ JNIEXPORT jobject JNICALL Java_org_beeware_rubicon_PythonInstance_invoke(JNIEnv
     jobject method_name = (*env)->CallObjectMethod(env, method, method__getName);
 
     // `jlong` is always 64 bits. Use portable PRId64 macro for `ld` on 64-bit and `lld` on 32-bit.
+    const char *method_name_str = (*env)->GetStringUTFChars(env, method_name, NULL);
     jlong instance = (*env)->GetLongField(env, thisObj, PythonInstance__id);
-    LOG_D("Native invocation %" PRId64 " :: %s", instance, (*env)->GetStringUTFChars(env, method_name, NULL));
+    LOG_D("Native invocation %" PRId64 " :: %s", instance, method_name_str);
 
     PyGILState_STATE gstate;
     gstate = PyGILState_Ensure();
@@ -1083,7 +2503,8 @@ JNIEXPORT jobject JNICALL Java_org_beeware_rubicon_PythonInstance_invoke(JNIEnv
     #else
     #error Unable to find 8-byte integer format.
     #endif
-    PyObject *pmethod_name = PyUnicode_FromFormat("%s", (*env)->GetStringUTFChars(env, method_name, NULL));
+    PyObject *pmethod_name = PyUnicode_FromString(method_name_str);
+    (*env)->ReleaseStringUTFChars(env, method_name, method_name_str);
     PyObject *args;
 
     if (jargs) {
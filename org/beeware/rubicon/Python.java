@@ -2,32 +2,18 @@ package org.beeware.rubicon;
 
 import java.lang.reflect.Proxy;
 
+import java.lang.reflect.Constructor;
 import java.lang.reflect.Field;
 import java.lang.reflect.Method;
 import java.lang.reflect.Modifier;
 
-import java.util.Map;
-import java.util.HashMap;
 import java.util.HashSet;
 import java.util.Set;
 
 public class Python {
-    /**
-     * A 2 level map of Class: Method name: Method for instance methods
-     */
-    private static Map<Class, Map<String, Set<Method>>> _instanceMethods;
-
-    /**
-     * A 2 level map of Class: Method name: Method for static methods
-     */
-    private static Map<Class, Map<String, Set<Method>>> _staticMethods;
-
     static {
         System.out.println("LOAD LIBRARY");
         System.loadLibrary("rubicon");
-
-        _instanceMethods = new HashMap<Class, Map<String, Set<Method>>>();
-        _staticMethods = new HashMap<Class, Map<String, Set<Method>>>();
     }
 
     /**
@@ -72,97 +58,173 @@ public class Python {
     }
 
     /**
-     * Retrieve the list of methods on a class with a specific name.
+     * Describe all the public members of a class in a single string.
+     *
+     * This allows the Python side to retrieve everything it needs to know
+     * about a class with one call, rather than making several calls for
+     * every field, method and constructor. The description contains one
+     * line per member; the items on each line are separated by spaces:
+     *
+     *   F [static] [name] [type signature]
+     *   M [static] [name] [parameter signatures] [return signature]
+     *   C [parameter signatures]
      *
-     * This is used to implement on-demand polymorphism checks.
+     * where [static] is 1 for static members, and 0 otherwise. All types
+     * are described using JNI type signatures.
      *
-     * @param cls      The class to be interrogated
-     * @param name     The name of the method to retrieve
-     * @param isStatic If True, return only static methods; otherwise, return
-     *                 instance methods.
-     * @return The array of Method instances matching the provided name.
+     * @param cls The class to be interrogated
+     * @return The description of the class.
      */
-    public static Method[] getMethods(Class cls, String name, boolean isStatic) {
-        Map<String, Set<Method>> methodMap;
-
-        if (isStatic) {
-            methodMap = _staticMethods.get(cls);
-        } else {
-            methodMap = _instanceMethods.get(cls);
+    public static String describe(Class cls) {
+        StringBuilder description = new StringBuilder();
+
+        // A field can be hidden by a field with the same name in a subclass;
+        // getField() resolves each name to the field that is visible.
+        Set<String> fieldNames = new HashSet<String>();
+        for (Field field : cls.getFields()) {
+            fieldNames.add(field.getName());
         }
-
-        if (methodMap == null) {
-            Map<String, Set<Method>> instanceNameMap = new HashMap<String, Set<Method>>();
-            Map<String, Set<Method>> staticNameMap = new HashMap<String, Set<Method>>();
-
-            for (Method method : cls.getMethods()) {
-                int modifiers = method.getModifiers();
+        for (String name : fieldNames) {
+            try {
+                Field field = cls.getField(name);
+                int modifiers = field.getModifiers();
                 if (Modifier.isPublic(modifiers)) {
-                    if (Modifier.isStatic(modifiers)) {
-                        Set<Method> alternatives = staticNameMap.get(method.getName());
-                        if (alternatives == null) {
-                            alternatives = new HashSet<Method>();
-                            staticNameMap.put(method.getName(), alternatives);
-                        }
-
-                        alternatives.add(method);
-                    } else {
-                        Set<Method> alternatives = instanceNameMap.get(method.getName());
-                        if (alternatives == null) {
-                            alternatives = new HashSet<Method>();
-                            instanceNameMap.put(method.getName(), alternatives);
-                        }
-
-                        alternatives.add(method);
-                    }
+                    description.append("F ");
+                    description.append(Modifier.isStatic(modifiers) ? '1' : '0');
+                    description.append(' ').append(name);
+                    description.append(' ').append(signature(field.getType()));
+                    description.append('\n');
                 }
+            } catch (NoSuchFieldException e) {
+                // Can't happen; the name was provided by getFields().
             }
+        }
 
-            _instanceMethods.put(cls, instanceNameMap);
-            _staticMethods.put(cls, staticNameMap);
+        for (Method method : cls.getMethods()) {
+            int modifiers = method.getModifiers();
+            if (Modifier.isPublic(modifiers)) {
+                description.append("M ");
+                description.append(Modifier.isStatic(modifiers) ? '1' : '0');
+                description.append(' ').append(method.getName());
+                description.append(' ').append(signature(method.getParameterTypes()));
+                description.append(' ').append(signature(method.getReturnType()));
+                description.append('\n');
+            }
+        }
 
-            if (isStatic) {
-                methodMap = staticNameMap;
+        for (Constructor constructor : cls.getConstructors()) {
+            if (Modifier.isPublic(constructor.getModifiers())) {
+                description.append("C ");
+                description.append(signature(constructor.getParameterTypes()));
+                description.append('\n');
+            }
+        }
+
+        return description.toString();
+    }
+
+    /**
+     * Return the JNI type signature of a class.
+     *
+     * @param cls The class to be described
+     * @return The type signature
+     */
+    private static String signature(Class cls) {
+        if (cls.isPrimitive()) {
+            if (cls == Void.TYPE) {
+                return "V";
+            } else if (cls == Boolean.TYPE) {
+                return "Z";
+            } else if (cls == Byte.TYPE) {
+                return "B";
+            } else if (cls == Character.TYPE) {
+                return "C";
+            } else if (cls == Short.TYPE) {
+                return "S";
+            } else if (cls == Integer.TYPE) {
+                return "I";
+            } else if (cls == Long.TYPE) {
+                return "J";
+            } else if (cls == Float.TYPE) {
+                return "F";
             } else {
-                methodMap = instanceNameMap;
+                return "D";
             }
+        } else if (cls.isArray()) {
+            return cls.getName().replace('.', '/');
+        } else {
+            return "L" + cls.getName().replace('.', '/') + ";";
         }
+    }
 
-        return methodMap.get(name).toArray(new Method[0]);
+    /**
+     * Return the concatenated JNI type signatures of a list of parameters.
+     *
+     * @param params The parameter types to be described
+     * @return The type signatures
+     */
+    private static String signature(Class[] params) {
+        StringBuilder signature = new StringBuilder();
+        for (Class param : params) {
+            signature.append(signature(param));
+        }
+        return signature.toString();
     }
 
     /**
-     * Retrieve the list of methods on a class with a specific name.
+     * Pack an array of strings into a single array of UTF-16 characters.
      *
-     * This is used to implement on-demand polymorphism checks.
+     * Each string is preceded by its length, stored in two characters (the
+     * high 16 bits, then the low 16 bits); a null string has a length of -1.
+     * This allows an entire array of strings to be retrieved with a single
+     * array copy, rather than one call per string.
      *
-     * @param cls      The class to be interrogated
-     * @param name     The name of the method to retrieve
-     * @param isStatic If True, return only static fields; otherwise, return
-     *                 instance fields.
-     * @return The field matching the provided name; null if no field with the
-     *         provided name exists
+     * @param strings The strings to pack.
+     * @return The packed characters.
      */
-    public static Field getField(Class cls, String name, boolean isStatic) {
-        try {
-            Field field = cls.getField(name);
-            int modifiers = field.getModifiers();
+    public static char[] packStrings(String[] strings) {
+        int size = 0;
+        for (int i = 0; i < strings.length; i++) {
+            size += 2;
+            if (strings[i] != null) {
+                size += strings[i].length();
+            }
+        }
 
-            if (Modifier.isStatic(modifiers) == isStatic) {
-                if (Modifier.isPublic(modifiers)) {
-                    return field;
-                } else {
-                    // Field matching name exists, but it isn't public.
-                    return null;
-                }
-            } else {
-                // Field matching name exists, but static qualifier doesn't match requested
-                // field.
-                return null;
+        char[] packed = new char[size];
+        int pos = 0;
+        for (int i = 0; i < strings.length; i++) {
+            int length = (strings[i] == null) ? -1 : strings[i].length();
+            packed[pos++] = (char) (length >>> 16);
+            packed[pos++] = (char) length;
+            if (length > 0) {
+                strings[i].getChars(0, length, packed, pos);
+                pos += length;
+            }
+        }
+        return packed;
+    }
+
+    /**
+     * Unpack an array of strings from a single array of UTF-16 characters.
+     *
+     * This is the inverse of packStrings().
+     *
+     * @param packed The packed characters.
+     * @param count  The number of strings in the packed characters.
+     * @return The unpacked strings.
+     */
+    public static String[] unpackStrings(char[] packed, int count) {
+        String[] strings = new String[count];
+        int pos = 0;
+        for (int i = 0; i < count; i++) {
+            int length = (packed[pos] << 16) | packed[pos + 1];
+            pos += 2;
+            if (length != -1) {
+                strings[i] = new String(packed, pos, length);
+                pos += length;
             }
-        } catch (NoSuchFieldException e) {
-            // No field matching requested name.
-            return null;
         }
+        return strings;
     }
 }
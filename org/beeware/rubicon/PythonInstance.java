@@ -1,22 +1,105 @@
 package org.beeware.rubicon;
 
+import java.lang.ref.PhantomReference;
+import java.lang.ref.ReferenceQueue;
 import java.lang.reflect.InvocationHandler;
 import java.lang.reflect.Method;
 
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.HashSet;
+import java.util.List;
+import java.util.Set;
+
 
 public class PythonInstance implements InvocationHandler {
     /**
-     * The Python instance ID.
+     * The token identifying the Python instance.
      */
     public long instance;
 
+    /**
+     * The queue of handlers (and other tracked objects) that have become
+     * unreachable.
+     */
+    private static ReferenceQueue<Object> _released;
+
+    /**
+     * The references tracking live handlers. A reference must itself be
+     * reachable in order to be added to the queue.
+     */
+    private static Set<InstanceReference> _references;
+
+    /**
+     * The tokens of collected handlers that haven't been reported to
+     * Python yet.
+     */
+    private static List<Long> _releasedInstances;
+
+    /**
+     * A reference that retains the token of a handler (or other tracked
+     * object) after it has been collected.
+     */
+    private static class InstanceReference extends PhantomReference<Object> {
+        public long instance;
+
+        InstanceReference(Object referent, long inst) {
+            super(referent, _released);
+            instance = inst;
+        }
+    }
+
+    static {
+        _released = new ReferenceQueue<Object>();
+        _references = Collections.synchronizedSet(new HashSet<InstanceReference>());
+        _releasedInstances = new ArrayList<Long>();
+
+        // When a handler (and the proxy using it) has been collected, nothing
+        // in Java can invoke the Python object any more. Record its token, so
+        // Python can release the object the next time it collects released
+        // tokens. This thread never calls into Python, as Python may not
+        // release the GIL while control is in Java.
+        Thread releaser = new Thread(new Runnable() {
+            public void run() {
+                while (true) {
+                    try {
+                        InstanceReference reference = (InstanceReference) _released.remove();
+                        _references.remove(reference);
+                        synchronized (_releasedInstances) {
+                            _releasedInstances.add(Long.valueOf(reference.instance));
+                        }
+                    } catch (InterruptedException e) {
+                        return;
+                    }
+                }
+            }
+        }, "rubicon-proxy-release");
+        releaser.setDaemon(true);
+        releaser.start();
+    }
+
     /**
      * A representation of a Python object on the Java side.
      *
-     * @param inst The Python instance ID of the object.
+     * @param inst The token identifying the Python object.
      */
     public PythonInstance(long inst) {
         instance = inst;
+        _references.add(new InstanceReference(this, inst));
+    }
+
+    /**
+     * Track the lifetime of a Java object that depends on a Python object.
+     *
+     * Once obj has been collected, the token is reported by released(), so
+     * Python can release the object that obj depended on (for example, the
+     * memory of a direct buffer).
+     *
+     * @param obj  The Java object to track.
+     * @param inst The token identifying the Python object.
+     */
+    public static void track(Object obj, long inst) {
+        _references.add(new InstanceReference(obj, inst));
     }
 
     /**
@@ -31,4 +114,21 @@ public class PythonInstance implements InvocationHandler {
      * @return The return value from the Python method.
      */
     public native Object invoke(Object proxy, Method method, Object[] args) throws Throwable;
+
+    /**
+     * Retrieve the tokens of the handlers (and tracked objects) that have
+     * been collected since the last time this method was called.
+     *
+     * @return The tokens identifying the Python objects that can be released.
+     */
+    public static long[] released() {
+        synchronized (_releasedInstances) {
+            long[] tokens = new long[_releasedInstances.size()];
+            for (int i = 0; i < tokens.length; i++) {
+                tokens[i] = ((Long) _releasedInstances.get(i)).longValue();
+            }
+            _releasedInstances.clear();
+            return tokens;
+        }
+    }
 }
@@ -246,6 +246,19 @@ public class Example extends BaseExample {
         return in + in + in;
     }
 
+    /* Overloads accepting different types in an object's hierarchy */
+    public static String overload_kind(Object in) {
+        return "Object";
+    }
+
+    public static String overload_kind(Iterable in) {
+        return "Iterable";
+    }
+
+    public static String overload_kind(java.util.Collection in) {
+        return "Collection";
+    }
+
     /* Handling long argument lists */
     public String combiner(int x, String name, Thing thing, ICallback callback, int [] values) {
         if (name == null) {
@@ -1,5 +1,11 @@
 from .api import *   # noqa; F401, F403
+from .buffers import *  # noqa; F401, F403
 from .jni import *   # noqa; F401, F403
+from .metadata import *  # noqa; F401, F403
+from .refs import *  # noqa; F401, F403
+from .strings import *  # noqa; F401, F403
+from .tracing import *  # noqa; F401, F403
 from .types import *  # noqa; F401, F403
+from .warmup import *  # noqa; F401, F403
 
 __version__ = '0.2.6'
@@ -1,9 +1,21 @@
-from ctypes import cast
+import array as array_module
+from contextlib import contextmanager
+from ctypes import cast, sizeof
 from collections.abc import Sequence
 import itertools
-
-from .jni import java, reflect
+import sys
+import threading
+import time
+
+from .jni import java, native, reflect
+from .metadata import cache_class, cached_class
+from .refs import release_global_ref, track_instance
+from .strings import (
+    JavaString, _current_string_return_type, new_string, pack_strings, returned_string, string_value, unpack_strings,
+)
+from .tracing import record_resolution
 from .types import (
+    jarray,
     jboolean, jbooleanArray,
     jbyte, jbyteArray,
     jchar, jclass,
@@ -13,23 +25,68 @@ from .types import (
     jlong, jlongArray,
     jobject, jobjectArray,
     jshort, jshortArray,
-    jstring,
+    jstring, jvalue,
 )
 
-# A cache of known JavaInterface proxies. This is used by the dispatch
-# mechanism to direct callbacks to the right place.
+# A registry of the Python objects that have been proxied into Java. This is
+# used by the dispatch mechanism to direct callbacks to the right place.
+# Each Java-side proxy is identified by a unique token; the registry holds
+# the Python object for as long as Java holds a proxy that uses the token.
+# The registry also holds Python objects that other Java objects depend on
+# (see _retain_for_java()), under tokens from the same sequence.
 _proxy_cache = {}
+_proxy_tokens = itertools.count(1)
+
+
+def release_proxies():
+    """Release the Python objects whose Java-side proxies have been collected.
+    Once a Java-side proxy is unreachable, there's nothing on the Java side
+    that can invoke the Python object, so it can be removed from the registry.
+    Java records the tokens of collected proxies; they are retrieved whenever
+    a new proxy is created, or when this function is called.
+    Python objects retained for other Java objects are released in the same
+    way, once those Java objects have been collected.
+    Returns the number of objects that were released.
+    """
+    ref = java.CallStaticObjectMethodA(reflect.PythonInstance, reflect.PythonInstance__released, None)
+    if ref.value is None:
+        java.ExceptionClear()
+        raise RuntimeError("Unable to retrieve released proxies.")
+    tokens = jlongArray(ref.value)
+    length = java.GetArrayLength(tokens)
+    values = (jlong * length)()
+    java.GetLongArrayRegion(tokens, 0, length, values)
+    java.DeleteLocalRef(tokens)
+
+    released = 0
+    for token in values:
+        if _proxy_cache.pop(token, None) is not None:
+            released += 1
+    return released
+
+
+def _retain_for_java(instance, obj):
+    """Keep obj alive for as long as the Java object wrapped by instance is
+    reachable from Java, even if every Python wrapper of it is released.
+    """
+    token = next(_proxy_tokens)
+    _proxy_cache[token] = obj
+    java.CallStaticVoidMethodA(
+        reflect.PythonInstance,
+        reflect.PythonInstance__track,
+        (jvalue * 2)(jvalue(l=instance.__jni__), jvalue(j=token)),
+    )
 
 
 def dispatch(instance, method, args):
     """The mechanism by which Java can invoke methods in Python.
     This method should be invoked with an:
-     * an ID for a Python object
+     * the token identifying the proxied Python object
      * a string representing a method name, and
      * a (void *) array of arguments. The arguments should be memory
        references to JNI objects.
-    The ID is used to look up the instance from the cache of proxy instances
-    that have been instantiated; Python method lookup is then used to invoke
+    The token is used to look up the instance from the registry of proxy
+    instances that are in use by Java; Python method lookup is then used to invoke
     the appropriate method, and provide the arguments (after casting to
     valid Python objects).
     This method returns either `None` or a Python `int`. if the Python callable
@@ -69,98 +126,43 @@ def dispatch(instance, method, args):
 # Methods to convert argument lists into a signature, and vice versa
 ###########################################################################
 
-def convert_args(args, type_names):
-    """Convert a list of arguments to be in a format compliant with the JNI signature.
-    This means:
-     * casting primitives into the apprpriate jXXX ctypes objects,
-     * Strings into Java string objects, and
-     * JavaInstance/JavaProxy objects into their JNI references.
+# The Java array type that can hold the items of a buffer, keyed by the
+# item format (in struct module syntax) and item size.
+_BUFFER_SIGNATURES = {
+    ('?', 1): b'[Z',
+    ('b', 1): b'[B',
+    ('B', 1): b'[B',
+    ('c', 1): b'[B',
+    ('h', 2): b'[S',
+    ('i', 4): b'[I',
+    ('l', 4): b'[I',
+    ('l', 8): b'[J',
+    ('q', 8): b'[J',
+    ('f', 4): b'[F',
+    ('d', 8): b'[D',
+}
+
+
+# The byte order prefixes of buffer formats whose items are in native byte
+# order, and can be copied into a Java array as-is.
+_NATIVE_BYTE_ORDERS = {'', '@', '='} | ({'<'} if sys.byteorder == 'little' else {'>', '!'})
+
+
+def buffer_array_signature(arg):
+    """Determine the Java primitive array type for an object supporting the buffer protocol.
+    Returns None if the object doesn't support the buffer protocol, if the
+    items of the buffer don't correspond to a Java primitive type, or if the
+    items aren't in native byte order.
     """
-    converted = []
-    for type_name, arg in zip(type_names, args):
-        if isinstance(arg, jboolean):
-            converted.append(arg)
-        elif isinstance(arg, bool):
-            converted.append(jboolean(arg))
-        elif isinstance(arg, jbyte):
-            converted.append(arg)
-        elif isinstance(arg, jchar):
-            converted.append(arg)
-        elif isinstance(arg, jshort):
-            converted.append(arg)
-        elif isinstance(arg, jint):
-            converted.append(arg)
-        elif isinstance(arg, int):
-            if type_name == b'I':
-                converted.append(jint(arg))
-            elif type_name == b'J':
-                converted.append(jlong(arg))
-            elif type_name == b'S':
-                converted.append(jshort(arg))
-            else:
-                raise ValueError("Unexpected type name for int argument.")
-        elif isinstance(arg, jlong):
-            converted.append(arg)
-        elif isinstance(arg, jfloat):
-            converted.append(jdouble(arg.value))
-        elif isinstance(arg, float):
-            # The JNI method uses VA_ARGS, and VA_ARGS transparently
-            # converts floats to doubles; so regardless of whether the
-            # argument is F or D, cast to jdouble.
-            converted.append(jdouble(arg))
-        elif isinstance(arg, jdouble):
-            converted.append(arg)
-        elif isinstance(arg, bytes):
-            jarg = java.NewByteArray(len(arg))
-            java.SetByteArrayRegion(jarg, 0, len(arg), (jbyte * len(arg))(*arg))
-            converted.append(jarg)
-        elif isinstance(arg, str):
-            converted.append(java.NewStringUTF(arg.encode('utf-8')))
-        elif isinstance(arg, Sequence):
-            if type_name == b'[Z':
-                jarg = java.NewBooleanArray(len(arg))
-                java.SetBooleanArrayRegion(jarg, 0, len(arg), (jboolean * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[S':
-                jarg = java.NewShortArray(len(arg))
-                java.SetShortArrayRegion(jarg, 0, len(arg), (jshort * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[I':
-                jarg = java.NewIntArray(len(arg))
-                java.SetIntArrayRegion(jarg, 0, len(arg), (jint * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[J':
-                jarg = java.NewLongArray(len(arg))
-                java.SetLongArrayRegion(jarg, 0, len(arg), (jlong * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[F':
-                jarg = java.NewFloatArray(len(arg))
-                java.SetFloatArrayRegion(jarg, 0, len(arg), (jfloat * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[D':
-                jarg = java.NewDoubleArray(len(arg))
-                java.SetDoubleArrayRegion(jarg, 0, len(arg), (jdouble * len(arg))(*arg))
-                converted.append(jarg)
-            elif type_name == b'[Ljava/lang/String;':
-                jarg = java.NewObjectArray(len(arg), JavaClass('java/lang/String').__jni__, None)
-                for i, obj in enumerate(arg):
-                    java.SetObjectArrayElement(jarg, i, java.NewStringUTF(obj.encode('utf-8')))
-                converted.append(jarg)
-            elif type_name.startswith(b'[L'):
-                jarg = java.NewObjectArray(len(arg), JavaClass(type_name[2:-1].decode('utf-8')).__jni__, None)
-                for i, obj in enumerate(arg):
-                    java.SetObjectArrayElement(jarg, i, obj.__jni__)
-                converted.append(jarg)
-            else:
-                raise ValueError("Unknown argument type", arg, type(arg))
-        elif isinstance(arg, (JavaInstance, JavaProxy)):
-            converted.append(arg.__jni__)
-        elif isinstance(arg, JavaNull):
-            converted.append(None)
-        else:
-            raise ValueError("Unknown argument type", arg, type(arg))
-
-    return converted
+    try:
+        with memoryview(arg) as view:
+            format = view.format
+            order = format[:1] if format[:1] in '@=<>!' else ''
+            if order not in _NATIVE_BYTE_ORDERS:
+                return None
+            return _BUFFER_SIGNATURES.get((format[len(order):], view.itemsize))
+    except TypeError:
+        return None
 
 
 def select_polymorph(polymorphs, args):
@@ -211,7 +213,7 @@ def select_polymorph(polymorphs, args):
                 arg_types.append([b'D', b'F'])
             elif isinstance(arg, jdouble):
                 arg_types.append([b'D'])
-            elif isinstance(arg, str):
+            elif isinstance(arg, (str, JavaString)):
                 arg_types.append([
                     b"Ljava/lang/String;",
                     b"Ljava/io/Serializable;",
@@ -220,8 +222,14 @@ def select_polymorph(polymorphs, args):
                     b"Ljava/lang/Object;",
                 ])
             # If char arrays are useful to handle, add them later. Handle all other types of primitive type arrays.
+            elif isinstance(arg, JavaArray):
+                arg_types.append([arg._signature])
             elif isinstance(arg, bytes):
                 arg_types.append([b'[B'])
+            elif not isinstance(arg, (list, tuple, JavaInstance, JavaProxy, JavaNull)) and buffer_array_signature(arg):
+                # Buffers (bytearray, array.array, memoryview, ...) map
+                # onto the array type that matches their item format.
+                arg_types.append([buffer_array_signature(arg)])
             elif isinstance(arg, Sequence) and len(arg) > 0:
                 # If arg is an iterable of all the same basic numeric type, then
                 # an array of that Java type can work.
@@ -265,8 +273,8 @@ def select_polymorph(polymorphs, args):
                         arg_types.append([b'[D'])
                     else:
                         raise ValueError("Unable to treat all data in list as doubles")
-                elif isinstance(arg[0], (str, jstring)):
-                    if all(isinstance(item, (str, jstring)) for item in arg):
+                elif isinstance(arg[0], (str, jstring, JavaString)):
+                    if all(isinstance(item, (str, jstring, JavaString)) for item in arg):
                         arg_types.append([b'[Ljava/lang/String;'])
                     else:
                         raise ValueError("Unable to treat all data in list as strings")
@@ -277,7 +285,9 @@ def select_polymorph(polymorphs, args):
                         raise ValueError("Unable to treat all data in list as objects")
                 else:
                     raise ValueError("Unable convert sequence into array of Java primitive types")
-            elif isinstance(arg, (JavaInstance, JavaProxy)):
+            elif isinstance(arg, JavaInstance):
+                arg_types.append(_class_alternates(arg.__class__))
+            elif isinstance(arg, JavaProxy):
                 arg_types.append(arg.__class__.__dict__['_alternates'])
             elif isinstance(arg, JavaNull):
                 arg_types.append([arg._signature])
@@ -287,15 +297,162 @@ def select_polymorph(polymorphs, args):
         arg_sig = b''.join(t[0] for t in arg_types)
         options = list(itertools.product(*arg_types))
 
-    # Try all the possible interpretations of the arguments
-    # as polymorphic forms.
-    for option in options:
-        try:
-            return option, polymorphs[b''.join(option)]
-        except KeyError:
-            pass
+    objects = [isinstance(arg, (JavaInstance, JavaProxy)) for arg in args]
+    if not any(objects):
+        # Try all the possible interpretations of the arguments
+        # as polymorphic forms.
+        for option in options:
+            try:
+                return option, polymorphs[b''.join(option)]
+            except KeyError:
+                pass
+        raise KeyError(arg_sig)
 
-    raise KeyError(arg_sig)
+    # Nothing is more specific than the exact types of the arguments.
+    try:
+        return options[0], polymorphs[b''.join(options[0])]
+    except KeyError:
+        pass
+
+    # Objects can be passed as any type in their hierarchy, including the
+    # interfaces extended by the interfaces of their class. Find every
+    # polymorph that can accept the arguments...
+    candidates = []
+    for params_signature, polymorph in polymorphs.items():
+        param_types = type_names_for_signature(params_signature)
+        if len(param_types) != len(args):
+            continue
+        for arg, is_object, types, param_type in zip(args, objects, arg_types, param_types):
+            if param_type not in types and not (is_object and _is_assignable(arg.__class__, param_type)):
+                break
+        else:
+            candidates.append((param_types, polymorph))
+    if not candidates:
+        raise KeyError(arg_sig)
+
+    # ... and, as Java does, choose the most specific of them. Candidates
+    # that are equally specific are chosen in order of preference of the
+    # argument types.
+    candidates.sort(key=lambda candidate: [
+        types.index(param_type) if param_type in types else len(types)
+        for types, param_type in zip(arg_types, candidate[0])
+    ])
+    best_types, best = candidates[0]
+    for param_types, polymorph in candidates[1:]:
+        if (
+            _is_more_specific(param_types, best_types, arg_types)
+            and not _is_more_specific(best_types, param_types, arg_types)
+        ):
+            best_types, best = param_types, polymorph
+    return best_types, best
+
+
+def _is_more_specific(param_types, other_types, arg_types):
+    """Determine if every parameter type of a polymorph is at least as
+    specific as the corresponding parameter type of another polymorph: an
+    object type that can be passed as the other type, or a type that is
+    preferred for the argument.
+    """
+    for types, param_type, other_type in zip(arg_types, param_types, other_types):
+        if param_type == other_type:
+            continue
+        if param_type.startswith(b'L') and other_type.startswith(b'L'):
+            try:
+                param_class = JavaClass(param_type[1:-1].decode('utf-8'))
+            except UnknownClassException:
+                return False
+            if not _is_assignable(param_class, other_type):
+                return False
+        elif param_type not in types or other_type not in types or types.index(param_type) > types.index(other_type):
+            return False
+    return True
+
+
+# Argument types whose polymorph selection depends only on the type itself.
+_SELECTION_KEY_TYPES = {
+    bool, int, float, str, bytes, JavaString,
+    jboolean, jbyte, jchar, jshort, jint, jlong, jfloat, jdouble,
+}
+
+
+def selection_key(args):
+    """Determine the key describing the shape of an argument list for polymorph selection.
+    The key contains one element per argument:
+     * the Python type of the argument (for JavaInstance and JavaProxy objects,
+       this is the class, which determines the alternate types),
+     * the signature of a JavaNull,
+     * the type of the object and the Java array type that matches its
+       items, for an object supporting the buffer protocol, or
+     * the type of the sequence and the type of its items, for a sequence
+       where every item has the same type.
+    Returns None if the selection for the arguments can't be cached (e.g.,
+    an empty or heterogenous sequence).
+    """
+    key = []
+    for arg in args:
+        arg_type = arg.__class__
+        if arg_type in _SELECTION_KEY_TYPES or isinstance(arg, (JavaInstance, JavaProxy)):
+            key.append(arg_type)
+        elif isinstance(arg, JavaNull):
+            key.append(arg._signature)
+        elif arg_type is JavaArray:
+            key.append((arg_type, arg._signature))
+        elif arg_type not in (list, tuple) and buffer_array_signature(arg):
+            key.append((arg_type, buffer_array_signature(arg)))
+        elif isinstance(arg, Sequence) and len(arg) > 0:
+            item_type = arg[0].__class__
+            for item in arg:
+                if item.__class__ is not item_type:
+                    return None
+            key.append((arg_type, item_type))
+        else:
+            return None
+    return tuple(key)
+
+
+class SelectionCache:
+    """A bounded cache of polymorph selections, keyed by the shape of the arguments.
+    Selecting a polymorph requires trying every interpretation of the arguments
+    until a signature matches; for a given method, the result only depends on
+    the types of the arguments (see selection_key()), so it can be cached.
+    The cache stores the matched types and signature, rather than the polymorph,
+    so polymorphs that are updated after selection (e.g., constructors, which
+    are resolved the first time they are used) are always current.
+    When the cache is full, the oldest entry is discarded.
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._selections = {}
+
+    def __len__(self):
+        return len(self._selections)
+
+    def clear(self):
+        self._selections.clear()
+
+    def select(self, polymorphs, args):
+        """Select the polymorph matching the provided args.
+        Returns the same 2-tuple as select_polymorph(), and raises
+        KeyError under the same conditions.
+        """
+        key = selection_key(args)
+        if key is not None:
+            try:
+                match_types, signature = self._selections[key]
+                self.hits += 1
+                return match_types, polymorphs[signature]
+            except KeyError:
+                pass
+
+        self.misses += 1
+        match_types, polymorph = select_polymorph(polymorphs, args)
+        if key is not None:
+            if len(self._selections) >= self.maxsize:
+                del self._selections[next(iter(self._selections))]
+            self._selections[key] = (match_types, b''.join(match_types))
+        return match_types, polymorph
 
 
 def signature_for_type_name(type_name):
@@ -344,7 +501,7 @@ def type_names_for_params(params):
         if type_name.value is None:
             raise RuntimeError("Unable to get name of type for parameter.")
 
-        param_type = java.GetStringUTFChars(cast(type_name, jstring), None)
+        param_type = string_value(type_name).encode('utf-8')
 
         sig.append(signature_for_type_name(param_type))
 
@@ -353,6 +510,19 @@ def type_names_for_params(params):
     return tuple(sig)
 
 
+def shorty_for_type_names(type_names):
+    """Determine the "shorty" for a list of JNI type signatures.
+    The shorty is the form of signature used by the native invokers. It contains
+    a single type code per argument; primitives use their JNI type code, and
+    all reference types (objects and arrays) use 'L'.
+    (i.e., [b'I', b'Ljava/lang/String;', b'[I'] has a shorty of b'ILL')
+    """
+    return b''.join(
+        b'L' if type_name[:1] in (b'L', b'[') else type_name[:1]
+        for type_name in type_names
+    )
+
+
 def signature_for_params(params):
     """Determine the JNI-style signature string for an array of Java parameters.
     This is used to convert a Method declaration into a string signature
@@ -361,6 +531,120 @@ def signature_for_params(params):
     return b''.join(type_names_for_params(params))
 
 
+# The representations that can be used for arrays returned by Java.
+ARRAY_RETURN_TYPES = ('list', 'array', 'bytearray', 'memoryview', 'JavaArray')
+
+# Passed to Release<Type>ArrayElements to discard a copy without writing it back.
+_JNI_ABORT = 2
+
+# For each primitive array type: the JNI array type, the element type, the
+# array.array typecode and memoryview format for the elements, and the JNI
+# functions used to read the array.
+_PRIMITIVE_ARRAYS = {
+    b'[Z': (jbooleanArray, jboolean, 'B', '?', java.GetBooleanArrayRegion,
+            java.GetBooleanArrayElements, java.ReleaseBooleanArrayElements),
+    b'[B': (jbyteArray, jbyte, 'b', 'b', java.GetByteArrayRegion,
+            java.GetByteArrayElements, java.ReleaseByteArrayElements),
+    b'[S': (jshortArray, jshort, 'h', 'h', java.GetShortArrayRegion,
+            java.GetShortArrayElements, java.ReleaseShortArrayElements),
+    b'[I': (jintArray, jint, 'i', 'i', java.GetIntArrayRegion,
+            java.GetIntArrayElements, java.ReleaseIntArrayElements),
+    b'[J': (jlongArray, jlong, 'q', 'q', java.GetLongArrayRegion,
+            java.GetLongArrayElements, java.ReleaseLongArrayElements),
+    b'[F': (jfloatArray, jfloat, 'f', 'f', java.GetFloatArrayRegion,
+            java.GetFloatArrayElements, java.ReleaseFloatArrayElements),
+    b'[D': (jdoubleArray, jdouble, 'd', 'd', java.GetDoubleArrayRegion,
+            java.GetDoubleArrayElements, java.ReleaseDoubleArrayElements),
+}
+
+_array_return_type = 'list'
+_local_array_return_type = threading.local()
+
+
+def _check_array_return_type(kind):
+    if kind not in ARRAY_RETURN_TYPES:
+        raise ValueError("Unknown array return type %r; must be one of %s" % (kind, ', '.join(ARRAY_RETURN_TYPES)))
+
+
+def set_array_return_type(kind):
+    """Set how arrays returned by Java are represented in Python.
+    kind is one of:
+     * 'list' - a list of Python values (the default). Byte arrays are
+       returned as bytes.
+     * 'array' - an array.array with the matching item type.
+     * 'bytearray' - a bytearray holding the raw contents of the array.
+     * 'memoryview' - a memoryview over the raw contents of the array, with
+       the matching item format.
+     * 'JavaArray' - a JavaArray, which retrieves items as they are used.
+    'array', 'bytearray' and 'memoryview' only apply to primitive arrays,
+    and copy the contents with a single Get<Type>ArrayRegion call; arrays
+    of objects are returned as lists. 'JavaArray' applies to all arrays.
+    Returns the previous setting.
+    """
+    global _array_return_type
+    _check_array_return_type(kind)
+    previous = _array_return_type
+    _array_return_type = kind
+    return previous
+
+
+@contextmanager
+def array_return_type(kind):
+    """Use a different representation for arrays returned by Java inside a block.
+    The setting only applies to the current thread:
+
+        with array_return_type('memoryview'):
+            pixels = bitmap_helper.getPixels()
+
+    See set_array_return_type() for the available kinds.
+    """
+    _check_array_return_type(kind)
+    previous = getattr(_local_array_return_type, 'kind', None)
+    _local_array_return_type.kind = kind
+    try:
+        yield
+    finally:
+        _local_array_return_type.kind = previous
+
+
+def _current_array_return_type():
+    return getattr(_local_array_return_type, 'kind', None) or _array_return_type
+
+
+def _primitive_array(raw, return_signature):
+    """Convert a reference to a Java primitive array into a Python object.
+    The representation is determined by the array return type.
+    """
+    (
+        array_type, element_type, typecode, item_format, get_region, get_elements, release_elements
+    ) = _PRIMITIVE_ARRAYS[return_signature]
+    array = cast(raw, array_type)
+    length = java.GetArrayLength(array)
+    kind = _current_array_return_type()
+
+    if kind == 'list' and return_signature != b'[B':
+        value = get_elements(array, None)
+        try:
+            return value[:length]
+        finally:
+            release_elements(array, value, _JNI_ABORT)
+
+    if kind == 'array':
+        result = array_module.array(typecode, [0]) * length
+    else:
+        result = bytearray(length * sizeof(element_type))
+
+    if length:
+        get_region(array, 0, length, (element_type * length).from_buffer(result))
+
+    if kind == 'list':
+        # Byte arrays are returned as a byte string
+        return bytes(result)
+    elif kind == 'memoryview':
+        return memoryview(result).cast(item_format)
+    return result
+
+
 def return_cast(raw, return_signature):
     """Convert the return value from a JNI call into a Python value.
     The raw value is the value returned by the JNI call; the value returned
@@ -368,7 +652,9 @@ def return_cast(raw, return_signature):
     Primitive types are returned in the right format, and are not modified.
     Strings are turned into Python unicode objects.
     Objects are provided as JNI references, which are wrapped into an
-    instance of the relevant JavaClass.
+    instance of the relevant JavaClass that holds a global reference.
+    The raw value must be a local reference; it is released once it has
+    been converted.
     """
     if return_signature in {
         b'V',  # void
@@ -383,78 +669,69 @@ def return_cast(raw, return_signature):
     }:
         return raw
 
-    elif return_signature == b'Ljava/lang/String;':
+    # The native invokers return references as integer addresses (or None)
+    if not isinstance(raw, jobject):
+        raw = jobject(raw)
+
+    if return_signature == b'Ljava/lang/String;':
         # Check for NULL return values
         if raw.value:
-            return java.GetStringUTFChars(cast(raw, jstring), None).decode('utf-8')
+            value = returned_string(raw)
+            java.DeleteLocalRef(raw)
+            return value
         return JavaNull(return_signature)
 
     elif return_signature.startswith(b'L'):
         # Check for NULL return values
         if raw.value:
-            return JavaClass(return_signature[1:-1].decode('utf-8'))(__jni__=raw)
+            instance = global_instance(JavaClass(return_signature[1:-1].decode('utf-8')), raw)
+            java.DeleteLocalRef(raw)
+            return instance
         return JavaNull(return_signature)
 
-    elif return_signature.startswith(b'['):
-        if return_signature == b'[B':
-            array = cast(raw, jbyteArray)
-            length = java.GetArrayLength(array)
-            value = java.GetByteArrayElements(array, None)
-            # Byte arrays can be converted into a byte string
-            return bytes(value[i] for i in range(length))
-        elif return_signature == b'[Z':
-            array = cast(raw, jbooleanArray)
-            length = java.GetArrayLength(array)
-            value = java.GetBooleanArrayElements(array, None)
-        elif return_signature == b'[S':
-            array = cast(raw, jshortArray)
-            length = java.GetArrayLength(array)
-            value = java.GetShortArrayElements(array, None)
-        elif return_signature == b'[I':
-            array = cast(raw, jintArray)
-            length = java.GetArrayLength(array)
-            value = java.GetIntArrayElements(array, None)
-        elif return_signature == b'[J':
-            array = cast(raw, jlongArray)
-            length = java.GetArrayLength(array)
-            value = java.GetLongArrayElements(array, None)
-        elif return_signature == b'[F':
-            array = cast(raw, jfloatArray)
-            length = java.GetArrayLength(array)
-            value = java.GetFloatArrayElements(array, None)
-        elif return_signature == b'[D':
-            array = cast(raw, jdoubleArray)
-            length = java.GetArrayLength(array)
-            value = java.GetDoubleArrayElements(array, None)
-        elif return_signature.startswith(b'[L'):
-            array = cast(raw, jobjectArray)
-            length = java.GetArrayLength(array)
-            value = [
-                java.GetObjectArrayElement(array, i)
-                for i in range(length)
-            ]
-
-            # String is a special type of object; convert to Python strings.
-            # Otherwise, create wrapper JNI objects
-            if return_signature == b'[Ljava/lang/String;':
-                return [
-                    java.GetStringUTFChars(cast(obj, jstring), None).decode('utf-8')
-                    if obj.value
-                    else JavaNull(return_signature[1:])
-                    for obj in value
-                ]
-            else:
-                return [
-                    JavaClass(return_signature[2:-1].decode('utf-8'))(__jni__=obj)
-                    if obj.value
-                    else JavaNull(return_signature[1:])
-                    for obj in value
-                ]
-        else:
-            ValueError("Don't know how to cast return sequence signature '%s'" % return_signature.decode('utf-8'))
+    elif not raw.value:
+        return JavaNull(return_signature)
 
-        # Convert into a Python list
-        return [value[i] for i in range(length)]
+    elif (
+        (return_signature in _PRIMITIVE_ARRAYS or return_signature[1:2] in (b'L', b'['))
+        and _current_array_return_type() == 'JavaArray'
+    ):
+        jni = cast(java.NewGlobalRef(raw), jarray)
+        java.DeleteLocalRef(raw)
+        if jni.value is None:
+            raise RuntimeError("Unable to create global reference to array.")
+        return JavaArray(jni, return_signature)
+
+    elif return_signature in _PRIMITIVE_ARRAYS:
+        result = _primitive_array(raw, return_signature)
+        java.DeleteLocalRef(raw)
+        return result
+
+    elif return_signature == b'[Ljava/lang/String;' and _current_string_return_type() == 'str':
+        values = unpack_strings(raw)
+        java.DeleteLocalRef(raw)
+        null = JavaNull(b'Ljava/lang/String;')
+        return [null if value is None else value for value in values]
+
+    elif return_signature.startswith(b'[L'):
+        array = cast(raw, jobjectArray)
+        if return_signature != b'[Ljava/lang/String;':
+            result = _object_array(array, return_signature[1:], JavaClass(return_signature[2:-1].decode('utf-8')))
+            java.DeleteLocalRef(raw)
+            return result
+
+        length = java.GetArrayLength(array)
+        value = [
+            java.GetObjectArrayElement(array, i)
+            for i in range(length)
+        ]
+        java.DeleteLocalRef(raw)
+
+        # Convert each element as if it had been returned by a method.
+        return [
+            return_cast(obj, return_signature[1:])
+            for obj in value
+        ]
 
     raise ValueError("Don't know how to cast return signature '%s'" % return_signature.decode('utf-8'))
 
@@ -493,21 +770,401 @@ def dispatch_cast(raw, type_signature):
     elif type_signature == b'Ljava/lang/String;':
         # Check for NULL return values
         if jstring(raw).value:
-            return java.GetStringUTFChars(cast(raw, jstring), None).decode('utf-8')
+            return string_value(raw)
         return None
 
     elif type_signature.startswith(b'L'):
         # Check for NULL return values
         if jobject(raw).value:
-            gref = java.NewGlobalRef(jobject(raw))
             # print("Return type", type_signature)
             # print("Create returned instance")
-            return JavaClass(type_signature[1:-1].decode('utf-8'))(__jni__=gref)
+            return global_instance(JavaClass(type_signature[1:-1].decode('utf-8')), jobject(raw))
         return None
 
     raise ValueError("Don't know how to convert argument with type signature '%s'" % type_signature)
 
 
+###########################################################################
+# Conversion plans
+#
+# The conversion work needed to invoke a method is fully determined by the
+# signature of the polymorph being invoked. When a polymorph is registered,
+# a plan is compiled that contains one converter per argument, and a single
+# converter for the return value, so that invocation doesn't need to
+# re-examine argument types.
+###########################################################################
+
+def type_names_for_signature(signature):
+    """Split a JNI params signature into a tuple of individual type signatures.
+    (i.e., b'ILjava/lang/String;[Z' is split into
+    (b'I', b'Ljava/lang/String;', b'[Z'))
+    """
+    type_names = []
+    start = 0
+    i = 0
+    while i < len(signature):
+        code = signature[i:i + 1]
+        if code == b'[':
+            i += 1
+            continue
+        if code == b'L':
+            i = signature.index(b';', i)
+        i += 1
+        type_names.append(signature[start:i])
+        start = i
+    return tuple(type_names)
+
+
+def _convert_primitive(arg):
+    """Convert a Python or ctypes primitive argument into a Python value."""
+    if arg.__class__ in (bool, int, float):
+        return arg
+    if isinstance(arg, JavaNull):
+        return 0
+    return arg.value
+
+
+def _convert_char(arg):
+    """Convert a char argument into the integer value of the character."""
+    if isinstance(arg, JavaNull):
+        return 0
+    return ord(arg.value)
+
+
+def _convert_object(arg):
+    """Convert a String, object or NULL argument into a JNI reference address."""
+    if isinstance(arg, str):
+        return new_string(arg).value
+    if isinstance(arg, JavaNull):
+        return None
+    return arg._as_parameter_.value
+
+
+_ARRAY_CONVERSIONS = {
+    b'[Z': (jboolean, java.NewBooleanArray, java.SetBooleanArrayRegion),
+    b'[B': (jbyte, java.NewByteArray, java.SetByteArrayRegion),
+    b'[S': (jshort, java.NewShortArray, java.SetShortArrayRegion),
+    b'[I': (jint, java.NewIntArray, java.SetIntArrayRegion),
+    b'[J': (jlong, java.NewLongArray, java.SetLongArrayRegion),
+    b'[F': (jfloat, java.NewFloatArray, java.SetFloatArrayRegion),
+    b'[D': (jdouble, java.NewDoubleArray, java.SetDoubleArrayRegion),
+}
+
+
+def array_from_buffer(type_name, arg):
+    """Create a Java primitive array holding a copy of the contents of a buffer.
+    The contents are copied with a single Set<Type>ArrayRegion call, rather
+    than being converted item by item. Returns the address of a new local
+    reference to the array.
+    """
+    if native is not None:
+        try:
+            return native.NewArrayFromBuffer(type_name[1:], arg)
+        except BufferError:
+            # The buffer isn't contiguous; copy it into one that is.
+            return native.NewArrayFromBuffer(type_name[1:], memoryview(arg).tobytes())
+
+    element_type, new_array, set_region = _ARRAY_CONVERSIONS[type_name]
+    with memoryview(arg) as view:
+        if not view.c_contiguous:
+            view = memoryview(view.tobytes())
+        length = view.nbytes // sizeof(element_type)
+        if view.readonly:
+            items = (element_type * length).from_buffer_copy(view)
+        else:
+            items = (element_type * length).from_buffer(view.cast('B'))
+        jarg = new_array(length)
+        set_region(jarg, 0, length, items)
+        del items
+    return jarg.value
+
+
+def _new_object_array(element_class, items):
+    """Create a Java array holding a sequence of objects (or NULLs).
+    Returns the address of a new local reference to the array.
+    If the native invocation module is available, the array is created and
+    populated in a single call. Proxies need a new local reference each;
+    capacity for them is reserved up front, and they are released once the
+    array has been populated.
+    """
+    proxies = sum(1 for obj in items if isinstance(obj, JavaProxy))
+    if proxies and java.EnsureLocalCapacity(proxies) != 0:
+        java.ExceptionClear()
+        raise MemoryError("Unable to reserve %d local references" % proxies)
+
+    refs = [None if isinstance(obj, JavaNull) else obj._as_parameter_ for obj in items]
+    try:
+        if native is not None:
+            return native.NewObjectArray(element_class, refs)
+
+        jarg = java.NewObjectArray(len(refs), element_class, None)
+        for i, ref in enumerate(refs):
+            java.SetObjectArrayElement(jarg, i, ref)
+        return jarg.value
+    finally:
+        if proxies:
+            for obj, ref in zip(items, refs):
+                if isinstance(obj, JavaProxy):
+                    java.DeleteLocalRef(ref)
+
+
+def _object_array_elements(array, start, length):
+    """Retrieve a range of the elements of a Java array of objects.
+    Returns a list of the addresses of new global references to the
+    elements (or None, for NULL elements).
+    """
+    if native is not None:
+        return native.GetObjectArrayElements(array, start, length)
+
+    refs = []
+    for i in range(start, start + length):
+        local = java.GetObjectArrayElement(array, i)
+        if local.value is None:
+            refs.append(None)
+        else:
+            refs.append(java.NewGlobalRef(local).value)
+            java.DeleteLocalRef(local)
+    return refs
+
+
+def _object_array(array, element_signature, java_class):
+    """Convert a reference to a Java array of objects into a list.
+    Each element is wrapped as an instance of java_class, which takes
+    ownership of a global reference retrieved in bulk; NULL elements are
+    returned as typed NULLs. The reference to the array is not released.
+    """
+    refs = _object_array_elements(array, 0, java.GetArrayLength(array))
+    return [
+        owned_instance(java_class, jclass(ref)) if ref else JavaNull(element_signature)
+        for ref in refs
+    ]
+
+
+def _array_converter(type_name):
+    """Compile the converter for an array argument with the given type signature."""
+    if type_name in _ARRAY_CONVERSIONS:
+        element_type, new_array, set_region = _ARRAY_CONVERSIONS[type_name]
+
+        def convert(arg):
+            if isinstance(arg, JavaNull):
+                return None
+            if not isinstance(arg, (list, tuple)):
+                try:
+                    return array_from_buffer(type_name, arg)
+                except TypeError:
+                    # Not a buffer; convert the items of the sequence.
+                    pass
+            jarg = new_array(len(arg))
+            set_region(jarg, 0, len(arg), (element_type * len(arg))(*arg))
+            return jarg.value
+
+    elif type_name == b'[Ljava/lang/String;':
+        def convert(arg):
+            if isinstance(arg, JavaNull):
+                return None
+            if all(obj is None or obj.__class__ is str for obj in arg):
+                return pack_strings(arg).value
+            jarg = java.NewObjectArray(len(arg), reflect.String, None)
+            for i, obj in enumerate(arg):
+                if isinstance(obj, str):
+                    jobj = new_string(obj)
+                    java.SetObjectArrayElement(jarg, i, jobj)
+                    java.DeleteLocalRef(jobj)
+                else:
+                    java.SetObjectArrayElement(jarg, i, obj)
+            return jarg.value
+
+    elif type_name.startswith(b'[L'):
+        # The element class is resolved the first time it is needed,
+        # and retained by the converter (and so, by the conversion plan).
+        element_class = None
+
+        def convert(arg):
+            nonlocal element_class
+            if isinstance(arg, JavaNull):
+                return None
+            if element_class is None:
+                element_class = JavaClass(type_name[2:-1].decode('utf-8')).__jni__
+            return _new_object_array(element_class, arg)
+
+    else:
+        def convert(arg):
+            if isinstance(arg, JavaNull):
+                return None
+            raise ValueError("Unknown argument type", arg, type(arg))
+
+    def convert_array(arg):
+        # An array that is already in Java can be passed as-is.
+        if isinstance(arg, JavaArray):
+            return arg.__jni__.value
+        return convert(arg)
+
+    return convert_array
+
+
+def converter_for_type_name(type_name):
+    """Compile the converter for an argument with the given type signature.
+    The converter turns an argument into a plain Python value that can be
+    handed to an invoker:
+     * primitives become a Python bool, int or float (chars become the
+       integer value of the character),
+     * Strings, objects and arrays become the address of a JNI reference,
+     * NULLs become None (or 0 for primitives).
+    """
+    if type_name[:1] == b'[':
+        return _array_converter(type_name)
+    elif type_name[:1] == b'L':
+        return _convert_object
+    elif type_name == b'C':
+        return _convert_char
+    return _convert_primitive
+
+
+def _return_string(raw):
+    """Convert a String reference address returned by an invoker into a Python string
+    (or a JavaString, depending on the string return type).
+    The local reference to the String is released.
+    """
+    if raw:
+        value = returned_string(raw)
+        java.DeleteLocalRef(raw)
+        return value
+    return JavaNull(b'Ljava/lang/String;')
+
+
+def return_converter_for_signature(return_signature):
+    """Compile the converter for the return value of a method with the given return signature.
+    The converter receives the raw value returned by an invoker (a primitive
+    value, or the address of a JNI local reference), and produces the same
+    values as return_cast(); the local reference is released. Primitive return
+    values don't need conversion; None is returned for those signatures.
+    """
+    if return_signature[:1] not in (b'L', b'['):
+        return None
+
+    if return_signature == b'Ljava/lang/String;':
+        return _return_string
+
+    elif return_signature[:1] == b'L':
+        # The returned class is resolved the first time it is needed,
+        # as resolving a class can be expensive.
+        java_class = None
+
+        def convert(raw):
+            nonlocal java_class
+            if raw:
+                if java_class is None:
+                    java_class = JavaClass(return_signature[1:-1].decode('utf-8'))
+                instance = global_instance(java_class, raw)
+                java.DeleteLocalRef(raw)
+                return instance
+            return JavaNull(return_signature)
+
+        return convert
+
+    elif return_signature[:2] == b'[L' and return_signature != b'[Ljava/lang/String;':
+        # As for objects, the element class is resolved the first time it is needed.
+        element_class = None
+
+        def convert(raw):
+            nonlocal element_class
+            if raw and _current_array_return_type() != 'JavaArray':
+                if element_class is None:
+                    element_class = JavaClass(return_signature[2:-1].decode('utf-8'))
+                result = _object_array(jobjectArray(raw), return_signature[1:], element_class)
+                java.DeleteLocalRef(raw)
+                return result
+            return return_cast(jobject(raw), return_signature)
+
+        return convert
+
+    def convert(raw):
+        return return_cast(jobject(raw), return_signature)
+
+    return convert
+
+
+# The field of a jvalue that holds each type of argument.
+_JVALUE_FIELDS = {
+    b'Z': 'z',
+    b'B': 'b',
+    b'C': 'c',
+    b'S': 's',
+    b'I': 'i',
+    b'J': 'j',
+    b'F': 'f',
+    b'D': 'd',
+    b'L': 'l',
+}
+
+
+def select_invoker(function_name, shorty, return_signature):
+    """Select the invoker for a JNI Call* (or NewObject) function.
+    All invokers share a calling convention: they accept the target (an
+    object or class), the method ID, the shorty of the method, and a list
+    of plain argument values produced by the plan's converters. References
+    are returned as integer addresses (or None).
+    If the native invocation module is available, its invoker is used
+    directly. Otherwise, a ctypes invoker is compiled for the shorty; it
+    packs the arguments into a jvalue array that is allocated once per
+    thread, and invokes the jvalue array ("A") form of the JNI function.
+    """
+    if native:
+        return getattr(native, function_name)
+
+    function = getattr(java, function_name + 'A')
+    fields = tuple(_JVALUE_FIELDS[shorty[i:i + 1]] for i in range(len(shorty)))
+    buffers = threading.local()
+    returns_reference = return_signature[:1] in (b'L', b'[')
+
+    def invoke(target, jni, shorty, values):
+        try:
+            arguments = buffers.arguments
+        except AttributeError:
+            arguments = buffers.arguments = (jvalue * len(fields))()
+        for argument, field, value in zip(arguments, fields, values):
+            setattr(argument, field, value)
+        result = function(target, jni, arguments)
+        if returns_reference:
+            return result.value
+        return result
+
+    return invoke
+
+
+def conversion_plan(params_signature, return_signature):
+    """Compile the conversion plan for a polymorph with the given signature.
+    Returns a dictionary containing:
+     * return_signature - the JNI return signature of the polymorph
+     * shorty - the shorty for the arguments of the polymorph
+     * converters - a tuple of argument converters, one per argument
+     * references - a tuple of the indices of the reference arguments
+     * return_converter - the converter for the return value (or None)
+    """
+    type_names = type_names_for_signature(params_signature)
+    return {
+        'return_signature': return_signature,
+        'shorty': shorty_for_type_names(type_names),
+        'converters': tuple(converter_for_type_name(type_name) for type_name in type_names),
+        'references': tuple(
+            i for i, type_name in enumerate(type_names)
+            if type_name[:1] in (b'L', b'[')
+        ),
+        'return_converter': return_converter_for_signature(return_signature),
+    }
+
+
+def _release_arguments(references, args, values):
+    """Release the local references created by converting arguments.
+    Any reference argument that wasn't already a Java object (e.g., a
+    Python string or list, or a Python proxy) was converted into a new local
+    reference; once the invocation is complete, that reference can be deleted.
+    """
+    for i in references:
+        if values[i] and not isinstance(args[i], (JavaInstance, JavaArray, JavaString)):
+            java.DeleteLocalRef(values[i])
+
+
 ###########################################################################
 # Representations of Java Methods
 ###########################################################################
@@ -522,21 +1179,10 @@ class StaticJavaMethod(object):
         self.java_class = java_class
         self.name = name
         self._polymorphs = {}
+        self._selection_cache = SelectionCache()
 
     def add(self, params_signature, return_signature):
         if params_signature not in self._polymorphs:
-            invoker = {
-                b'V': java.CallStaticVoidMethod,
-                b'Z': java.CallStaticBooleanMethod,
-                b'B': java.CallStaticByteMethod,
-                b'C': java.CallStaticCharMethod,
-                b'S': java.CallStaticShortMethod,
-                b'I': java.CallStaticIntMethod,
-                b'J': java.CallStaticLongMethod,
-                b'F': java.CallStaticFloatMethod,
-                b'D': java.CallStaticDoubleMethod,
-            }.get(return_signature, java.CallStaticObjectMethod)
-
             full_signature = b'(%s)%s' % (params_signature, return_signature)
             jni = java.GetStaticMethodID(
                 self.java_class.__dict__['__jni__'],
@@ -544,27 +1190,36 @@ class StaticJavaMethod(object):
                 full_signature
             )
             if jni.value is None:
+                java.ExceptionClear()
                 raise RuntimeError("Couldn't find static Java method '%s.%s' with signature '%s'" % (
                     self.java_class.__dict__['_descriptor'].decode('utf-8'),
                     self.name,
                     full_signature.decode('utf-8'))
                 )
 
-            self._polymorphs[params_signature] = {
-                'return_signature': return_signature,
-                'invoker': invoker,
-                'jni': jni
-            }
+            polymorph = conversion_plan(params_signature, return_signature)
+            polymorph['jni'] = jni
+            polymorph['invoker'] = select_invoker(
+                {
+                    b'V': 'CallStaticVoidMethod',
+                    b'Z': 'CallStaticBooleanMethod',
+                    b'B': 'CallStaticByteMethod',
+                    b'C': 'CallStaticCharMethod',
+                    b'S': 'CallStaticShortMethod',
+                    b'I': 'CallStaticIntMethod',
+                    b'J': 'CallStaticLongMethod',
+                    b'F': 'CallStaticFloatMethod',
+                    b'D': 'CallStaticDoubleMethod',
+                }.get(return_signature, 'CallStaticObjectMethod'),
+                polymorph['shorty'],
+                return_signature,
+            )
+            self._polymorphs[params_signature] = polymorph
+            self._selection_cache.clear()
 
     def __call__(self, *args):
         try:
-            match_types, polymorph = select_polymorph(self._polymorphs, args)
-            result = polymorph['invoker'](
-                self.java_class.__dict__['__jni__'],
-                polymorph['jni'],
-                *convert_args(args, match_types)
-            )
-            return return_cast(result, polymorph['return_signature'])
+            match_types, polymorph = self._selection_cache.select(self._polymorphs, args)
         except KeyError as e:
             raise ValueError(
                 "Can't find Java static method '%s.%s' matching argument signature '%s'. Options are: %s" % (
@@ -578,26 +1233,31 @@ class StaticJavaMethod(object):
                 )
             )
 
+        values = [convert(arg) for convert, arg in zip(polymorph['converters'], args)]
+        try:
+            result = polymorph['invoker'](
+                self.java_class.__dict__['__jni__'],
+                polymorph['jni'],
+                polymorph['shorty'],
+                values
+            )
+        finally:
+            if polymorph['references']:
+                _release_arguments(polymorph['references'], args, values)
+
+        if polymorph['return_converter'] is None:
+            return result
+        return polymorph['return_converter'](result)
+
 
 class JavaMethod:
     def __init__(self, java_class, name):
         self.java_class = java_class
         self.name = name
         self._polymorphs = {}
+        self._selection_cache = SelectionCache()
 
     def add(self, params_signature, return_signature):
-        invoker = {
-            b'V': java.CallVoidMethod,
-            b'Z': java.CallBooleanMethod,
-            b'B': java.CallByteMethod,
-            b'C': java.CallCharMethod,
-            b'S': java.CallShortMethod,
-            b'I': java.CallIntMethod,
-            b'J': java.CallLongMethod,
-            b'F': java.CallFloatMethod,
-            b'D': java.CallDoubleMethod,
-        }.get(return_signature, java.CallObjectMethod)
-
         full_signature = b'(%s)%s' % (params_signature, return_signature)
         jni = java.GetMethodID(
             self.java_class.__dict__['__jni__'],
@@ -605,27 +1265,37 @@ class JavaMethod:
             full_signature,
         )
         if jni.value is None:
+            java.ExceptionClear()
             raise RuntimeError("Couldn't find Java method '%s.%s' with signature '%s'" % (
                 self.java_class.__dict__['_descriptor'].decode('utf-8'),
                 self.name,
                 full_signature.decode('utf-8')
             ))
 
-        self._polymorphs[params_signature] = {
-            'return_signature': return_signature,
-            'invoker': invoker,
-            'jni': jni
-        }
+        polymorph = conversion_plan(params_signature, return_signature)
+        polymorph['jni'] = jni
+        polymorph['invoker'] = select_invoker(
+            {
+                b'V': 'CallVoidMethod',
+                b'Z': 'CallBooleanMethod',
+                b'B': 'CallByteMethod',
+                b'C': 'CallCharMethod',
+                b'S': 'CallShortMethod',
+                b'I': 'CallIntMethod',
+                b'J': 'CallLongMethod',
+                b'F': 'CallFloatMethod',
+                b'D': 'CallDoubleMethod',
+            }.get(return_signature, 'CallObjectMethod'),
+            polymorph['shorty'],
+            return_signature,
+        )
+        self._polymorphs[params_signature] = polymorph
+        self._selection_cache.clear()
 
-    def __call__(self, instance, *args):
+    def _select(self, args):
+        "Select the polymorph of the method matching the given arguments"
         try:
-            match_types, polymorph = select_polymorph(self._polymorphs, args)
-            result = polymorph['invoker'](
-                instance,
-                polymorph['jni'],
-                *convert_args(args, match_types)
-            )
-            return return_cast(result, polymorph['return_signature'])
+            match_types, polymorph = self._selection_cache.select(self._polymorphs, args)
         except KeyError as e:
             raise ValueError(
                 "Can't find Java instance method '%s.%s' matching argument signature '%s'. Options are: %s" % (
@@ -638,6 +1308,76 @@ class JavaMethod:
                     )
                 )
             )
+        return polymorph
+
+    def __call__(self, instance, *args):
+        polymorph = self._select(args)
+
+        values = [convert(arg) for convert, arg in zip(polymorph['converters'], args)]
+        try:
+            result = polymorph['invoker'](instance, polymorph['jni'], polymorph['shorty'], values)
+        finally:
+            if polymorph['references']:
+                _release_arguments(polymorph['references'], args, values)
+
+        if polymorph['return_converter'] is None:
+            return result
+        return polymorph['return_converter'](result)
+
+    def map(self, instances, *args):
+        """Invoke the method on each of a sequence of instances, using the same arguments.
+
+        The method is selected, and the arguments are converted, once; if the
+        native invokers are available, all the invocations are made in a
+        single call into native code. Returns a list of the results.
+        """
+        polymorph = self._select(args)
+
+        return_converter = polymorph['return_converter']
+        values = [convert(arg) for convert, arg in zip(polymorph['converters'], args)]
+        try:
+            if native is None:
+                results = [
+                    polymorph['invoker'](instance, polymorph['jni'], polymorph['shorty'], values)
+                    for instance in instances
+                ]
+                if return_converter is None:
+                    return results
+                return [return_converter(result) for result in results]
+
+            return_signature = polymorph['return_signature']
+            results = native.MapMethod(
+                instances,
+                polymorph['jni'],
+                b'L' if return_signature[:1] == b'[' else return_signature[:1],
+                polymorph['shorty'],
+                values,
+            )
+        finally:
+            if polymorph['references']:
+                _release_arguments(polymorph['references'], args, values)
+
+        if return_converter is None:
+            return results
+
+        # The native loop returns global references. Objects can take
+        # ownership of them directly; anything else is converted from a local.
+        if return_signature[:1] == b'L' and return_signature != b'Ljava/lang/String;':
+            java_class = JavaClass(return_signature[1:-1].decode('utf-8'))
+            return [
+                owned_instance(java_class, jclass(ref)) if ref else JavaNull(return_signature)
+                for ref in results
+            ]
+
+        converted = []
+        for ref in results:
+            if ref:
+                local = java.NewLocalRef(ref)
+                release_global_ref(ref)
+                converted.append(return_converter(local.value))
+            else:
+                converted.append(return_converter(None))
+        return converted
 
 
 class BoundJavaMethod(object):
@@ -686,6 +1426,7 @@ class StaticJavaField(object):
             self._signature,
         )
         if self.__jni__.value is None:
+            java.ExceptionClear()
             raise RuntimeError(
                 "Couldn't find static Java field '%s.%s'" % (
                     self.java_class.__dict__['__jni__'],
@@ -734,6 +1475,7 @@ class JavaField(object):
             self._signature,
         )
         if self.__jni__.value is None:
+            java.ExceptionClear()
             raise RuntimeError(
                 "Couldn't find Java field '%s.%s'" % (
                     self.java_class.__dict__['__jni__'],
@@ -754,95 +1496,195 @@ class JavaField(object):
 ###########################################################################
 
 
-def _cache_field(java_class, name, is_static):
-    # print("%s: Look up %sfield %s" % (java_class.__dict__['_descriptor'], 'static ' if is_static else '', name))
-    java_field = java.CallStaticObjectMethod(
-        reflect.Python,
-        reflect.Python__getField,
-        java_class.__dict__['__jni__'],
-        java.NewStringUTF(name.encode('utf-8')),
-        jboolean(is_static)
-    )
-    if java_field.value:
-        # print("%s: Registering %sfield %s" % (
-        #     java_class.__dict__['_descriptor'],
-        #     'static ' if is_static else '', name
-        # ))
-        java_type = java.CallObjectMethod(java_field, reflect.Field__getType)
-        type_name = java.CallObjectMethod(java_type, reflect.Class__getName)
+def _parse_description(description):
+    """Parse the description of a class produced by Python.describe().
 
-        signature = signature_for_type_name(java.GetStringUTFChars(cast(type_name, jstring), None))
+    Returns a dictionary with the public fields of the class, keyed by
+    (name, is_static), with their type signature; the public methods, keyed
+    by (name, is_static), with a list of (parameter signature, return
+    signature) pairs; and the parameter signatures of the public constructors.
+    """
+    fields = {}
+    methods = {}
+    constructors = []
+    for line in description.encode('utf-8').split(b'\n'):
+        if line.startswith(b'F '):
+            _, static, name, signature = line.split(b' ')
+            fields[(name.decode('utf-8'), static == b'1')] = signature
+        elif line.startswith(b'M '):
+            _, static, name, params, return_signature = line.split(b' ')
+            methods.setdefault((name.decode('utf-8'), static == b'1'), []).append((params, return_signature))
+        elif line.startswith(b'C '):
+            constructors.append(line[2:])
+
+    return {
+        'fields': fields,
+        'methods': methods,
+        'constructors': constructors,
+    }
+
+
+def _describe(java_class):
+    """Retrieve the public members of a Java class.
+
+    The members are retrieved from Java with a single call the first time
+    the class is described, and cached on the class.
+    """
+    description = java_class.__dict__['_description']
+    if description is not None:
+        return description
+
+    with JavaClass._class_lock:
+        # Another thread may have described the class while this one waited.
+        description = java_class.__dict__['_description']
+        if description is None:
+            # print("%s: Describing class" % java_class.__dict__['_descriptor'])
+            ref = java.CallStaticObjectMethodA(
+                reflect.Python,
+                reflect.Python__describe,
+                (jvalue * 1)(jvalue(l=java_class.__dict__['__jni__'])),
+            )
+            if ref.value is None:
+                java.ExceptionClear()
+                raise RuntimeError("Couldn't describe class '%s'" % java_class.__dict__['_descriptor'].decode('utf-8'))
+            text = string_value(ref)
+            java.DeleteLocalRef(ref)
+            cache_class(java_class.__dict__['_descriptor'].decode('utf-8'), description=text)
+            description = _parse_description(text)
+            type.__setattr__(java_class, '_description', description)
+    return description
 
-        if is_static:
-            wrapper = StaticJavaField(java_class=java_class, name=name, signature=signature)
-        else:
-            wrapper = JavaField(java_class=java_class, name=name, signature=signature)
 
-        java.DeleteLocalRef(java_field)
-        java.DeleteLocalRef(java_type)
-        java.DeleteLocalRef(type_name)
-    else:
-        # print("%s: %s %s does not exist" % (
-        #     java_class.__dict__['_descriptor'],
-        #     'Static field' if is_static else 'Field', name
-        # ))
-        wrapper = None
+def _cache_field(java_class, name, is_static):
+    """Resolve a field of a class, and add it to the fields of the class.
+    Returns the field, or None if the class has no field with that name.
+    """
+    members = java_class.__dict__['_static' if is_static else '_members']['fields']
+    # Members can be resolved by more than one thread at a time (for
+    # example, by preload()), but only one wrapper may exist for each.
+    with JavaClass._class_lock:
+        try:
+            return members[name]
+        except KeyError:
+            pass
 
+        # print("%s: Look up %sfield %s" % (java_class.__dict__['_descriptor'], 'static ' if is_static else '', name))
+        started = time.perf_counter()
+        signature = _describe(java_class)['fields'].get((name, is_static))
+        if signature is None:
+            # print("%s: %s %s does not exist" % (
+            #     java_class.__dict__['_descriptor'],
+            #     'Static field' if is_static else 'Field', name
+            # ))
+            wrapper = None
+        else:
+            # print("%s: Registering %sfield %s" % (
+            #     java_class.__dict__['_descriptor'],
+            #     'static ' if is_static else '', name
+            # ))
+            if is_static:
+                wrapper = StaticJavaField(java_class=java_class, name=name, signature=signature)
+            else:
+                wrapper = JavaField(java_class=java_class, name=name, signature=signature)
+
+        record_resolution('field', java_class.__name__, name, is_static, started)
+        members[name] = wrapper
     return wrapper
 
 
 def _cache_methods(java_class, name, is_static):
-    # print("%s: Look up %smethod %s" % (java_class.__dict__['_descriptor'], 'static ' if is_static else '', name))
-    java_methods = java.CallStaticObjectMethod(
-        reflect.Python,
-        reflect.Python__getMethods,
-        java_class.__dict__['__jni__'],
-        java.NewStringUTF(name.encode('utf-8')),
-        jboolean(is_static)
-    )
-    if java_methods.value:
-        # print("%s: Registering %smethod %s" % (
-        #     java_class.__dict__['_descriptor'],
-        #     'static ' if is_static else '', name
-        # ))
-
-        if is_static:
-            wrapper = StaticJavaMethod(java_class=java_class, name=name)
-        else:
-            wrapper = JavaMethod(java_class=java_class, name=name)
+    """Resolve a method of a class, and add it to the methods of the class.
+    Returns the method, or None if the class has no method with that name.
+    """
+    members = java_class.__dict__['_static' if is_static else '_members']['methods']
+    # Members can be resolved by more than one thread at a time (for
+    # example, by preload()), but only one wrapper may exist for each.
+    with JavaClass._class_lock:
+        try:
+            return members[name]
+        except KeyError:
+            pass
 
-        java_methods = cast(java_methods, jobjectArray)
-        method_count = java.GetArrayLength(java_methods)
-        for i in range(0, method_count):
-            java_method = java.GetObjectArrayElement(java_methods, i)
+        # print("%s: Look up %smethod %s" % (java_class.__dict__['_descriptor'], 'static ' if is_static else '', name))
+        started = time.perf_counter()
+        signatures = _describe(java_class)['methods'].get((name, is_static))
+        if signatures is None:
+            # print("%s: %s %s does not exist" % (
+            #     java_class.__dict__['_descriptor'],
+            #     'Static method' if is_static else 'Method', name
+            # ))
+            wrapper = None
+        else:
+            if is_static:
+                wrapper = StaticJavaMethod(java_class=java_class, name=name)
+            else:
+                wrapper = JavaMethod(java_class=java_class, name=name)
 
-            params = java.CallObjectMethod(java_method, reflect.Method__getParameterTypes)
-            params = cast(params, jobjectArray)
+            for params, return_signature in signatures:
+                wrapper.add(params, return_signature)
 
-            java_type = java.CallObjectMethod(java_method, reflect.Method__getReturnType)
-            type_name = java.CallObjectMethod(java_type, reflect.Class__getName)
-            return_type_name = java.GetStringUTFChars(cast(type_name, jstring), None)
+            # print("%s: Registered %smethod %s: %s" % (
+            #     java_class.__dict__['_descriptor'],
+            #     'static ' if is_static else '', name, wrapper._polymorphs
+            # ))
 
-            wrapper.add(signature_for_params(params), signature_for_type_name(return_type_name))
-            java.DeleteLocalRef(type_name)
-            java.DeleteLocalRef(java_type)
-            java.DeleteLocalRef(params)
-            java.DeleteLocalRef(java_method)
-        java.DeleteLocalRef(java_methods)
+        record_resolution('method', java_class.__name__, name, is_static, started)
+        members[name] = wrapper
+    return wrapper
 
-        # print("%s: Registered %smethod %s: %s" % (
-        #     java_class.__dict__['_descriptor'],
-        #     'static ' if is_static else '', name, wrapper._polymorphs
-        # ))
 
-    else:
-        # print("%s: %s %s does not exist" % (
-        #     java_class.__dict__['_descriptor'],
-        #     'Static method' if is_static else 'Method', name
-        # ))
-        wrapper = None
+def _cache_constructors(java_class):
+    """Retrieve the constructors of a class, keyed by parameter signature.
 
-    return wrapper
+    Constructors that haven't been used yet have a value of None; their
+    method IDs are resolved by _cache_constructor() when they are needed.
+    """
+    constructors = java_class.__dict__['_constructors']
+    if constructors is not None:
+        return constructors
+
+    with JavaClass._class_lock:
+        constructors = java_class.__dict__['_constructors']
+        if constructors is None:
+            # print("   %s: Loading constructors" % java_class.__dict__['_descriptor'])
+            started = time.perf_counter()
+            # We now know that a constructor exists, and we know the signature
+            # of those constructors. However, we won't resolve the method
+            # implementing the constructor until we need it.
+            constructors = {
+                params: None
+                for params in _describe(java_class)['constructors']
+            }
+            type.__setattr__(java_class, '_constructors', constructors)
+            record_resolution('constructors', java_class.__name__, None, False, started)
+    return constructors
+
+
+def _cache_constructor(java_class, sig):
+    """Resolve the constructor of a class with the given parameter signature."""
+    with JavaClass._class_lock:
+        constructor = java_class.__dict__['_constructors'].get(sig)
+        if constructor is not None:
+            return constructor
+
+        started = time.perf_counter()
+        constructor_id = java.GetMethodID(
+            java_class.__dict__['__jni__'],
+            b'<init>',
+            b'(%s)V' % sig
+        )
+        if constructor_id.value is None:
+            java.ExceptionClear()
+            raise RuntimeError("Couldn't get method ID for %s constructor of %s" % (
+                sig.decode('utf-8'),
+                java_class
+            ))
+        constructor = conversion_plan(sig, b'V')
+        constructor['jni'] = constructor_id
+        constructor['invoker'] = select_invoker('NewObject', constructor['shorty'], b'L')
+        java_class.__dict__['_constructors'][sig] = constructor
+        record_resolution('constructor', java_class.__name__, sig.decode('utf-8'), False, started)
+    return constructor
 
 
 class JavaInstance(object):
@@ -857,71 +1699,15 @@ class JavaInstance(object):
             ##################################################################
             # Check that we know the constructors for the class
             ##################################################################
-            constructors = self.__class__.__dict__['_constructors']
-            if constructors is None:
-                # print("   %s: Loading constructors" % self.__class__.__dict__['_descriptor'])
-                constructors = {}
-                constructors_j = java.CallObjectMethod(
-                    self.__class__.__dict__['__jni__'],
-                    reflect.Class__getConstructors
-                )
-                if constructors_j.value is None:
-                    raise RuntimeError("Couldn't get constructor for '%s'" % self)
-                constructors_j = cast(constructors_j, jobjectArray)
-
-                constructor_count = java.GetArrayLength(constructors_j)
-                for i in range(0, constructor_count):
-                    constructor = java.GetObjectArrayElement(constructors_j, i)
-
-                    modifiers = java.CallIntMethod(constructor, reflect.Constructor__getModifiers)
-                    is_public = java.CallStaticBooleanMethod(reflect.Modifier, reflect.Modifier__isPublic, modifiers)
-
-                    if is_public:
-                        # We now know that a constructor exists, and we know the signature
-                        # of those constructors. However, we won't resolve the method
-                        # implementing the constructor until we need it.
-                        params = java.CallObjectMethod(constructor, reflect.Constructor__getParameterTypes)
-                        params = cast(params, jobjectArray)
-
-                        # print("  %s: registering '%s' constructor " % (
-                        #     self.__class__.__dict__['_descriptor'],
-                        #     signature_for_params(params)
-                        # ))
-                        constructors[signature_for_params(params)] = None
-                    # else:
-                        # print("  %s: ignoring nonpublic constructor" % self.__class__.__dict__['_descriptor'])
-
-                    java.DeleteLocalRef(params)
-                    java.DeleteLocalRef(constructor)
-                java.DeleteLocalRef(constructors_j)
-                type.__setattr__(self.__class__, '_constructors', constructors)
+            constructors = _cache_constructors(self.__class__)
 
             ##################################################################
             # Invoke the JNI constructor
             ##################################################################
             try:
-                match_types, constructor = select_polymorph(constructors, args)
-                if constructor is None:
-                    sig = b''.join(match_types)
-                    constructor = java.GetMethodID(
-                        klass,
-                        b'<init>',
-                        b'(%s)V' % sig
-                    )
-                    if constructor is None:
-                        raise RuntimeError("Couldn't get method ID for %s constructor of %s" % (
-                            sig.decode('utf-8'),
-                            self.__class__
-                        ))
-                    self.__class__.__dict__['_constructors'][sig] = constructor
-
-                jni = java.NewObject(klass, constructor, *convert_args(args, match_types))
-                if not jni:
-                    raise RuntimeError("Couldn't instantiate Java instance of %s." % self.__class__)
-                jni = cast(java.NewGlobalRef(jni), jclass)
-                if jni.value is None:
-                    raise RuntimeError("Unable to create global reference to instance.")
-
+                match_types, constructor = self.__class__.__dict__['_constructor_selection_cache'].select(
+                    constructors, args
+                )
             except KeyError as e:
                 raise ValueError(
                     "Can't find constructor matching argument signature %s. Options are: %s" % (
@@ -933,6 +1719,24 @@ class JavaInstance(object):
                     )
                 )
 
+            if constructor is None:
+                constructor = _cache_constructor(self.__class__, b''.join(match_types))
+
+            values = [convert(arg) for convert, arg in zip(constructor['converters'], args)]
+            try:
+                local = constructor['invoker'](klass, constructor['jni'], constructor['shorty'], values)
+            finally:
+                if constructor['references']:
+                    _release_arguments(constructor['references'], args, values)
+            if not local:
+                raise RuntimeError("Couldn't instantiate Java instance of %s." % self.__class__)
+            jni = cast(java.NewGlobalRef(local), jclass)
+            java.DeleteLocalRef(local)
+            if jni.value is None:
+                raise RuntimeError("Unable to create global reference to instance.")
+            object.__setattr__(self, '_owned', True)
+            track_instance(self)
+
         # This is just:
         #    self.__jni__ = jni
         #    self._as_parameter_ = jni
@@ -960,7 +1764,6 @@ class JavaInstance(object):
         except KeyError:
             # print("%s: First attempt to use field %s" % (self.__class__.__dict__['_descriptor'], name))
             field_wrapper = _cache_field(self.__class__, name, False)
-            self.__class__.__dict__['_members']['fields'][name] = field_wrapper
 
         if field_wrapper:
             return field_wrapper.get(self)
@@ -975,7 +1778,6 @@ class JavaInstance(object):
         except KeyError:
             # print("%s: First attempt to use method %s" % (self.__class__.__dict__['_descriptor'], name))
             method_wrapper = _cache_methods(self.__class__, name, False)
-            self.__class__.__dict__['_members']['methods'][name] = method_wrapper
 
         if method_wrapper:
             return BoundJavaMethod(self, method_wrapper)
@@ -990,16 +1792,45 @@ class JavaInstance(object):
         except KeyError:
             # print("%s: First attempt to use field %s" % (self.__class__.__dict__['_descriptor'], name))
             field_wrapper = _cache_field(self.__class__, name, False)
-            self.__class__.__dict__['_members']['fields'][name] = field_wrapper
 
         if field_wrapper:
             return field_wrapper.set(self, value)
 
         raise AttributeError("'%s' Java object has no attribute '%s'" % (self.__class__.__name__, name))
 
+    def __del__(self):
+        # Queue the global reference for release, if this instance created it.
+        # The reference is deleted in a batch by a background thread, so
+        # garbage collection never needs to call into Java.
+        if self.__dict__.get('_owned'):
+            release_global_ref(self.__dict__['__jni__'])
+
     def __global__(self):
         "Return an global reference to the same object"
-        return self.__class__(__jni__=java.NewGlobalRef(self))
+        return global_instance(self.__class__, self)
+
+
+def global_instance(java_class, ref):
+    """Wrap a JNI reference in a new instance of a JavaClass.
+    The instance holds (and owns) a new global reference to the object,
+    so it remains valid after the provided reference has been released;
+    the global reference is released when the instance is garbage collected,
+    or when the enclosing scope() exits.
+    """
+    jni = cast(java.NewGlobalRef(ref), jclass)
+    if jni.value is None:
+        raise RuntimeError("Unable to create global reference to instance.")
+    return owned_instance(java_class, jni)
+
+
+def owned_instance(java_class, jni):
+    """Wrap a global JNI reference in a new instance of a JavaClass.
+    The instance takes ownership of the reference.
+    """
+    instance = java_class(__jni__=jni)
+    object.__setattr__(instance, '_owned', True)
+    track_instance(instance)
+    return instance
 
 
 class UnknownClassException(Exception):
@@ -1123,97 +1954,181 @@ class JavaNull:
         return False
 
 
-class JavaClass(type):
-    # This class returns known JavaClass instances where possible.
-    _class_cache = {}
+def _find_alternates(descriptor_bytes, jni):
+    """Determine the alternate types for a class: the signatures of the
+    types that an instance of the class can be passed as, in order of
+    preference.
+    This only includes the direct interfaces of the class; instances can
+    also be passed as any other type in their hierarchy (see _is_assignable()).
+    """
+    # Best option is the type itself
+    alternates = [b'L%s;' % descriptor_bytes]
 
-    def __new__(cls, descriptor, bases=None, attrs=None):
-        if bases or attrs:
-            # The user is trying to subclass a JavaClass. This will not work because
-            # rubicon-java relies on the Java reflection APIs, which do not support that.
-            raise NotImplementedError("Unable to subclass a JavaClass.")
-        # print("Creating Java class", descriptor)
-        # Using str descriptor as cache key, to avoid .encode() when checking cache.
-        if descriptor in cls._class_cache:
-            return cls._class_cache[descriptor]
+    # Next preference is an interfaces
+    java_interfaces = java.CallObjectMethod(jni, reflect.Class__getInterfaces)
+    if java_interfaces.value is None:
+        raise RuntimeError("Couldn't get interfaces for '%s'" % descriptor_bytes.decode('utf-8'))
+    java_interfaces = cast(java_interfaces, jobjectArray)
 
-        # Using UTF-8 descriptor below for compatibility with Java.
-        descriptor_bytes = descriptor.encode('utf-8')
+    interface_count = java.GetArrayLength(java_interfaces)
+    for i in range(0, interface_count):
+        java_interface = java.GetObjectArrayElement(java_interfaces, i)
 
-        jni = java.FindClass(descriptor_bytes)
-        if jni.value is None:
-            raise UnknownClassException(descriptor_bytes)
-        jni = cast(java.NewGlobalRef(jni), jclass)
-        if jni.value is None:
-            raise RuntimeError("Unable to create global reference to class.")
+        name = java.CallObjectMethod(java_interface, reflect.Class__getName)
+        name_str = string_value(name).encode('utf-8')
 
-        ##################################################################
-        # Determine the alternate types for this class
-        ##################################################################
+        # print("  %s: adding interface alternate %s" % (descriptor_bytes, name_str))
+        alternates.append(b'L%s;' % name_str.replace(b'.', b'/'))
 
-        # Best option is the type itself
-        alternates = [b'L%s;' % descriptor_bytes]
+        java.DeleteLocalRef(name)
+        java.DeleteLocalRef(java_interface)
+    java.DeleteLocalRef(java_interfaces)
 
-        # Next preference is an interfaces
-        java_interfaces = java.CallObjectMethod(jni, reflect.Class__getInterfaces)
-        if java_interfaces.value is None:
-            raise RuntimeError("Couldn't get interfaces for '%s'" % cls)
-        java_interfaces = cast(java_interfaces, jobjectArray)
+    # Then check all the superclasses
+    java_superclass = java.CallObjectMethod(jni, reflect.Class__getSuperclass)
+    while java_superclass.value is not None:
+        name = java.CallObjectMethod(java_superclass, reflect.Class__getName)
+        name_str = string_value(name).encode('utf-8')
 
-        interface_count = java.GetArrayLength(java_interfaces)
-        for i in range(0, interface_count):
-            java_interface = java.GetObjectArrayElement(java_interfaces, i)
+        # print("  %s: adding superclass alternate %s" % (descriptor_bytes, name_str))
+        alternates.append(b'L%s;' % name_str.replace(b'.', b'/'))
 
-            name = java.CallObjectMethod(java_interface, reflect.Class__getName)
-            name_str = java.GetStringUTFChars(cast(name, jstring), None)
+        java.DeleteLocalRef(name)
 
-            # print("  %s: adding interface alternate %s" % (self.__dict__['_descriptor'], name_str))
-            alternates.append(b'L%s;' % name_str.replace(b'.', b'/'))
+        super2 = java.CallObjectMethod(java_superclass, reflect.Class__getSuperclass)
+        java.DeleteLocalRef(java_superclass)
+        java_superclass = super2
+    java.DeleteLocalRef(java_superclass)
+    return alternates
 
-            java.DeleteLocalRef(name)
-            java.DeleteLocalRef(java_interface)
-        java.DeleteLocalRef(java_interfaces)
 
-        # Then check all the superclasses
-        java_superclass = java.CallObjectMethod(jni, reflect.Class__getSuperclass)
-        while java_superclass.value is not None:
-            name = java.CallObjectMethod(java_superclass, reflect.Class__getName)
-            name_str = java.GetStringUTFChars(cast(name, jstring), None)
+def _class_alternates(java_class):
+    """Return the alternate types for a JavaClass (see _find_alternates()).
 
-            # print("  %s: adding superclass alternate %s" % (self.__dict__['_descriptor'], name_str))
-            alternates.append(b'L%s;' % name_str.replace(b'.', b'/'))
+    They are determined the first time they are needed, because most
+    classes (for example, the classes of return values) are never used to
+    select a polymorph.
+    """
+    alternates = java_class.__dict__['_alternates']
+    if alternates is None:
+        alternates = _find_alternates(java_class.__dict__['_descriptor'], java_class.__dict__['__jni__'])
+        cache_class(java_class.__name__, alternates=alternates)
+        type.__setattr__(java_class, '_alternates', alternates)
+    return alternates
 
-            java.DeleteLocalRef(name)
 
-            super2 = java.CallObjectMethod(java_superclass, reflect.Class__getSuperclass)
-            java.DeleteLocalRef(java_superclass)
-            java_superclass = super2
-        java.DeleteLocalRef(java_superclass)
+# Whether instances of a class can be passed as a given (object) type,
+# keyed by the descriptor of the class, and the signature of the type.
+_assignable = {}
 
-        java_class = super(JavaClass, cls).__new__(
-            cls,
-            descriptor,
-            (JavaInstance,),
-            {
-                '_descriptor': descriptor_bytes,
-                '__jni__': jni,
-                '__null__': JavaNull(alternates[0]),
-                '_alternates': alternates,
-                '_constructors': None,
-                '_members': {
-                    'fields': {},
-                    'methods': {},
-                },
-                '_static': {
-                    'fields': {},
-                    'methods': {},
+
+def _is_assignable(java_class, type_signature):
+    """Determine if instances of a JavaClass (or JavaInterface) can be passed
+    as the type with the given signature.
+
+    Unlike the alternates of the class, this covers the entire type
+    hierarchy of the class, including the interfaces extended by its
+    interfaces, and the interfaces of its superclasses. Results are cached.
+    """
+    key = (java_class.__dict__['_descriptor'], type_signature)
+    try:
+        return _assignable[key]
+    except KeyError:
+        pass
+
+    assignable = False
+    if type_signature.startswith(b'L'):
+        try:
+            type_class = JavaClass(type_signature[1:-1].decode('utf-8'))
+        except UnknownClassException:
+            pass
+        else:
+            assignable = bool(java.IsAssignableFrom(
+                java_class.__dict__['__jni__'],
+                type_class.__dict__['__jni__'],
+            ))
+    _assignable[key] = assignable
+    return assignable
+
+
+class JavaClass(type):
+    # This class returns known JavaClass instances where possible.
+    _class_cache = {}
+    _class_lock = threading.RLock()
+
+    def __new__(cls, descriptor, bases=None, attrs=None):
+        if bases or attrs:
+            # The user is trying to subclass a JavaClass. This will not work because
+            # rubicon-java relies on the Java reflection APIs, which do not support that.
+            raise NotImplementedError("Unable to subclass a JavaClass.")
+        # print("Creating Java class", descriptor)
+        # Using str descriptor as cache key, to avoid .encode() when checking cache.
+        if descriptor in cls._class_cache:
+            return cls._class_cache[descriptor]
+
+        # Classes can be wrapped by more than one thread at a time (for
+        # example, by preload()), but only one JavaClass may exist for each
+        # Java class.
+        with cls._class_lock:
+            if descriptor in cls._class_cache:
+                return cls._class_cache[descriptor]
+
+            started = time.perf_counter()
+
+            # Using UTF-8 descriptor below for compatibility with Java.
+            descriptor_bytes = descriptor.encode('utf-8')
+
+            # FindClass falls back to the class loader of the rubicon runtime,
+            # so app classes can be found on threads attached from Python.
+            local = java.FindClass(descriptor_bytes)
+            if local.value is None:
+                java.ExceptionClear()
+                raise UnknownClassException(descriptor_bytes)
+            jni = cast(java.NewGlobalRef(local), jclass)
+            java.DeleteLocalRef(local)
+            if jni.value is None:
+                raise RuntimeError("Unable to create global reference to class.")
+
+            # The alternate types and members of the class are determined
+            # when they are first needed, unless they have been cached.
+            metadata = cached_class(descriptor)
+            if metadata is not None:
+                alternates = metadata['alternates']
+                if metadata['description'] is not None:
+                    description = _parse_description(metadata['description'])
+                else:
+                    description = None
+            else:
+                alternates = None
+                description = None
+
+            java_class = super(JavaClass, cls).__new__(
+                cls,
+                descriptor,
+                (JavaInstance,),
+                {
+                    '_descriptor': descriptor_bytes,
+                    '__jni__': jni,
+                    '__null__': JavaNull(b'L%s;' % descriptor_bytes),
+                    '_alternates': alternates,
+                    '_description': description,
+                    '_constructors': None,
+                    '_constructor_selection_cache': SelectionCache(),
+                    '_members': {
+                        'fields': {},
+                        'methods': {},
+                    },
+                    '_static': {
+                        'fields': {},
+                        'methods': {},
+                    }
                 }
-            }
-        )
+            )
 
-        # Cache the class instance, then return.
-        cls._class_cache[descriptor] = java_class
-        return java_class
+            # Cache the class instance, then return.
+            cls._class_cache[descriptor] = java_class
+            record_resolution('class', descriptor, None, False, started)
+            return java_class
 
     def __getattr__(self, name):
         # print("GETATTR %s on JavaClass %s" % (name, self))
@@ -1227,7 +2142,6 @@ class JavaClass(type):
         except KeyError:
             # print("%s: First attempt to use static field %s" % (self.__dict__['_descriptor'], name))
             field_wrapper = _cache_field(self, name, True)
-            self.__dict__['_static']['fields'][name] = field_wrapper
 
         if field_wrapper:
             return field_wrapper.get()
@@ -1242,7 +2156,6 @@ class JavaClass(type):
         except KeyError:
             # print("%s: First attempt to use static method %s" % (self.__dict__['_descriptor'], name))
             method_wrapper = _cache_methods(self, name, True)
-            self.__dict__['_static']['methods'][name] = method_wrapper
 
         if method_wrapper:
             return method_wrapper
@@ -1262,7 +2175,6 @@ class JavaClass(type):
         except KeyError:
             # print("%s: First attempt to use static field %s" % (self.__dict__['_descriptor'], name))
             field_wrapper = _cache_field(self, name, True)
-            self.__dict__['_static']['fields'][name] = field_wrapper
 
         if field_wrapper:
             return field_wrapper.set(value)
@@ -1274,16 +2186,162 @@ class JavaClass(type):
     def __repr__(self):
         return "<JavaClass: %s>" % self._descriptor.decode('utf-8')
 
+    def __method__(self, name):
+        """Return the instance method with the given name.
+
+        The method can be invoked on any instance of the class, by passing
+        the instance as the first argument; or it can be invoked on a
+        sequence of instances using map().
+        """
+        try:
+            method_wrapper = self.__dict__['_members']['methods'][name]
+        except KeyError:
+            method_wrapper = _cache_methods(self, name, False)
+
+        if method_wrapper:
+            return method_wrapper
+
+        raise AttributeError("Java class '%s' has no instance method '%s'" % (
+            self.__dict__['_descriptor'].decode('utf-8'), name)
+        )
+
     def __cast__(self, obj, globalref=False):
         """Cast the provided object to this class.
 
-        Optionally, make the resulting reference a global JNI reference.
+        The resulting instance always holds its own global JNI reference,
+        so it remains valid independent of the lifetime of `obj`; the
+        `globalref` argument is retained for compatibility.
         """
-        if globalref:
-            cast = self(__jni__=java.NewGlobalRef(obj))
+        return global_instance(self, obj)
+
+
+###########################################################################
+# Representations of Java arrays
+###########################################################################
+
+class JavaArray(Sequence):
+    """A Java array whose items are only retrieved from Java when they are used.
+
+    A JavaArray is returned in place of a list when the array return type
+    is 'JavaArray' (see set_array_return_type()). It holds a global
+    reference to the array, and supports len(), indexing and slicing;
+    items can also be assigned. Ranges of items in primitive arrays are
+    transferred with a single Get/Set<Type>ArrayRegion call; items of
+    object arrays are retrieved one at a time, as they are used.
+
+    A JavaArray can be passed back to Java anywhere an array of the same
+    type is expected.
+    """
+    # The number of items retrieved at a time when iterating over the array.
+    chunk_size = 1024
+
+    def __init__(self, jni, signature):
+        self.__jni__ = jni
+        self._as_parameter_ = jni
+        self._signature = signature
+        self._owned = True
+        self._length = java.GetArrayLength(jni)
+        if signature in _PRIMITIVE_ARRAYS:
+            self._element_type = _PRIMITIVE_ARRAYS[signature][1]
+            self._get_region = _PRIMITIVE_ARRAYS[signature][4]
+            self._set_region = _ARRAY_CONVERSIONS[signature][2]
+        elif signature[1:2] in (b'L', b'['):
+            self._element_type = None
+            self._element_class = None
+            self._convert = converter_for_type_name(signature[1:])
         else:
-            cast = self(__jni__=obj.__jni__)
-        return cast
+            raise ValueError("Don't know how to wrap array signature '%s'" % signature.decode('utf-8'))
+        track_instance(self)
+
+    def __del__(self):
+        # Queue the global reference for release (see JavaInstance.__del__).
+        if self.__dict__.get('_owned'):
+            release_global_ref(self.__dict__['__jni__'])
+
+    def __repr__(self):
+        return "<JavaArray: %s[%d]>" % (self._signature.decode('utf-8'), self._length)
+
+    def __len__(self):
+        return self._length
+
+    def _index(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("JavaArray index out of range")
+        return index
+
+    def _get(self, start, length):
+        "Retrieve a list of the items in a contiguous range of the array"
+        if self._element_type is not None:
+            items = (self._element_type * length)()
+            if length:
+                self._get_region(self.__jni__.value, start, length, items)
+            return items[:]
+
+        if self._signature[1:2] == b'L' and self._signature != b'[Ljava/lang/String;':
+            # Objects are retrieved in bulk, and take ownership of the references.
+            if self._element_class is None:
+                self._element_class = JavaClass(self._signature[2:-1].decode('utf-8'))
+            return [
+                owned_instance(self._element_class, jclass(ref)) if ref else JavaNull(self._signature[1:])
+                for ref in _object_array_elements(self.__jni__.value, start, length)
+            ]
+
+        # Each element is a new local reference, consumed by return_cast().
+        return [
+            return_cast(java.GetObjectArrayElement(self.__jni__.value, i), self._signature[1:])
+            for i in range(start, start + length)
+        ]
+
+    def _set(self, start, values):
+        "Replace a contiguous range of the array with a list of values"
+        if self._element_type is not None:
+            if values:
+                self._set_region(self.__jni__.value, start, len(values), (self._element_type * len(values))(*values))
+            return
+
+        for i, value in enumerate(values, start):
+            jitem = self._convert(value)
+            java.SetObjectArrayElement(self.__jni__.value, i, jitem)
+            if jitem and not isinstance(value, (JavaInstance, JavaArray, JavaString)):
+                java.DeleteLocalRef(jitem)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step == 1:
+                return self._get(start, max(stop - start, 0))
+            indices = range(start, stop, step)
+            if not indices:
+                return []
+            # Retrieve the span of the slice in one operation.
+            low = min(indices[0], indices[-1])
+            items = self._get(low, max(indices[0], indices[-1]) - low + 1)
+            return [items[i - low] for i in indices]
+
+        return self._get(self._index(index), 1)[0]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            indices = range(start, stop, step)
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError("JavaArray slice assignment can't change the size of the array")
+            if step == 1:
+                self._set(start, values)
+            else:
+                for i, item in zip(indices, values):
+                    self._set(i, [item])
+            return
+
+        self._set(self._index(index), [value])
+
+    def __iter__(self):
+        # Retrieve the items in chunks, rather than one at a time.
+        for start in range(0, self._length, self.chunk_size):
+            yield from self._get(start, min(self.chunk_size, self._length - start))
 
 
 ###########################################################################
@@ -1291,33 +2349,58 @@ class JavaClass(type):
 ###########################################################################
 
 class JavaProxy(object):
-    def __init__(self):
-        # Create a Java-side proxy for this Python-side object
-        # print("Create new Java Interface instance ", self.__class__)
-        klass = self.__class__.__jni__
-        jni = java.CallStaticObjectMethod(reflect.Python, reflect.Python__proxy, klass, jlong(id(self)))
-        if jni.value is None:
-            raise RuntimeError("Unable to create proxy instance.")
-        jni = cast(java.NewGlobalRef(jni), jclass)
-        if jni.value is None:
-            raise RuntimeError("Unable to create global reference to proxy instance.")
-        self.__jni__ = jni
+    """A Python object that can be passed to Java as an implementation of a Java interface.
 
-        # Register this Python instance with the proxy cache
-        # This is a weak reference because _proxy_cache is a registry,
-        # not an actual user of proxy objects. If all references to the
-        # proxy disappear, the proxy cache should be cleaned to avoid
-        # leaking memory on objects that aren't being used.
-        _proxy_cache[id(self)] = self
+    The Java-side proxy is created on demand; this object only holds a weak
+    reference to it, so the proxy can be collected once Java no longer uses
+    it. While Java holds the proxy, the proxy registry keeps this object
+    alive. If the proxy has been collected and this object is passed to Java
+    again, a new proxy is created.
+    """
+    _proxy = None
+    _token = None
+
+    @property
+    def _as_parameter_(self):
+        "Return a new local reference to the Java-side proxy for this object"
+        if self._proxy is not None:
+            local = java.NewLocalRef(self._proxy)
+            if local.value is not None:
+                return local
+            java.DeleteWeakGlobalRef(self._proxy)
+            self._proxy = None
+
+        # Release any objects whose proxies Java has collected, so the
+        # registry only grows with the number of live proxies.
+        release_proxies()
+
+        token = next(_proxy_tokens)
+        local = java.CallStaticObjectMethodA(
+            reflect.Python,
+            reflect.Python__proxy,
+            (jvalue * 2)(jvalue(l=self.__class__.__jni__), jvalue(j=token)),
+        )
+        if local.value is None:
+            raise RuntimeError("Unable to create proxy instance.")
+        proxy = java.NewWeakGlobalRef(local)
+        if proxy.value is None:
+            java.DeleteLocalRef(local)
+            raise RuntimeError("Unable to create weak global reference to proxy instance.")
 
-        self._as_parameter_ = self.__jni__
+        # Register this Python instance, so it stays alive while Java holds the proxy.
+        _proxy_cache[token] = self
+        self._proxy = proxy
+        self._token = token
+        return local
 
     def __repr__(self):
-        return "<%s: %s>" % (self.__class__.__name__, self.__jni__.value)
+        return "<%s: %s>" % (self.__class__.__name__, self._token)
 
-    # def __del__(self):
-    #     # If this object is garbage collected, remove it from the proxy cache.
-    #     del _proxy_cache[id(self)]
+    def __del__(self):
+        # Queue the weak reference to the Java-side proxy for release.
+        proxy = self.__dict__.get('_proxy')
+        if proxy is not None:
+            release_global_ref(proxy)
 
 
 class JavaInterface(type):
@@ -1349,7 +2432,8 @@ class JavaInterface(type):
             java_class = super(JavaInterface, cls).__new__(cls, name, bases, attrs)
 
         jni = java.FindClass(descriptor)
-        if jni is None:
+        if jni.value is None:
+            java.ExceptionClear()
             raise UnknownClassException(descriptor)
         java_class.__jni__ = cast(java.NewGlobalRef(jni), jclass)
         if java_class.__jni__.value is None:
@@ -1368,12 +2452,16 @@ class JavaInterface(type):
             java_method = java.GetObjectArrayElement(methods, i)
             modifiers = java.CallIntMethod(java_method, reflect.Method__getModifiers)
 
-            is_public = java.CallStaticBooleanMethod(reflect.Modifier, reflect.Modifier__isPublic, modifiers)
+            is_public = java.CallStaticBooleanMethodA(
+                reflect.Modifier, reflect.Modifier__isPublic, jvalue(i=modifiers)
+            )
             if is_public:
-                is_static = java.CallStaticBooleanMethod(reflect.Modifier, reflect.Modifier__isStatic, modifiers)
+                is_static = java.CallStaticBooleanMethodA(
+                    reflect.Modifier, reflect.Modifier__isStatic, jvalue(i=modifiers)
+                )
                 if not is_static:
                     name = java.CallObjectMethod(java_method, reflect.Method__getName)
-                    name_str = java.GetStringUTFChars(cast(name, jstring), None)
+                    name_str = string_value(name).encode('utf-8')
 
                     params = java.CallObjectMethod(java_method, reflect.Method__getParameterTypes)
                     params = cast(params, jobjectArray)
@@ -1382,10 +2470,16 @@ class JavaInterface(type):
                     java_class._methods.setdefault(
                         name_str.decode('utf-8'), set()
                     ).add(type_names_for_params(params))
+
+                    java.DeleteLocalRef(params)
+                    java.DeleteLocalRef(name)
             #     else:
             #         print("  %s: ignoring static method" % self.__dict__['_descriptor'])
             # else:
             #     print("  %s: ignoring private method" % self.__dict__['_descriptor'])
+            java.DeleteLocalRef(java_method)
+        java.DeleteLocalRef(methods)
+        java.DeleteLocalRef(jni)
 
         return java_class
 
@@ -0,0 +1,189 @@
+from ctypes import addressof, c_char
+import mmap
+import struct
+import sys
+
+from .api import JavaClass, _retain_for_java, global_instance, release_proxies
+from .jni import java
+
+__all__ = ['direct_buffer', 'buffer_view', 'typed_buffer', 'map_file']
+
+
+# The Java buffer classes that can be viewed from Python,
+# with the memoryview format of their elements.
+_BUFFER_FORMATS = [
+    ('java/nio/ByteBuffer', 'B'),
+    ('java/nio/CharBuffer', 'H'),
+    ('java/nio/ShortBuffer', 'h'),
+    ('java/nio/IntBuffer', 'i'),
+    ('java/nio/LongBuffer', 'q'),
+    ('java/nio/FloatBuffer', 'f'),
+    ('java/nio/DoubleBuffer', 'd'),
+]
+
+# The typed buffers that can be created from a ByteBuffer.
+TYPED_BUFFERS = ('char', 'short', 'int', 'long', 'float', 'double')
+
+
+def direct_buffer(obj):
+    """Wrap a writable Python buffer in a direct java.nio.ByteBuffer.
+
+    No data is copied; Java and Python share the same memory, so writes
+    made on either side are immediately visible on the other:
+
+        data = bytearray(1024)
+        buf = direct_buffer(data)
+        buf.putInt(0, 42)
+
+    obj (and an export of its buffer) is kept alive for as long as Java can
+    reach the ByteBuffer, even after the Python wrapper has been released;
+    while it is, obj cannot be resized. Java may keep the ByteBuffer (or a
+    buffer derived from it with slice(), duplicate(), etc) for as long as it
+    needs. Once Java has collected the ByteBuffer, obj is released the next
+    time release_proxies() is called (which happens whenever a direct buffer
+    or proxy is created).
+
+    As with any ByteBuffer, the initial byte order is big-endian.
+    """
+    view = memoryview(obj)
+    if view.readonly:
+        raise TypeError("A direct buffer requires a writable buffer.")
+    if not view.c_contiguous:
+        raise TypeError("A direct buffer requires a contiguous buffer.")
+
+    # Release the memory of any direct buffers that Java has collected.
+    release_proxies()
+
+    view = view.cast('B')
+    memory = (c_char * view.nbytes).from_buffer(view)
+    # NewDirectByteBuffer calls into Java, so it fails if an earlier call
+    # on this thread left an exception pending.
+    java.ExceptionClear()
+    ref = java.NewDirectByteBuffer(addressof(memory), view.nbytes)
+    if ref.value is None:
+        java.ExceptionClear()
+        raise RuntimeError("Unable to create direct buffer of %d bytes." % view.nbytes)
+    try:
+        instance = global_instance(JavaClass('java/nio/ByteBuffer'), ref)
+    finally:
+        java.DeleteLocalRef(ref)
+
+    # Java owns the lifetime of the memory; the ByteBuffer can be returned
+    # to Python through other wrappers, or retained by Java.
+    _retain_for_java(instance, memory)
+    return instance
+
+
+def buffer_view(byte_buffer):
+    """Expose the memory of a direct java.nio.Buffer as a memoryview.
+
+    No data is copied; the view covers the entire capacity of the buffer
+    (ignoring its position and limit). The format of the view matches the
+    type of the buffer - unsigned bytes for a ByteBuffer, 'i' for an
+    IntBuffer, and so on:
+
+        buf = JavaClass('java/nio/ByteBuffer').allocateDirect(1024)
+        view = buffer_view(buf)
+
+    Typed buffers are viewed in native byte order; use typed_buffer() to
+    create typed buffers whose content agrees with the view.
+
+    The view keeps the Java buffer alive for as long as the view (or any
+    view derived from it) exists. Under Python 3.8 and later, the view of
+    a read-only buffer is read-only; under earlier versions it can't be
+    made read-only, and must not be written to.
+
+    Raises ValueError if the buffer is not a direct buffer.
+    """
+    address = java.GetDirectBufferAddress(byte_buffer.__jni__)
+    if address is None:
+        java.ExceptionClear()
+        raise ValueError("%r is not a direct buffer." % byte_buffer)
+    capacity = java.GetDirectBufferCapacity(byte_buffer.__jni__)
+
+    for class_name, format in _BUFFER_FORMATS:
+        if java.IsInstanceOf(byte_buffer.__jni__, JavaClass(class_name).__dict__['__jni__']):
+            break
+    else:
+        raise ValueError("Can't determine the element type of %r." % byte_buffer)
+
+    memory = (c_char * (capacity * struct.calcsize(format))).from_address(address)
+    memory._owner = byte_buffer
+    view = memoryview(memory).cast('B')
+    if format != 'B':
+        view = view.cast(format)
+    if sys.version_info >= (3, 8) and byte_buffer.isReadOnly():
+        view = view.toreadonly()
+    return view
+
+
+def typed_buffer(byte_buffer, type_name):
+    """Create a typed view (an IntBuffer, FloatBuffer, etc) of a ByteBuffer.
+
+    type_name is one of 'char', 'short', 'int', 'long', 'float' or
+    'double'. The typed buffer shares the memory of byte_buffer, starting
+    at its current position, and uses native byte order, so that its
+    content agrees with buffer_view() of either buffer:
+
+        buf = map_file('data.bin')
+        values = typed_buffer(buf, 'float')
+        values.get(0)
+
+    The byte order of byte_buffer itself is not changed. The typed buffer
+    keeps byte_buffer (and any Python memory it shares) alive.
+    """
+    if type_name not in TYPED_BUFFERS:
+        raise ValueError("Unknown buffer type %r; must be one of %s" % (type_name, ', '.join(TYPED_BUFFERS)))
+
+    ByteOrder = JavaClass('java/nio/ByteOrder')
+    ordered = byte_buffer.duplicate().order(ByteOrder.nativeOrder())
+    typed = getattr(ordered, 'as%sBuffer' % type_name.capitalize())()
+    object.__setattr__(typed, '_buffer', byte_buffer)
+    return typed
+
+
+def map_file(path=None, length=0, offset=0, readonly=False):
+    """Memory map a file, and share the mapping with Java as a direct ByteBuffer.
+
+    The file is mapped once, by Python; Java sees the same pages, so data
+    can be moved between the two runtimes without being copied:
+
+        buf = map_file('data.bin')
+        view = buffer_view(buf)
+        floats = typed_buffer(buf, 'float')
+
+    length is the number of bytes to map; if 0, the whole file (from
+    offset) is mapped. offset must be a multiple of mmap.ALLOCATIONGRANULARITY.
+
+    If path is None, an anonymous shared mapping of the given length is
+    created instead of mapping a file.
+
+    If readonly is True, the file is opened for reading only, and a
+    read-only ByteBuffer is returned. Otherwise, writes made through the
+    buffer (from either runtime) are written to the file.
+
+    The returned buffer is a direct ByteBuffer (and, under OpenJDK, a
+    MappedByteBuffer), with big-endian byte order. As with direct_buffer(),
+    the mapping remains open for as long as Java can reach the buffer (or a
+    typed buffer or view derived from it).
+    """
+    if path is None:
+        if not length:
+            raise ValueError("An anonymous mapping requires a length.")
+        mapping = mmap.mmap(-1, length)
+    else:
+        with open(path, 'rb' if readonly else 'r+b') as f:
+            # A private (copy-on-write) mapping is used for read-only access,
+            # because the underlying memory must be writable to be shared.
+            mapping = mmap.mmap(
+                f.fileno(), length,
+                access=mmap.ACCESS_COPY if readonly else mmap.ACCESS_WRITE,
+                offset=offset,
+            )
+
+    buf = direct_buffer(mapping)
+    if readonly:
+        read_only = buf.asReadOnlyBuffer()
+        object.__setattr__(read_only, '_buffer', buf)
+        return read_only
+    return buf
@@ -1,12 +1,12 @@
 import os
-from ctypes import c_char_p, cast, cdll
+from ctypes import POINTER, c_char_p, c_void_p, cast, cdll
 
 from .types import (
     jarray, jboolean, jboolean_p, jbooleanArray,
-    jbyte, jbyte_p, jbyteArray, jchar, jclass,
+    jbyte, jbyte_p, jbyteArray, jchar, jcharArray, jclass,
     jdouble, jdouble_p, jdoubleArray, jfieldID, jfloat, jfloat_p, jfloatArray,
     jint, jint_p, jintArray, jlong, jlong_p, jlongArray, jmethodID, jobject, jobjectArray,
-    jshort, jshort_p, jshortArray, jsize, jstring,
+    jshort, jshort_p, jshortArray, jsize, jstring, jvalue_p, jweak,
 )
 
 # If RUBICON_LIBRARY is set in the environment, rely on it. If not,
@@ -23,6 +23,16 @@ else:
         raise ValueError("Can't find Rubicon library")
     java = cdll.LoadLibrary(_java_lib)
 
+# The native invocation module is a builtin module registered by the Rubicon
+# library when it starts the Python runtime. It provides typed method invokers
+# that avoid the overhead of a ctypes call. If it isn't available (e.g., if
+# Python was started by something other than the Rubicon library), all calls
+# are made using ctypes.
+try:
+    import _rubicon as native
+except ImportError:
+    native = None
+
 # These are the parts of the JNI API we use. You can find the spec for the rest here:
 # https://docs.oracle.com/javase/8/docs/technotes/guides/jni/spec/functions.html
 #
@@ -33,8 +43,26 @@ else:
 java.FindClass.restype = jclass
 java.FindClass.argtypes = [c_char_p]
 
+java.ExceptionClear.restype = None
+java.ExceptionClear.argtypes = []
+
+java.PushLocalFrame.restype = jint
+java.PushLocalFrame.argtypes = [jint]
+java.EnsureLocalCapacity.restype = jint
+java.EnsureLocalCapacity.argtypes = [jint]
+java.PopLocalFrame.restype = jobject
+java.PopLocalFrame.argtypes = [jobject]
+
 java.NewGlobalRef.restype = jobject
 java.NewGlobalRef.argtypes = [jobject]
+java.DeleteGlobalRef.restype = None
+java.DeleteGlobalRef.argtypes = [jobject]
+java.DeleteGlobalRefs.restype = None
+java.DeleteGlobalRefs.argtypes = [POINTER(jobject), jsize]
+java.NewWeakGlobalRef.restype = jweak
+java.NewWeakGlobalRef.argtypes = [jobject]
+java.DeleteWeakGlobalRef.restype = None
+java.DeleteWeakGlobalRef.argtypes = [jweak]
 
 java.DeleteLocalRef.restype = None
 java.DeleteLocalRef.argtypes = [jobject]
@@ -42,8 +70,17 @@ java.DeleteLocalRef.argtypes = [jobject]
 java.NewLocalRef.restype = jobject
 java.NewLocalRef.argtypes = [jobject]
 
+java.IsInstanceOf.restype = jboolean
+java.IsInstanceOf.argtypes = [jobject, jclass]
+java.IsSameObject.restype = jboolean
+java.IsSameObject.argtypes = [jobject, jobject]
+java.IsAssignableFrom.restype = jboolean
+java.IsAssignableFrom.argtypes = [jclass, jclass]
+
 java.NewObject.restype = jobject
 java.NewObject.argtypes = [jclass, jmethodID]
+java.NewObjectA.restype = jobject
+java.NewObjectA.argtypes = [jclass, jmethodID, jvalue_p]
 
 java.GetMethodID.restype = jmethodID
 java.GetMethodID.argtypes = [jclass, c_char_p, c_char_p]
@@ -69,6 +106,27 @@ java.CallDoubleMethod.argtypes = [jobject, jmethodID]
 java.CallVoidMethod.restype = None
 java.CallVoidMethod.argtypes = [jobject, jmethodID]
 
+java.CallObjectMethodA.restype = jobject
+java.CallObjectMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallBooleanMethodA.restype = jboolean
+java.CallBooleanMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallByteMethodA.restype = jbyte
+java.CallByteMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallCharMethodA.restype = jchar
+java.CallCharMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallShortMethodA.restype = jshort
+java.CallShortMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallIntMethodA.restype = jint
+java.CallIntMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallLongMethodA.restype = jlong
+java.CallLongMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallFloatMethodA.restype = jfloat
+java.CallFloatMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallDoubleMethodA.restype = jdouble
+java.CallDoubleMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+java.CallVoidMethodA.restype = None
+java.CallVoidMethodA.argtypes = [jobject, jmethodID, jvalue_p]
+
 java.GetFieldID.restype = jfieldID
 java.GetFieldID.argtypes = [jclass, c_char_p, c_char_p]
 
@@ -134,6 +192,27 @@ java.CallStaticDoubleMethod.argtypes = [jclass, jmethodID]
 java.CallStaticVoidMethod.restype = None
 java.CallStaticVoidMethod.argtypes = [jclass, jmethodID]
 
+java.CallStaticObjectMethodA.restype = jobject
+java.CallStaticObjectMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticBooleanMethodA.restype = jboolean
+java.CallStaticBooleanMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticByteMethodA.restype = jbyte
+java.CallStaticByteMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticCharMethodA.restype = jchar
+java.CallStaticCharMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticShortMethodA.restype = jshort
+java.CallStaticShortMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticIntMethodA.restype = jint
+java.CallStaticIntMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticLongMethodA.restype = jlong
+java.CallStaticLongMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticFloatMethodA.restype = jfloat
+java.CallStaticFloatMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticDoubleMethodA.restype = jdouble
+java.CallStaticDoubleMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+java.CallStaticVoidMethodA.restype = None
+java.CallStaticVoidMethodA.argtypes = [jclass, jmethodID, jvalue_p]
+
 java.GetStaticFieldID.restype = jfieldID
 java.GetStaticFieldID.argtypes = [jclass, c_char_p, c_char_p]
 
@@ -160,6 +239,12 @@ java.NewStringUTF.restype = jstring
 java.NewStringUTF.argtypes = [c_char_p]
 java.GetStringUTFChars.restype = c_char_p
 java.GetStringUTFChars.argtypes = [jstring, jboolean_p]
+java.NewString.restype = jstring
+java.NewString.argtypes = [c_char_p, jsize]
+java.GetStringLength.restype = jsize
+java.GetStringLength.argtypes = [jstring]
+java.GetStringRegion.restype = None
+java.GetStringRegion.argtypes = [jstring, jsize, jsize, c_char_p]
 
 java.GetArrayLength.restype = jsize
 java.GetArrayLength.argtypes = [jarray]
@@ -177,6 +262,19 @@ java.SetByteArrayRegion.restype = None
 java.SetByteArrayRegion.argtypes = [jbyteArray, jsize, jsize, jbyte_p]
 java.GetByteArrayElements.restype = jbyte_p
 java.GetByteArrayElements.argtypes = [jbyteArray, jboolean_p]
+java.ReleaseByteArrayElements.restype = None
+java.ReleaseByteArrayElements.argtypes = [jbyteArray, jbyte_p, jint]
+java.GetByteArrayRegion.restype = None
+java.GetByteArrayRegion.argtypes = [jbyteArray, jsize, jsize, jbyte_p]
+
+# jchar isn't 16 bits wide on every platform, so char arrays are
+# read and written using buffers of raw UTF-16 bytes.
+java.NewCharArray.restype = jcharArray
+java.NewCharArray.argtypes = [jsize]
+java.SetCharArrayRegion.restype = None
+java.SetCharArrayRegion.argtypes = [jcharArray, jsize, jsize, c_char_p]
+java.GetCharArrayRegion.restype = None
+java.GetCharArrayRegion.argtypes = [jcharArray, jsize, jsize, c_char_p]
 
 java.NewBooleanArray.restype = jbooleanArray
 java.NewBooleanArray.argtypes = [jsize]
@@ -184,6 +282,10 @@ java.SetBooleanArrayRegion.restype = None
 java.SetBooleanArrayRegion.argtypes = [jbooleanArray, jsize, jsize, jboolean_p]
 java.GetBooleanArrayElements.restype = jboolean_p
 java.GetBooleanArrayElements.argtypes = [jbooleanArray, jboolean_p]
+java.ReleaseBooleanArrayElements.restype = None
+java.ReleaseBooleanArrayElements.argtypes = [jbooleanArray, jboolean_p, jint]
+java.GetBooleanArrayRegion.restype = None
+java.GetBooleanArrayRegion.argtypes = [jbooleanArray, jsize, jsize, jboolean_p]
 
 java.NewDoubleArray.restype = jdoubleArray
 java.NewDoubleArray.argtypes = [jsize]
@@ -191,6 +293,10 @@ java.SetDoubleArrayRegion.restype = None
 java.SetDoubleArrayRegion.argtypes = [jdoubleArray, jsize, jsize, jdouble_p]
 java.GetDoubleArrayElements.restype = jdouble_p
 java.GetDoubleArrayElements.argtypes = [jdoubleArray, jboolean_p]
+java.ReleaseDoubleArrayElements.restype = None
+java.ReleaseDoubleArrayElements.argtypes = [jdoubleArray, jdouble_p, jint]
+java.GetDoubleArrayRegion.restype = None
+java.GetDoubleArrayRegion.argtypes = [jdoubleArray, jsize, jsize, jdouble_p]
 
 java.NewShortArray.restype = jshortArray
 java.NewShortArray.argtypes = [jsize]
@@ -198,6 +304,10 @@ java.SetShortArrayRegion.restype = None
 java.SetShortArrayRegion.argtypes = [jshortArray, jsize, jsize, jshort_p]
 java.GetShortArrayElements.restype = jshort_p
 java.GetShortArrayElements.argtypes = [jshortArray, jboolean_p]
+java.ReleaseShortArrayElements.restype = None
+java.ReleaseShortArrayElements.argtypes = [jshortArray, jshort_p, jint]
+java.GetShortArrayRegion.restype = None
+java.GetShortArrayRegion.argtypes = [jshortArray, jsize, jsize, jshort_p]
 
 java.NewIntArray.restype = jintArray
 java.NewIntArray.argtypes = [jsize]
@@ -205,6 +315,10 @@ java.SetIntArrayRegion.restype = None
 java.SetIntArrayRegion.argtypes = [jintArray, jsize, jsize, jint_p]
 java.GetIntArrayElements.restype = jint_p
 java.GetIntArrayElements.argtypes = [jintArray, jboolean_p]
+java.ReleaseIntArrayElements.restype = None
+java.ReleaseIntArrayElements.argtypes = [jintArray, jint_p, jint]
+java.GetIntArrayRegion.restype = None
+java.GetIntArrayRegion.argtypes = [jintArray, jsize, jsize, jint_p]
 
 java.NewLongArray.restype = jlongArray
 java.NewLongArray.argtypes = [jsize]
@@ -212,6 +326,10 @@ java.SetLongArrayRegion.restype = None
 java.SetLongArrayRegion.argtypes = [jlongArray, jsize, jsize, jlong_p]
 java.GetLongArrayElements.restype = jlong_p
 java.GetLongArrayElements.argtypes = [jlongArray, jboolean_p]
+java.ReleaseLongArrayElements.restype = None
+java.ReleaseLongArrayElements.argtypes = [jlongArray, jlong_p, jint]
+java.GetLongArrayRegion.restype = None
+java.GetLongArrayRegion.argtypes = [jlongArray, jsize, jsize, jlong_p]
 
 java.NewFloatArray.restype = jfloatArray
 java.NewFloatArray.argtypes = [jsize]
@@ -219,6 +337,17 @@ java.SetFloatArrayRegion.restype = None
 java.SetFloatArrayRegion.argtypes = [jfloatArray, jsize, jsize, jfloat_p]
 java.GetFloatArrayElements.restype = jfloat_p
 java.GetFloatArrayElements.argtypes = [jfloatArray, jboolean_p]
+java.ReleaseFloatArrayElements.restype = None
+java.ReleaseFloatArrayElements.argtypes = [jfloatArray, jfloat_p, jint]
+java.GetFloatArrayRegion.restype = None
+java.GetFloatArrayRegion.argtypes = [jfloatArray, jsize, jsize, jfloat_p]
+
+java.NewDirectByteBuffer.restype = jobject
+java.NewDirectByteBuffer.argtypes = [c_void_p, jlong]
+java.GetDirectBufferAddress.restype = c_void_p
+java.GetDirectBufferAddress.argtypes = [jobject]
+java.GetDirectBufferCapacity.restype = jlong
+java.GetDirectBufferCapacity.argtypes = [jobject]
 
 
 class _ReflectionAPI(object):
@@ -228,46 +357,32 @@ class _ReflectionAPI(object):
         self._descriptors = {
             'Class': ('FindClass', b'java/lang/Class'),
             'Class__getName': ('GetMethodID', 'Class', b'getName', b'()Ljava/lang/String;'),
-            'Class__getConstructors': (
-                'GetMethodID', 'Class', b'getConstructors', b'()[Ljava/lang/reflect/Constructor;'
-            ),
             'Class__getMethods': ('GetMethodID', 'Class', b'getMethods', b'()[Ljava/lang/reflect/Method;'),
             'Class__getInterfaces': ('GetMethodID', 'Class', b'getInterfaces', b'()[Ljava/lang/Class;'),
             'Class__getSuperclass': ('GetMethodID', 'Class', b'getSuperclass', b'()Ljava/lang/Class;'),
 
-            'Constructor': ('FindClass', b'java/lang/reflect/Constructor'),
-            'Constructor__getParameterTypes': (
-                'GetMethodID', 'Constructor', b'getParameterTypes', b'()[Ljava/lang/Class;'
-            ),
-            'Constructor__getModifiers': ('GetMethodID', 'Constructor', b'getModifiers', b'()I'),
-
             'Method': ('FindClass', b'java/lang/reflect/Method'),
             'Method__getName': ('GetMethodID', 'Method', b'getName', b'()Ljava/lang/String;'),
-            'Method__getReturnType': (
-                'GetMethodID', 'Method', b'getReturnType', b'()Ljava/lang/Class;'
-            ),
             'Method__getParameterTypes': (
                 'GetMethodID', 'Method', b'getParameterTypes', b'()[Ljava/lang/Class;'
             ),
             'Method__getModifiers': ('GetMethodID', 'Method', b'getModifiers', b'()I'),
 
-            'Field': ('FindClass', b'java/lang/reflect/Field'),
-            'Field__getType': ('GetMethodID', 'Field', b'getType', b'()Ljava/lang/Class;'),
-
             'Modifier': ('FindClass', b'java/lang/reflect/Modifier'),
             'Modifier__isStatic': ('GetStaticMethodID', 'Modifier', b'isStatic', b'(I)Z'),
             'Modifier__isPublic': ('GetStaticMethodID', 'Modifier', b'isPublic', b'(I)Z'),
 
             'Python': ('FindClass', b'org/beeware/rubicon/Python'),
             'Python__proxy': ('GetStaticMethodID', 'Python', b'proxy', b'(Ljava/lang/Class;J)Ljava/lang/Object;'),
-            'Python__getField': (
-                'GetStaticMethodID', 'Python', b'getField',
-                b'(Ljava/lang/Class;Ljava/lang/String;Z)Ljava/lang/reflect/Field;'
-            ),
-            'Python__getMethods': (
-                'GetStaticMethodID', 'Python', b'getMethods',
-                b'(Ljava/lang/Class;Ljava/lang/String;Z)[Ljava/lang/reflect/Method;'
-            ),
+            'Python__describe': ('GetStaticMethodID', 'Python', b'describe', b'(Ljava/lang/Class;)Ljava/lang/String;'),
+            'Python__packStrings': ('GetStaticMethodID', 'Python', b'packStrings', b'([Ljava/lang/String;)[C'),
+            'Python__unpackStrings': ('GetStaticMethodID', 'Python', b'unpackStrings', b'([CI)[Ljava/lang/String;'),
+
+            'PythonInstance': ('FindClass', b'org/beeware/rubicon/PythonInstance'),
+            'PythonInstance__released': ('GetStaticMethodID', 'PythonInstance', b'released', b'()[J'),
+            'PythonInstance__track': ('GetStaticMethodID', 'PythonInstance', b'track', b'(Ljava/lang/Object;J)V'),
+
+            'String': ('FindClass', b'java/lang/String'),
 
             'Boolean': ('FindClass', b'java/lang/Boolean'),
             'Boolean__booleanValue': ('GetMethodID', 'Boolean', b'booleanValue', b'()Z'),
@@ -0,0 +1,264 @@
+import hashlib
+import mmap
+import os
+import threading
+
+from .jni import java
+from .strings import new_string, string_value
+from .types import jvalue
+
+__all__ = ['MetadataCache', 'set_metadata_cache', 'classpath_fingerprint']
+
+
+# The version of the file format; files with a different version are ignored.
+METADATA_VERSION = 1
+
+
+def _system_property(name):
+    system = java.FindClass(b'java/lang/System')
+    get_property = java.GetStaticMethodID(system, b'getProperty', b'(Ljava/lang/String;)Ljava/lang/String;')
+    jname = new_string(name)
+    ref = java.CallStaticObjectMethodA(system, get_property, (jvalue * 1)(jvalue(l=jname)))
+    java.DeleteLocalRef(jname)
+    java.DeleteLocalRef(system)
+    if ref.value is None:
+        java.ExceptionClear()
+        return ''
+    value = string_value(ref)
+    java.DeleteLocalRef(ref)
+    return value
+
+
+def classpath_fingerprint():
+    """Compute a fingerprint of the classes available to the VM.
+
+    The fingerprint covers the version of the VM, the classpath, and the
+    size and modification time of each entry on the classpath; it changes
+    whenever any of those change.
+
+    Under Android, the classes of an app are not on the classpath; a
+    fingerprint identifying the installed APK (such as its version code and
+    update time) should be provided to MetadataCache instead.
+    """
+    classpath = _system_property('java.class.path')
+    parts = [_system_property('java.vm.version'), classpath]
+    for entry in classpath.split(os.pathsep):
+        try:
+            stat = os.stat(entry)
+            parts.append('%s %d %d' % (entry, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            parts.append(entry)
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class MetadataCache:
+    """A persistent cache of the metadata of Java classes.
+
+    The first time a class is used, its metadata is discovered through
+    reflection: the alternate types it can be passed as, and the signatures
+    of its public members (see Python.describe()). A MetadataCache stores
+    that metadata in a file, so that a later process can wrap the same
+    classes without any reflection; only the JNI IDs of the members that
+    are actually used need to be looked up.
+
+    The cache is opt-in:
+
+        cache = MetadataCache('/path/to/rubicon.cache')
+        set_metadata_cache(cache)
+        ...  # use Java classes
+        cache.save()
+
+    The file is only valid for a single set of classes. It is keyed by a
+    fingerprint; if the fingerprint of the file doesn't match the current
+    fingerprint, its content is ignored (and replaced the next time the
+    cache is saved). If fingerprint is None, the classpath_fingerprint() is
+    used.
+
+    The file is memory mapped when the cache is created; the metadata of a
+    class is only parsed when that class is used.
+    """
+    def __init__(self, path, fingerprint=None):
+        self.path = path
+        self.fingerprint = fingerprint if fingerprint is not None else classpath_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._records = {}
+        self._data = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(set(self._entries) | set(self._records))
+
+    def __contains__(self, descriptor):
+        return descriptor in self._entries or descriptor in self._records
+
+    def _header(self):
+        return b'rubicon-metadata %d %s\n' % (METADATA_VERSION, self.fingerprint.encode('utf-8'))
+
+    def _load(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # The file must have been written for the current classes, and
+        # must be complete.
+        header = self._header()
+        end = len(data) - 2
+        if data[:len(header)] != header or data[end - 1:] != b'\nE\n':
+            data.close()
+            return
+
+        # Index the records for each class: a 'K <descriptor>' line,
+        # followed by the metadata of the class.
+        records = {}
+        pos = len(header)
+        while pos < end:
+            if data[pos:pos + 2] != b'K ':
+                data.close()
+                return
+            line_end = data.find(b'\n', pos)
+            next_pos = data.find(b'\nK ', line_end, end)
+            next_pos = end if next_pos == -1 else next_pos + 1
+            records[data[pos + 2:line_end].decode('utf-8')] = (line_end + 1, next_pos)
+            pos = next_pos
+
+        self._data = data
+        self._records = records
+
+    def _parse(self, start, end):
+        alternates = None
+        description = None
+        record = self._data[start:end]
+        pos = 0
+        while pos < len(record):
+            line_end = record.index(b'\n', pos)
+            line = record[pos:line_end]
+            if line.startswith(b'A '):
+                alternates = line[2:].split(b' ')
+            elif line == b'D':
+                # The rest of the record is the description of the class.
+                description = record[line_end + 1:].decode('utf-8')
+                break
+            pos = line_end + 1
+        return {
+            'alternates': alternates,
+            'description': description,
+        }
+
+    def get(self, descriptor):
+        """Retrieve the cached metadata of a class.
+
+        Returns a dictionary with the 'alternates' of the class (a list of
+        type signatures), and its 'description' (in the format returned by
+        Python.describe()); either may be None if it has not been cached.
+        Returns None if nothing is cached for the class.
+        """
+        with self._lock:
+            entry = self._entries.get(descriptor)
+            if entry is None:
+                record = self._records.get(descriptor)
+                if record is None:
+                    self.misses += 1
+                    return None
+                entry = self._parse(*record)
+                self._entries[descriptor] = entry
+            self.hits += 1
+            return entry
+
+    def put(self, descriptor, alternates=None, description=None):
+        """Add metadata for a class to the cache.
+
+        Only the metadata that is provided is updated.
+        """
+        with self._lock:
+            entry = self._entries.get(descriptor)
+            if entry is None:
+                record = self._records.get(descriptor)
+                entry = self._parse(*record) if record else {'alternates': None, 'description': None}
+                self._entries[descriptor] = entry
+            if alternates is not None:
+                entry['alternates'] = list(alternates)
+            if description is not None:
+                entry['description'] = description
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk, if it has changed since it was loaded.
+
+        The file is replaced atomically, so a process that is interrupted
+        while saving can't leave a corrupted cache behind.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            parts = [self._header()]
+            for descriptor, (start, end) in self._records.items():
+                if descriptor not in self._entries:
+                    parts.append(b'K %s\n' % descriptor.encode('utf-8'))
+                    parts.append(self._data[start:end])
+            for descriptor, entry in self._entries.items():
+                parts.append(b'K %s\n' % descriptor.encode('utf-8'))
+                if entry['alternates'] is not None:
+                    parts.append(b'A %s\n' % b' '.join(entry['alternates']))
+                if entry['description'] is not None:
+                    parts.append(b'D\n')
+                    parts.append(entry['description'].encode('utf-8'))
+            parts.append(b'E\n')
+
+            # Every entry is now held in memory, so the mapping of the old
+            # file can be released before the file is replaced.
+            for descriptor, record in self._records.items():
+                if descriptor not in self._entries:
+                    self._entries[descriptor] = self._parse(*record)
+            self._records = {}
+            if self._data is not None:
+                self._data.close()
+                self._data = None
+
+            tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                f.write(b''.join(parts))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+# The cache used when wrapping Java classes, if any.
+_metadata_cache = None
+
+
+def set_metadata_cache(cache):
+    """Set the cache of class metadata used when wrapping Java classes.
+    cache is a MetadataCache, or None to disable caching (the default).
+    Only classes that are wrapped after the cache has been set are cached.
+    Returns the previous cache.
+    """
+    global _metadata_cache
+    previous = _metadata_cache
+    _metadata_cache = cache
+    return previous
+
+
+def cached_class(descriptor):
+    """Retrieve the cached metadata of a class (see MetadataCache.get()),
+    or None if no metadata cache is in use.
+    """
+    cache = _metadata_cache
+    if cache is None:
+        return None
+    return cache.get(descriptor)
+
+
+def cache_class(descriptor, alternates=None, description=None):
+    """Add metadata for a class to the metadata cache, if one is in use."""
+    cache = _metadata_cache
+    if cache is not None:
+        cache.put(descriptor, alternates=alternates, description=description)
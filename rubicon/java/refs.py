@@ -0,0 +1,202 @@
+from contextlib import contextmanager
+import queue
+import threading
+import time
+
+from .jni import java
+from .types import jclass, jobject, jweak
+
+__all__ = ['local_frame', 'release_global_ref', 'flush_global_refs', 'scope']
+
+
+@contextmanager
+def local_frame(capacity=16):
+    """Create a frame for JNI local references.
+
+    Every local reference created inside the frame (for example, by calls
+    made directly on the JNI API) is released when the context exits:
+
+        with local_frame(100):
+            for i in range(100):
+                java.NewStringUTF(b'...')
+
+    Objects returned by Java methods and constructors are held by global
+    references, so they remain valid after the frame has been released.
+
+    capacity is the number of local references that are guaranteed to be
+    available in the frame; more references can be created, subject to the
+    limits of the VM.
+    """
+    if java.PushLocalFrame(capacity) != 0:
+        java.ExceptionClear()
+        raise MemoryError("Unable to create a local reference frame with capacity %d" % capacity)
+    try:
+        yield
+    finally:
+        java.PopLocalFrame(None)
+
+
+###########################################################################
+# Deferred release of global references
+###########################################################################
+
+# How long the release thread waits after the first reference is queued,
+# so that references released together are deleted in one batch.
+RELEASE_INTERVAL = 0.05
+
+# Global references waiting to be deleted. A SimpleQueue can be safely used
+# from __del__, which may run at any point - including inside another
+# put() on the same queue. SimpleQueue was added in Python 3.7; Python 3.6
+# falls back to a Queue, which is thread-safe, but not reentrant.
+_Queue = getattr(queue, 'SimpleQueue', queue.Queue)
+_released = _Queue()
+_release_lock = threading.Lock()
+
+# Wakes the release thread; one token is queued for each released reference.
+# The references themselves are only ever removed from _released while
+# _release_lock is held, so flush_global_refs() always accounts for them.
+_release_wakeup = _Queue()
+
+
+def release_global_ref(ref):
+    """Queue a global reference to be deleted.
+
+    This doesn't call into Java; the reference is deleted by a background
+    thread, in a batch with any other references that have been released.
+    Weak global references (jweak) can also be released in this way.
+    """
+    if isinstance(ref, jweak):
+        _released.put(ref)
+    else:
+        _released.put(ref.value if isinstance(ref, jobject) else ref)
+    _release_wakeup.put(None)
+
+
+def _delete_released(refs):
+    try:
+        while True:
+            refs.append(_released.get_nowait())
+    except queue.Empty:
+        pass
+
+    weak = [ref for ref in refs if isinstance(ref, jweak)]
+    strong = [ref for ref in refs if not isinstance(ref, jweak)]
+    for ref in weak:
+        java.DeleteWeakGlobalRef(ref)
+    if strong:
+        java.DeleteGlobalRefs((jobject * len(strong))(*strong), len(strong))
+    return len(refs)
+
+
+def flush_global_refs():
+    """Immediately delete all the global references that are queued for release.
+
+    Returns the number of references that were deleted.
+    """
+    with _release_lock:
+        return _delete_released([])
+
+
+def _release_worker():
+    while True:
+        # Wait until there is something to release, then discard the
+        # tokens for everything released so far, as it will be deleted in
+        # this batch (or has already been flushed).
+        _release_wakeup.get()
+        time.sleep(RELEASE_INTERVAL)
+        try:
+            while True:
+                _release_wakeup.get_nowait()
+        except queue.Empty:
+            pass
+        with _release_lock:
+            _delete_released([])
+
+
+_release_thread = threading.Thread(target=_release_worker, name='rubicon-release', daemon=True)
+_release_thread.start()
+
+
+###########################################################################
+# Scoped release of global references
+###########################################################################
+
+_scopes = threading.local()
+
+
+class Scope:
+    """A collection of Java instances whose global references are released together.
+
+    Use scope() to create a scope.
+    """
+    def __init__(self, parent):
+        self.parent = parent
+        self.instances = []
+
+    def promote(self, *instances):
+        """Remove instances from this scope, so they survive when it exits.
+
+        A promoted instance moves to the enclosing scope; if there isn't one,
+        its reference is released when the instance is garbage collected.
+        Returns the instance (or a tuple of instances) that was promoted.
+        """
+        promoted = set(id(instance) for instance in instances)
+        self.instances = [instance for instance in self.instances if id(instance) not in promoted]
+        if self.parent is not None:
+            self.parent.instances.extend(instances)
+        return instances[0] if len(instances) == 1 else instances
+
+    def release(self):
+        """Release the global references held by every instance in the scope."""
+        refs = []
+        for instance in self.instances:
+            if instance.__dict__.get('_owned'):
+                object.__setattr__(instance, '_owned', False)
+                refs.append(instance.__dict__['__jni__'].value)
+                # Make sure the released reference can't be used again.
+                object.__setattr__(instance, '__jni__', jclass(None))
+                object.__setattr__(instance, '_as_parameter_', instance.__dict__['__jni__'])
+        self.instances = []
+
+        if refs:
+            java.DeleteGlobalRefs((jobject * len(refs))(*refs), len(refs))
+        return len(refs)
+
+
+@contextmanager
+def scope():
+    """Release every Java instance created in the block when the block exits.
+
+    Instances created by constructors, returned by Java methods and fields,
+    and created by casts or __global__() inside the scope are tracked; when
+    the scope exits, all their global references are released in one pass,
+    without waiting for the Python wrappers to be garbage collected:
+
+        with scope() as s:
+            for i in range(100000):
+                thing = Thing('thing', i)
+                ...
+            result = s.promote(example.get_thing())
+
+    Instances that need to outlive the scope must be promoted; any other
+    instance created in the scope must not be used after it exits. Scopes
+    can be nested, and apply to the thread that created them.
+    """
+    stack = getattr(_scopes, 'stack', None)
+    if stack is None:
+        stack = _scopes.stack = []
+
+    current = Scope(stack[-1] if stack else None)
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.pop()
+        current.release()
+
+
+def track_instance(instance):
+    """Register a newly created Java instance with the current scope (if any)."""
+    stack = getattr(_scopes, 'stack', None)
+    if stack:
+        stack[-1].instances.append(instance)
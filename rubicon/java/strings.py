@@ -0,0 +1,380 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from ctypes import create_string_buffer
+import struct
+import sys
+import threading
+
+from .jni import java, native, reflect
+from .refs import release_global_ref, track_instance
+from .types import jcharArray, jobjectArray, jstring, jvalue
+
+__all__ = [
+    'new_string', 'string_value', 'pack_strings', 'unpack_strings', 'StringCache', 'set_string_cache',
+    'JavaString', 'set_string_return_type', 'string_return_type',
+]
+
+
+# The codec matching the layout of Java chars in memory on this platform.
+_UTF16 = 'utf-16-le' if sys.byteorder == 'little' else 'utf-16-be'
+
+
+# The length prefix of each string in a packed array of strings: the high
+# and low 16 bits of the length, as UTF-16 chars (see Python.packStrings()).
+_PACKED_LENGTH = struct.Struct('=HH')
+_PACKED_NULL = 0xFFFFFFFF
+
+
+def pack_strings(values):
+    """Create a Java String[] holding a sequence of Python strings (or None).
+
+    Returns a new local reference to the array; the caller is responsible
+    for releasing it.
+
+    The strings are encoded into a single buffer of UTF-16 characters, which
+    is unpacked into an array of Strings by Java; the whole array is created
+    with two calls into Java, regardless of the number of strings.
+    """
+    parts = []
+    for value in values:
+        if value is None:
+            parts.append(_PACKED_LENGTH.pack(0xFFFF, 0xFFFF))
+        else:
+            data = value.encode(_UTF16, 'surrogatepass')
+            length = len(data) // 2
+            parts.append(_PACKED_LENGTH.pack(length >> 16, length & 0xFFFF))
+            parts.append(data)
+    data = b''.join(parts)
+
+    if native is not None:
+        packed = jcharArray(native.NewArrayFromBuffer(b'C', data))
+    else:
+        packed = java.NewCharArray(len(data) // 2)
+        if packed.value is None:
+            java.ExceptionClear()
+            raise MemoryError("Unable to create Java char array of length %d" % (len(data) // 2))
+        java.SetCharArrayRegion(packed, 0, len(data) // 2, data)
+
+    strings = java.CallStaticObjectMethodA(
+        reflect.Python,
+        reflect.Python__unpackStrings,
+        (jvalue * 2)(jvalue(l=packed), jvalue(i=len(values))),
+    )
+    java.DeleteLocalRef(packed)
+    if strings.value is None:
+        java.ExceptionClear()
+        raise MemoryError("Unable to create Java string array of length %d" % len(values))
+    return jobjectArray(strings.value)
+
+
+def unpack_strings(ref):
+    """Convert a reference to a Java String[] into a list of Python strings.
+
+    Null elements of the array are returned as None. The reference is not
+    released.
+
+    Java packs the whole array into a single buffer of UTF-16 characters,
+    which is retrieved with one copy and decoded in Python; the conversion
+    takes two calls into Java, regardless of the number of strings.
+    """
+    packed = java.CallStaticObjectMethodA(
+        reflect.Python,
+        reflect.Python__packStrings,
+        (jvalue * 1)(jvalue(l=ref)),
+    )
+    if packed.value is None:
+        java.ExceptionClear()
+        raise MemoryError("Unable to pack Java string array")
+    packed = jcharArray(packed.value)
+    length = java.GetArrayLength(packed)
+    buffer = create_string_buffer(length * 2)
+    java.GetCharArrayRegion(packed, 0, length, buffer)
+    java.DeleteLocalRef(packed)
+    data = buffer.raw
+
+    values = []
+    pos = 0
+    end = len(data)
+    while pos < end:
+        high, low = _PACKED_LENGTH.unpack_from(data, pos)
+        pos += 4
+        length = (high << 16) | low
+        if length == _PACKED_NULL:
+            values.append(None)
+        else:
+            values.append(data[pos:pos + length * 2].decode(_UTF16, 'surrogatepass'))
+            pos += length * 2
+    return values
+
+
+class StringCache:
+    """A bounded LRU cache of Java Strings, keyed by their Python value.
+    Each cached String is held by a global reference; when a string is passed
+    to Java, a new local reference to the cached String is used instead of
+    creating a new String. Only strings of at most max_length characters are
+    cached, as the cost of creating short strings is dominated by the
+    allocation, rather than the copy.
+    When the cache is full, the least recently used String is evicted, and its
+    global reference is released.
+    """
+    def __init__(self, maxsize=256, max_length=64):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._strings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __del__(self):
+        for ref in self._strings.values():
+            release_global_ref(ref)
+
+    @property
+    def hit_rate(self):
+        """The fraction of cacheable strings that were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Evict every String in the cache."""
+        with self._lock:
+            while self._strings:
+                release_global_ref(self._strings.popitem()[1])
+
+    def new_string(self, value):
+        """Return a new local reference to a Java String with the given value,
+        or None if the value is too long to be cached.
+        """
+        if len(value) > self.max_length:
+            return None
+
+        with self._lock:
+            ref = self._strings.get(value)
+            if ref is not None:
+                self._strings.move_to_end(value)
+                self.hits += 1
+                # The local reference is created while the lock is held, so
+                # the String can't be evicted (and released) in the meantime.
+                return jstring(java.NewLocalRef(ref).value)
+
+            self.misses += 1
+            local = _new_string(value)
+            ref = jstring(java.NewGlobalRef(local).value)
+            if ref.value is not None:
+                self._strings[value] = ref
+                while len(self._strings) > self.maxsize:
+                    release_global_ref(self._strings.popitem(last=False)[1])
+                    self.evictions += 1
+            return local
+
+
+# The cache used by new_string(), if any.
+_string_cache = None
+
+
+def set_string_cache(cache):
+    """Set the cache of Java Strings used when passing strings to Java.
+    cache is a StringCache, or None to disable caching (the default).
+    Returns the previous cache; its Strings are released when it is cleared
+    or garbage collected.
+    """
+    global _string_cache
+    previous = _string_cache
+    _string_cache = cache
+    return previous
+
+
+def new_string(value):
+    """Create a Java String with the content of a Python string.
+
+    Returns a new local reference to the String; the caller is responsible
+    for releasing it.
+
+    Unlike NewStringUTF, the conversion is exact for every string: characters
+    outside the Basic Multilingual Plane are passed to Java as surrogate pairs,
+    and embedded NULs are preserved. The cheapest conversion is chosen based
+    on the content of the string; ASCII strings are passed to Java without
+    being re-encoded.
+
+    If a StringCache has been installed with set_string_cache(), the String
+    is retrieved from (or added to) the cache.
+    """
+    cache = _string_cache
+    if cache is not None:
+        ref = cache.new_string(value)
+        if ref is not None:
+            return ref
+    return _new_string(value)
+
+
+def _new_string(value):
+    if native is not None:
+        return jstring(native.NewString(value))
+
+    # ASCII strings without NULs are identical in modified UTF-8.
+    ascii = None
+    if '\0' not in value:
+        try:
+            ascii = value.encode('ascii')
+        except UnicodeEncodeError:
+            pass
+
+    if ascii is not None:
+        ref = java.NewStringUTF(ascii)
+    else:
+        data = value.encode(_UTF16, 'surrogatepass')
+        ref = java.NewString(data, len(data) // 2)
+    if ref.value is None:
+        java.ExceptionClear()
+        raise MemoryError("Unable to create Java string of length %d" % len(value))
+    return ref
+
+
+def string_value(ref):
+    """Convert a reference to a Java String into a Python string.
+
+    The reference is not released. The characters of the String are copied
+    directly from Java as UTF-16, so no JNI resources are retained once the
+    conversion is complete.
+    """
+    if native is not None:
+        return native.GetString(ref)
+
+    ref = jstring(getattr(ref, 'value', ref))
+    length = java.GetStringLength(ref)
+    data = create_string_buffer(length * 2)
+    java.GetStringRegion(ref, 0, length, data)
+    return data.raw.decode(_UTF16, 'surrogatepass')
+
+
+###########################################################################
+# Lazily decoded strings
+###########################################################################
+
+class JavaString:
+    """A Java String that is only decoded into a Python string when it is used.
+
+    A JavaString is returned in place of a str when the string return type is
+    'JavaString' (see set_string_return_type()). It holds a global reference
+    to the String, and can be passed back to Java wherever a String is
+    expected without being re-encoded.
+
+    The content is decoded (once) the first time it is needed - by str(),
+    comparison, hashing, len(), and so on. A JavaString compares equal to
+    (and has the same hash as) a str with the same content.
+
+    A JavaString can also be created from a Python string, encoding it once
+    for use in many calls:
+
+        key = JavaString("id")
+    """
+    def __init__(self, value):
+        if isinstance(value, str):
+            local = new_string(value)
+            self._value = value
+        else:
+            local = value
+            self._value = None
+        self.__jni__ = jstring(java.NewGlobalRef(local).value)
+        if isinstance(value, str):
+            java.DeleteLocalRef(local)
+        if self.__jni__.value is None:
+            raise RuntimeError("Unable to create global reference to string.")
+        self._as_parameter_ = self.__jni__
+        self._owned = True
+        track_instance(self)
+
+    def __del__(self):
+        # Queue the global reference for release (see JavaInstance.__del__).
+        if self.__dict__.get('_owned'):
+            release_global_ref(self.__dict__['__jni__'])
+
+    def __str__(self):
+        if self._value is None:
+            self._value = string_value(self.__jni__)
+        return self._value
+
+    def __repr__(self):
+        return "<JavaString: %r>" % str(self)
+
+    def __len__(self):
+        return len(str(self))
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __eq__(self, other):
+        if isinstance(other, JavaString):
+            if java.IsSameObject(self.__jni__, other.__jni__):
+                return True
+            return str(self) == str(other)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+
+# The representations that can be used for Strings returned by Java.
+STRING_RETURN_TYPES = ('str', 'JavaString')
+
+_string_return_type = 'str'
+_local_string_return_type = threading.local()
+
+
+def _check_string_return_type(kind):
+    if kind not in STRING_RETURN_TYPES:
+        raise ValueError("Unknown string return type %r; must be one of %s" % (kind, ', '.join(STRING_RETURN_TYPES)))
+
+
+def set_string_return_type(kind):
+    """Set how Strings returned by Java are represented in Python.
+    kind is one of:
+     * 'str' - a Python string (the default).
+     * 'JavaString' - a JavaString, which is only decoded when it is used.
+    Returns the previous setting.
+    """
+    global _string_return_type
+    _check_string_return_type(kind)
+    previous = _string_return_type
+    _string_return_type = kind
+    return previous
+
+
+@contextmanager
+def string_return_type(kind):
+    """Use a different representation for Strings returned by Java inside a block.
+    The setting only applies to the current thread:
+
+        with string_return_type('JavaString'):
+            key = record.getKey()
+        index.lookup(key)
+
+    See set_string_return_type() for the available kinds.
+    """
+    _check_string_return_type(kind)
+    previous = getattr(_local_string_return_type, 'kind', None)
+    _local_string_return_type.kind = kind
+    try:
+        yield
+    finally:
+        _local_string_return_type.kind = previous
+
+
+def _current_string_return_type():
+    return getattr(_local_string_return_type, 'kind', None) or _string_return_type
+
+
+def returned_string(ref):
+    """Convert a reference to a String returned by Java into the current string return type.
+    The reference is not released.
+    """
+    if _current_string_return_type() == 'JavaString':
+        return JavaString(ref)
+    return string_value(ref)
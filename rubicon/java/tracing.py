@@ -0,0 +1,121 @@
+from collections import namedtuple
+import threading
+import time
+
+__all__ = ['Resolution', 'ResolutionTrace', 'set_resolution_trace']
+
+
+# The version of the trace file format.
+TRACE_VERSION = 1
+
+# The kinds of resolution that are traced:
+#  * 'class' - a Java class was wrapped.
+#  * 'constructors' - the constructor signatures of a class were loaded.
+#  * 'constructor' - a constructor (named by its parameter signature) was resolved.
+#  * 'field' - a field was looked up (whether or not it exists).
+#  * 'method' - a method was looked up (whether or not it exists).
+RESOLUTION_KINDS = ('class', 'constructors', 'constructor', 'field', 'method')
+
+Resolution = namedtuple('Resolution', ['kind', 'descriptor', 'name', 'is_static', 'duration'])
+
+
+class ResolutionTrace:
+    """A record of the classes and members resolved by rubicon, in the order
+    they were first resolved, with the time (in seconds) that each resolution
+    took.
+
+    A trace is recorded while it is installed with set_resolution_trace():
+
+        trace = ResolutionTrace()
+        set_resolution_trace(trace)
+        ...  # start the app
+        set_resolution_trace(None)
+        trace.save('/path/to/startup.trace')
+
+    A saved trace can be replayed at the next startup (see replay()), so
+    that exactly the classes and members that will be needed are resolved
+    in advance, in the order they will be needed.
+    """
+    def __init__(self, entries=()):
+        self.entries = list(entries)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    @property
+    def total_time(self):
+        """The total time spent resolving the traced classes and members."""
+        return sum(entry.duration for entry in self.entries)
+
+    def record(self, kind, descriptor, name=None, is_static=False, duration=0.0):
+        """Add a resolution to the trace."""
+        if kind not in RESOLUTION_KINDS:
+            raise ValueError("Unknown resolution kind %r; must be one of %s" % (kind, ', '.join(RESOLUTION_KINDS)))
+        with self._lock:
+            self.entries.append(Resolution(kind, descriptor, name, is_static, duration))
+
+    def save(self, path):
+        """Write the trace to a file.
+
+        The file contains one resolution per line, as tab-separated fields:
+        the kind, the class descriptor, the member name (or '-'), 1 for
+        static members (or 0), and the duration in microseconds.
+        """
+        lines = ['# rubicon resolution trace %d\n' % TRACE_VERSION]
+        for entry in self:
+            lines.append('%s\t%s\t%s\t%d\t%d\n' % (
+                entry.kind,
+                entry.descriptor,
+                '-' if entry.name is None else entry.name,
+                entry.is_static,
+                round(entry.duration * 1000000),
+            ))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    @classmethod
+    def load(cls, path):
+        """Read a trace that was written by save()."""
+        with open(path, encoding='utf-8') as f:
+            header = f.readline()
+            if header != '# rubicon resolution trace %d\n' % TRACE_VERSION:
+                raise ValueError("%s is not a rubicon resolution trace." % path)
+            entries = []
+            for line in f:
+                kind, descriptor, name, is_static, duration = line.rstrip('\n').split('\t')
+                entries.append(Resolution(
+                    kind,
+                    descriptor,
+                    None if name == '-' else name,
+                    is_static == '1',
+                    int(duration) / 1000000,
+                ))
+        return cls(entries)
+
+
+# The trace that resolutions are recorded in, if any.
+_resolution_trace = None
+
+
+def set_resolution_trace(trace):
+    """Set the trace that resolutions of classes and members are recorded in.
+    trace is a ResolutionTrace, or None to stop tracing (the default).
+    Returns the previous trace.
+    """
+    global _resolution_trace
+    previous = _resolution_trace
+    _resolution_trace = trace
+    return previous
+
+
+def record_resolution(kind, descriptor, name, is_static, started):
+    """Record a resolution that began at time.perf_counter() == started,
+    if a trace is being recorded.
+    """
+    trace = _resolution_trace
+    if trace is not None:
+        trace.record(kind, descriptor, name, is_static, time.perf_counter() - started)
@@ -1,6 +1,6 @@
 from ctypes import (
-    POINTER, Structure, c_bool, c_byte, c_char_p, c_double, c_float, c_int16,
-    c_int32, c_int64, c_void_p, c_wchar,
+    POINTER, Structure, Union, c_bool, c_byte, c_char_p, c_double, c_float, c_int16,
+    c_int32, c_int64, c_uint16, c_void_p, c_wchar,
 )
 
 __all__ = [
@@ -11,7 +11,7 @@ __all__ = [
     'jclass', 'jthrowable', 'jstring', 'jarray',
     'jbooleanArray', 'jbyteArray', 'jcharArray', 'jshortArray', 'jintArray',
     'jlongArray', 'jfloatArray', 'jdoubleArray', 'jobjectArray',
-    'jweak', 'JNINativeMethod', 'JNINativeMethod_p',
+    'jweak', 'jvalue', 'jvalue_p', 'JNINativeMethod', 'JNINativeMethod_p',
     'JavaVM', 'JavaVM_p', 'JNIEnv',
 ]
 
@@ -104,6 +104,25 @@ class jweak(jobject):
     pass
 
 
+class jvalue(Union):
+    # The char field is an unsigned 16 bit value; jchar (c_wchar) may be
+    # wider than a Java char, depending on the platform.
+    _fields_ = [
+        ("z", jboolean),
+        ("b", jbyte),
+        ("c", c_uint16),
+        ("s", jshort),
+        ("i", jint),
+        ("j", jlong),
+        ("f", jfloat),
+        ("d", jdouble),
+        ("l", jobject),
+    ]
+
+
+jvalue_p = POINTER(jvalue)
+
+
 class JNINativeMethod(Structure):
     _fields_ = [
         ("name", c_char_p),
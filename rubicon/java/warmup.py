@@ -0,0 +1,144 @@
+from concurrent.futures import Future
+import threading
+
+from .api import JavaClass, _cache_constructor, _cache_constructors, _cache_field, _cache_methods
+from .refs import local_frame
+from .tracing import ResolutionTrace
+
+__all__ = ['preload', 'replay']
+
+
+# Preloading populates the same caches that are populated when a member is
+# first used; the caching functions hold the class lock while they check and
+# update those caches, so preloading can race with first use on another
+# thread without creating duplicate wrappers.
+
+def _preload_field(java_class, name, is_static):
+    _cache_field(java_class, name, is_static)
+
+
+def _preload_method(java_class, name, is_static):
+    _cache_methods(java_class, name, is_static)
+
+
+def _preload_constructors(java_class):
+    for sig, constructor in list(_cache_constructors(java_class).items()):
+        if constructor is None:
+            _cache_constructor(java_class, sig)
+
+
+def _preload_class(descriptor, names):
+    with local_frame():
+        java_class = JavaClass(descriptor)
+        _preload_constructors(java_class)
+        for name in names:
+            # The name could be a static or an instance member.
+            _preload_field(java_class, name, True)
+            _preload_method(java_class, name, True)
+            _preload_field(java_class, name, False)
+            _preload_method(java_class, name, False)
+    return java_class
+
+
+def _in_background(tasks):
+    # Run each task, in order, on a background thread. Every task is run,
+    # even if an earlier task fails. Returns a Future whose result is the
+    # list of task results; if any task fails, the Future raises the first
+    # exception that was encountered.
+    future = Future()
+
+    def _worker():
+        if not future.set_running_or_notify_cancel():
+            return
+        results = []
+        error = None
+        for task in tasks:
+            try:
+                results.append(task())
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is None:
+            future.set_result(results)
+        else:
+            future.set_exception(error)
+
+    threading.Thread(target=_worker, name='rubicon-preload', daemon=True).start()
+    return future
+
+
+def preload(classes, members=None):
+    """Resolve Java classes and their members on a background thread.
+
+    classes is a sequence of class descriptors (e.g., 'android/widget/TextView').
+    Each class is wrapped, and its constructors are resolved. members is an
+    optional mapping of class descriptors to the names of the fields and
+    methods of that class that should also be resolved:
+
+        preload(
+            ['android/widget/TextView', 'android/widget/Button'],
+            members={'android/widget/TextView': ['setText', 'setTextSize']},
+        )
+
+    Classes that appear in members are preloaded even if they aren't listed
+    in classes.
+
+    Preloading populates the same caches that are populated when a class or
+    member is first used, so that the first real use doesn't need to call
+    into Java; work done on the calling thread while the preload is running
+    isn't blocked.
+
+    Returns a concurrent.futures.Future, whose result is the list of
+    preloaded JavaClasses. Every class is preloaded, even if an earlier class
+    fails to load; if any class can't be preloaded, the future raises the
+    first exception that was encountered.
+    """
+    members = dict(members) if members else {}
+    descriptors = list(classes)
+    descriptors.extend(descriptor for descriptor in members if descriptor not in descriptors)
+    return _in_background([
+        lambda descriptor=descriptor: _preload_class(descriptor, members.get(descriptor, ()))
+        for descriptor in descriptors
+    ])
+
+
+def _replay_resolution(resolution):
+    with local_frame():
+        java_class = JavaClass(resolution.descriptor)
+        if resolution.kind == 'constructors':
+            _cache_constructors(java_class)
+        elif resolution.kind == 'constructor':
+            sig = resolution.name.encode('utf-8')
+            if sig in _cache_constructors(java_class):
+                _cache_constructor(java_class, sig)
+        elif resolution.kind == 'field':
+            _preload_field(java_class, resolution.name, resolution.is_static)
+        elif resolution.kind == 'method':
+            _preload_method(java_class, resolution.name, resolution.is_static)
+    return resolution
+
+
+def replay(trace):
+    """Replay a trace of resolutions on a background thread.
+
+    trace is a ResolutionTrace, or the path of a trace saved with
+    ResolutionTrace.save(). Every class and member in the trace is resolved
+    in the order it was originally resolved, populating the same caches
+    that are populated when they are first used:
+
+        replay('/path/to/startup.trace')
+
+    Unlike preload(), only the members that were actually used are
+    resolved.
+
+    Returns a concurrent.futures.Future, whose result is the list of
+    replayed resolutions. Every resolution is replayed, even if an earlier
+    resolution fails; if any resolution fails, the future raises the first
+    exception that was encountered.
+    """
+    if not isinstance(trace, ResolutionTrace):
+        trace = ResolutionTrace.load(trace)
+    return _in_background([
+        lambda resolution=resolution: _replay_resolution(resolution)
+        for resolution in trace
+    ])
@@ -3,7 +3,7 @@ from __future__ import division, print_function, unicode_literals
 
 from unittest import TestCase
 
-from rubicon.java import cast, java, jdouble, jlong, jstring
+from rubicon.java import cast, java, jdouble, jlong, jstring, jvalue, native
 
 
 class JNITest(TestCase):
@@ -236,3 +236,72 @@ class JNITest(TestCase):
             # Validate round trips through Java.
             java.CallStaticVoidMethod(Example, setter, jlong(num))
             self.assertEqual(java.CallStaticLongMethod(Example, getter), num)
+
+    def test_native_invokers(self):
+        "Methods can be invoked with Python values using the native invokers"
+        self.assertIsNotNone(native)
+
+        Example = java.FindClass(b"org/beeware/rubicon/test/Example")
+        self.assertIsNotNone(Example.value)
+
+        # Static methods
+        tripler_int = java.GetStaticMethodID(Example, b"tripler", b"(I)I")
+        self.assertIsNotNone(tripler_int.value)
+        self.assertEqual(native.CallStaticIntMethod(Example, tripler_int, b'I', [42]), 126)
+
+        tripler_str = java.GetStaticMethodID(Example, b"tripler", b"(Ljava/lang/String;)Ljava/lang/String;")
+        self.assertIsNotNone(tripler_str.value)
+        result = native.CallStaticObjectMethod(Example, tripler_str, b'L', [java.NewStringUTF(b"ab")])
+        self.assertEqual(java.GetStringUTFChars(cast(result, jstring), None).decode('utf-8'), "ababab")
+
+        # Constructors and instance methods
+        Example__init_i = java.GetMethodID(Example, b"<init>", b"(I)V")
+        obj = native.NewObject(Example, Example__init_i, b'I', [2242])
+        self.assertIsNotNone(obj)
+
+        Example__get_int_field = java.GetMethodID(Example, b"get_int_field", b"()I")
+        self.assertEqual(native.CallIntMethod(obj, Example__get_int_field, b'', []), 2242)
+
+        # Floats are passed as floats, not promoted to doubles.
+        Example__area_of_square = java.GetMethodID(Example, b"area_of_square", b"(F)F")
+        self.assertEqual(native.CallFloatMethod(obj, Example__area_of_square, b'F', [1.5]), 2.25)
+
+        # The number of arguments must match the shorty.
+        with self.assertRaises(ValueError):
+            native.CallIntMethod(obj, Example__get_int_field, b'I', [])
+
+        # A failed boolean conversion raises, and doesn't leak into the next call.
+        class Unknowable:
+            def __bool__(self):
+                raise ZeroDivisionError()
+
+        class Wrapped:
+            value = Unknowable()
+
+        Boolean = java.FindClass(b"java/lang/Boolean")
+        Boolean__toString = java.GetStaticMethodID(Boolean, b"toString", b"(Z)Ljava/lang/String;")
+        with self.assertRaises(ZeroDivisionError):
+            native.CallStaticObjectMethod(Boolean, Boolean__toString, b'Z', [Wrapped()])
+        self.assertEqual(native.CallStaticIntMethod(Example, tripler_int, b'I', [1]), 3)
+
+    def test_jvalue_invocation(self):
+        "Methods can be invoked with arguments packed in a jvalue array"
+        Example = java.FindClass(b"org/beeware/rubicon/test/Example")
+        self.assertIsNotNone(Example.value)
+
+        # Static methods
+        tripler_int = java.GetStaticMethodID(Example, b"tripler", b"(I)I")
+        self.assertIsNotNone(tripler_int.value)
+        self.assertEqual(java.CallStaticIntMethodA(Example, tripler_int, (jvalue * 1)(jvalue(i=42))), 126)
+
+        # Constructors and instance methods
+        Example__init_ii = java.GetMethodID(Example, b"<init>", b"(II)V")
+        obj = java.NewObjectA(Example, Example__init_ii, (jvalue * 2)(jvalue(i=3342), jvalue(i=3337)))
+        self.assertIsNotNone(obj.value)
+
+        Example__get_int_field = java.GetMethodID(Example, b"get_int_field", b"()I")
+        self.assertEqual(java.CallIntMethodA(obj, Example__get_int_field, None), 3337)
+
+        # Floats are passed as floats, not promoted to doubles.
+        Example__area_of_square = java.GetMethodID(Example, b"area_of_square", b"(F)F")
+        self.assertEqual(java.CallFloatMethodA(obj, Example__area_of_square, (jvalue * 1)(jvalue(f=1.5))), 2.25)
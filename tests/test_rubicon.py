@@ -1,8 +1,26 @@
+import array
+import ctypes
+import gc
 import math
+import os
+import struct
 import sys
+import tempfile
+import threading
+import time
+import weakref
 from unittest import TestCase
 
-from rubicon.java import JavaClass, JavaInterface, JavaNull, jdouble, jfloat, jstring, jlong, jshort, jint
+from rubicon.java import (
+    JavaArray, JavaClass, JavaInterface, JavaNull, JavaString, MetadataCache, ResolutionTrace, SelectionCache,
+    StringCache, UnknownClassException,
+    array_return_type, buffer_view, classpath_fingerprint, conversion_plan, direct_buffer, flush_global_refs,
+    java, local_frame, map_file, native, preload, release_proxies, replay, scope, selection_key, set_array_return_type,
+    set_metadata_cache, set_resolution_trace, set_string_cache, set_string_return_type, string_return_type,
+    typed_buffer, pack_strings, unpack_strings,
+    jdouble, jfloat, jstring, jlong, jshort, jint,
+)
+from rubicon.java.api import _class_alternates, _proxy_cache
 
 
 class JNITest(TestCase):
@@ -226,6 +244,59 @@ class JNITest(TestCase):
         with self.assertRaises(ValueError):
             obj1.doubler(1.234)
 
+    def test_conversion_plan(self):
+        "Each polymorph has a conversion plan compiled when it is registered"
+        plan = conversion_plan(b'ILjava/lang/String;[Z[[ILjava/lang/Object;', b'Ljava/lang/String;')
+        self.assertEqual(plan['return_signature'], b'Ljava/lang/String;')
+        self.assertEqual(plan['shorty'], b'ILLLL')
+        self.assertEqual(len(plan['converters']), 5)
+        self.assertIsNotNone(plan['return_converter'])
+
+        # Primitive return values don't need to be converted.
+        self.assertIsNone(conversion_plan(b'', b'I')['return_converter'])
+
+        # The plan is used to invoke the polymorph.
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        obj1 = Example()
+        self.assertEqual(obj1.doubler(42), 84)
+        plan = obj1.doubler.method._polymorphs[b'I']
+        self.assertEqual(plan['shorty'], b'I')
+        self.assertEqual(len(plan['converters']), 1)
+
+    def test_polymorph_selection_cache(self):
+        "Polymorph selections are cached based on the types of the arguments"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        obj1 = Example()
+        cache = obj1.doubler.method._selection_cache
+        cache.clear()
+        hits, misses = cache.hits, cache.misses
+
+        self.assertEqual(obj1.doubler(42), 84)
+        self.assertEqual(obj1.doubler(21), 42)
+        self.assertEqual(obj1.doubler("wibble"), "wibblewibble")
+        self.assertEqual(obj1.doubler("foo"), "foofoo")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits - hits, 2)
+        self.assertEqual(cache.misses - misses, 2)
+
+        # Failed selections aren't cached.
+        with self.assertRaises(ValueError):
+            obj1.doubler(1.234)
+        self.assertEqual(len(cache), 2)
+
+        # Selections involving heterogenous lists can't be cached.
+        self.assertIsNone(selection_key([[1, 2.0]]))
+        self.assertEqual(selection_key([[1, 2], JavaNull(b'I')]), ((list, int), b'I'))
+
+        # The cache is bounded.
+        cache = SelectionCache(maxsize=1)
+        polymorphs = {b'I': 'int', b'Ljava/lang/String;': 'string'}
+        self.assertEqual(cache.select(polymorphs, [1]), ((b'I',), 'int'))
+        self.assertEqual(cache.select(polymorphs, ["foo"])[1], 'string')
+        self.assertEqual(cache.select(polymorphs, ["foo"])[1], 'string')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
     def test_byte_array_arg(self):
         "Bytestrings can be used as arguments (as byte arrays)"
         Example = JavaClass('org/beeware/rubicon/test/Example')
@@ -262,12 +333,236 @@ class JNITest(TestCase):
         obj1 = Example()
         self.assertEqual(obj1.doubler([True, False]), [True, True, False, False])
 
+    def test_array_return_type(self):
+        "Primitive arrays can be returned as buffers"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        obj1 = Example()
+
+        with array_return_type('array'):
+            result = obj1.doubler(array.array('i', [1, 2]))
+            self.assertEqual(result, array.array('i', [1, 1, 2, 2]))
+            self.assertEqual(obj1.doubler(array.array('d', [1.5])), array.array('d', [1.5, 1.5]))
+            self.assertEqual(obj1.doubler(b'ab'), array.array('b', b'aabb'))
+
+        with array_return_type('bytearray'):
+            self.assertEqual(obj1.doubler(b'ab'), bytearray(b'aabb'))
+            self.assertEqual(obj1.doubler([True, False]), bytearray([1, 1, 0, 0]))
+
+        with array_return_type('memoryview'):
+            result = obj1.doubler([jlong(1), jlong(2)])
+            self.assertEqual(result.format, 'q')
+            self.assertEqual(result.tolist(), [1, 1, 2, 2])
+            self.assertEqual(obj1.doubler([True]).tolist(), [True, True])
+            self.assertEqual(obj1.doubler(array.array('i')).tolist(), [])
+
+            # Settings are nested, and restored on exit.
+            with array_return_type('list'):
+                self.assertEqual(obj1.doubler([1, 2]), [1, 1, 2, 2])
+            self.assertEqual(obj1.doubler([1]).tolist(), [1, 1])
+
+        self.assertEqual(obj1.doubler([1, 2]), [1, 1, 2, 2])
+        self.assertEqual(obj1.doubler(b'ab'), b'aabb')
+
+        # The setting can also be changed globally.
+        previous = set_array_return_type('array')
+        try:
+            self.assertEqual(previous, 'list')
+            self.assertEqual(obj1.doubler([1.5]), array.array('d', [1.5, 1.5]))
+        finally:
+            set_array_return_type(previous)
+
+        with self.assertRaises(ValueError):
+            set_array_return_type('tuple')
+
+    def test_java_array(self):
+        "Arrays can be returned as JavaArrays, which retrieve items on demand"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        obj1 = Example()
+
+        with array_return_type('JavaArray'):
+            ints = obj1.doubler(list(range(3000)))
+            strings = obj1.doubler(["one", "two"])
+            things = obj1.doubler([Thing('This is one', 1), Thing('This is two', 2)])
+            empty = obj1.doubler(array.array('d'))
+
+        self.assertIsInstance(ints, JavaArray)
+        self.assertEqual(len(ints), 6000)
+        self.assertEqual(ints[0], 0)
+        self.assertEqual(ints[5999], 2999)
+        self.assertEqual(ints[-1], 2999)
+        self.assertEqual(ints[10:14], [5, 5, 6, 6])
+        self.assertEqual(ints[14:10:-2], [7, 6])
+        self.assertEqual(ints[5998:7000], [2999, 2999])
+        self.assertEqual(list(ints), [i // 2 for i in range(6000)])
+        with self.assertRaises(IndexError):
+            ints[6000]
+
+        ints[0] = 42
+        ints[1:3] = [43, 44]
+        ints[3:9:2] = [1, 2, 3]
+        self.assertEqual(ints[:9], [42, 43, 44, 1, 2, 2, 3, 3, 4])
+        with self.assertRaises(ValueError):
+            ints[0:2] = [1]
+
+        self.assertEqual(strings[1], "one")
+        strings[2] = "three"
+        self.assertEqual(list(strings), ["one", "one", "three", "two"])
+
+        self.assertEqual([thing.currentCount() for thing in things], [1, 1, 2, 2])
+        things[0] = things[3]
+        self.assertEqual(things[0].currentCount(), 2)
+
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty), [])
+
+        # JavaArrays can be passed back to Java without being copied.
+        self.assertEqual(obj1.doubler(ints)[:4], [42, 42, 43, 43])
+        self.assertEqual(obj1.doubler(strings)[:2], ["one", "one"])
+
+    def test_direct_buffer(self):
+        "Python buffers and direct Java buffers can share memory"
+        ByteBuffer = JavaClass('java/nio/ByteBuffer')
+
+        data = bytearray(16)
+        buf = direct_buffer(data)
+        self.assertTrue(buf.isDirect())
+        self.assertEqual(buf.capacity(), 16)
+
+        # Writes made by Java are visible in Python...
+        buf.putInt(0, 0x01020304)
+        self.assertEqual(data[:4], b'\x01\x02\x03\x04')
+
+        # ... and writes made by Python are visible in Java.
+        data[4] = 42
+        self.assertEqual(buf.get(4), 42)
+
+        # The memory is still shared when viewed from either side.
+        view = buffer_view(buf)
+        self.assertEqual(len(view), 16)
+        view[5] = 7
+        self.assertEqual(data[5], 7)
+
+        # Memory allocated by Java can be viewed from Python.
+        allocated = ByteBuffer.allocateDirect(8)
+        view = buffer_view(allocated)
+        del allocated
+        gc.collect()
+        view[0:2] = b'\x00\x2a'
+        self.assertEqual(view.obj._owner.getShort(0), 42)
+
+        with self.assertRaises(ValueError):
+            buffer_view(ByteBuffer.allocate(8))
+
+        with self.assertRaises(TypeError):
+            direct_buffer(b'read only')
+
+    def test_direct_buffer_lifetime(self):
+        "The memory of a direct buffer is retained while Java can reach the buffer"
+        System = JavaClass('java/lang/System')
+
+        data = bytearray(16)
+        buf = direct_buffer(data)
+        buf.putInt(0, 42)
+
+        # Java returns the same buffer through a different wrapper.
+        duplicate = buf.duplicate()
+        del buf
+        gc.collect()
+        flush_global_refs()
+        System.gc()
+        release_proxies()
+
+        # The original wrapper has gone, but the memory is still exported.
+        with self.assertRaises(BufferError):
+            data.extend(b'x')
+        self.assertEqual(duplicate.getInt(0), 42)
+
+        # Once Java has collected the buffer, the memory is released.
+        del duplicate
+        for attempt in range(100):
+            gc.collect()
+            flush_global_refs()
+            System.gc()
+            time.sleep(0.01)
+            release_proxies()
+            try:
+                data.extend(b'x')
+                break
+            except BufferError:
+                pass
+        self.assertEqual(len(data), 17)
+
+    def test_map_file(self):
+        "Memory mapped files can be shared with Java"
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(struct.pack('=4i', 1, 2, 3, 4))
+
+            buf = map_file(path)
+            self.assertTrue(buf.isDirect())
+            self.assertEqual(buf.capacity(), 16)
+
+            # Typed buffers use native byte order, and agree with Python views.
+            ints = typed_buffer(buf, 'int')
+            self.assertEqual(ints.capacity(), 4)
+            self.assertEqual(ints.get(2), 3)
+            ints.put(3, 42)
+            view = buffer_view(ints)
+            self.assertEqual(view.format, 'i')
+            self.assertEqual(view.tolist(), [1, 2, 3, 42])
+            view[0] = 37
+            self.assertEqual(ints.get(0), 37)
+
+            # Writes are made to the file.
+            del buf, ints, view
+            gc.collect()
+            with open(path, 'rb') as f:
+                self.assertEqual(struct.unpack('=4i', f.read()), (37, 2, 3, 42))
+
+            readonly = map_file(path, readonly=True)
+            self.assertTrue(readonly.isReadOnly())
+            self.assertEqual(typed_buffer(readonly, 'int').get(3), 42)
+            if sys.version_info >= (3, 8):
+                self.assertTrue(buffer_view(readonly).readonly)
+            del readonly
+            gc.collect()
+        finally:
+            os.remove(path)
+
+        anonymous = map_file(length=64)
+        doubles = typed_buffer(anonymous, 'double')
+        doubles.put(7, 2.5)
+        self.assertEqual(buffer_view(anonymous).cast('d')[7], 2.5)
+
+        with self.assertRaises(ValueError):
+            map_file()
+        with self.assertRaises(ValueError):
+            typed_buffer(anonymous, 'string')
+
     def test_string_array_arg(self):
         "Arrays of string can be used as arguments"
         Example = JavaClass('org/beeware/rubicon/test/Example')
         obj1 = Example()
         self.assertEqual(obj1.doubler(["one", "two"]), ["one", "one", "two", "two"])
 
+    def test_packed_string_array(self):
+        "Arrays of strings are transferred in bulk"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        obj1 = Example()
+
+        values = ["", "one", None, "caf\u00e9", "\U0001F600", "x" * 70000]
+        ref = pack_strings(values)
+        try:
+            self.assertEqual(java.GetArrayLength(ref), len(values))
+            self.assertEqual(unpack_strings(ref), values)
+        finally:
+            java.DeleteLocalRef(ref)
+
+        strings = ["item %d" % i for i in range(5000)]
+        self.assertEqual(obj1.doubler(strings), [item for item in strings for i in range(2)])
+
     def test_object_array_arg(self):
         "Arrays of object can be used as arguments"
         Example = JavaClass('org/beeware/rubicon/test/Example')
@@ -282,6 +577,214 @@ class JNITest(TestCase):
             [str(obj) for obj in [thing1, thing1, thing2, thing2]]
         )
 
+    def test_large_object_array(self):
+        "Large arrays of objects are transferred in bulk"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        obj1 = Example()
+
+        things = [Thing('Thing %d' % i, i) for i in range(3000)]
+        doubled = obj1.doubler(things)
+        self.assertEqual(len(doubled), 6000)
+        self.assertIsInstance(doubled[0], Thing)
+        self.assertEqual([thing.currentCount() for thing in doubled[:4]], [0, 0, 1, 1])
+        self.assertEqual(doubled[5999].currentCount(), 2999)
+
+        # Each element holds its own reference, so elements outlive the list.
+        last = doubled[-1]
+        del doubled
+        gc.collect()
+        flush_global_refs()
+        self.assertEqual(last.currentCount(), 2999)
+
+        with array_return_type('JavaArray'):
+            lazy = obj1.doubler(things)
+        self.assertEqual([thing.currentCount() for thing in lazy[2000:2004]], [1000, 1000, 1001, 1001])
+        self.assertEqual(sum(1 for thing in lazy), 6000)
+
+    def test_describe(self):
+        "The public members of a class are described in a single call"
+        Python = JavaClass('org/beeware/rubicon/Python')
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        obj1 = Example()
+
+        description = Python.describe(obj1.getClass()).split('\n')
+        self.assertIn('F 1 static_int_field I', description)
+        self.assertIn('F 1 static_base_int_field I', description)
+        self.assertIn('F 0 int_field I', description)
+        self.assertIn('M 0 doubler I I', description)
+        self.assertIn('M 0 doubler [I [I', description)
+        self.assertIn('M 1 tripler I I', description)
+        self.assertIn('M 0 hashCode  I', description)
+        self.assertIn('C ', description)
+        self.assertIn('C II', description)
+
+        # Members are resolved from the description of the class.
+        obj2 = Example(3, 4)
+        self.assertEqual(obj2.base_int_field, 3)
+        self.assertEqual(obj2.int_field, 4)
+        self.assertEqual(obj2.doubler(21), 42)
+        self.assertEqual(Example.tripler(2), 6)
+        with self.assertRaises(AttributeError):
+            obj2.static_int_field
+        with self.assertRaises(AttributeError):
+            Example.int_field
+
+    def test_metadata_cache(self):
+        "Class metadata can be cached on disk"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'rubicon.cache')
+
+            cache = MetadataCache(path, fingerprint='test')
+            self.assertEqual(len(cache), 0)
+            previous = set_metadata_cache(cache)
+            try:
+                JavaClass._class_cache.pop('java/util/BitSet', None)
+                BitSet = JavaClass('java/util/BitSet')
+                bits = BitSet(16)
+                bits.set(3)
+                self.assertTrue(bits.get(3))
+                self.assertTrue(bits.equals(bits))
+            finally:
+                set_metadata_cache(previous)
+            cache.save()
+
+            # The metadata is reloaded from disk by a new cache.
+            cache = MetadataCache(path, fingerprint='test')
+            self.assertIn('java/util/BitSet', cache)
+            metadata = cache.get('java/util/BitSet')
+            self.assertEqual(metadata['alternates'][0], b'Ljava/util/BitSet;')
+            self.assertIn(b'Ljava/lang/Object;', metadata['alternates'])
+            self.assertIn('M 0 set I V', metadata['description'].split('\n'))
+
+            # Classes are wrapped using the cached metadata.
+            previous = set_metadata_cache(cache)
+            try:
+                JavaClass._class_cache.pop('java/util/BitSet', None)
+                BitSet = JavaClass('java/util/BitSet')
+                self.assertIsNotNone(BitSet.__dict__['_description'])
+                bits = BitSet(16)
+                bits.set(5)
+                self.assertTrue(bits.get(5))
+                self.assertFalse(bits.get(3))
+            finally:
+                set_metadata_cache(previous)
+            self.assertEqual(cache.hits, 2)
+
+            # Unchanged caches aren't rewritten; caches for other classes are ignored.
+            cache.save()
+            self.assertEqual(len(MetadataCache(path, fingerprint='test')), 1)
+            self.assertEqual(len(MetadataCache(path, fingerprint='other')), 0)
+            self.assertEqual(MetadataCache(path).fingerprint, classpath_fingerprint())
+
+    def test_preload(self):
+        "Classes and members can be preloaded in the background"
+        JavaClass._class_cache.pop('java/util/ArrayDeque', None)
+        future = preload(
+            ['java/util/ArrayDeque'],
+            members={
+                'java/util/ArrayDeque': ['addLast', 'size', 'missing'],
+                'java/lang/Integer': ['MAX_VALUE'],
+            },
+        )
+        ArrayDeque, Integer = future.result(timeout=10)
+        self.assertIs(ArrayDeque, JavaClass('java/util/ArrayDeque'))
+        self.assertIs(Integer, JavaClass('java/lang/Integer'))
+
+        # Constructors and the named members have been resolved.
+        self.assertNotIn(None, ArrayDeque.__dict__['_constructors'].values())
+        self.assertIsNotNone(ArrayDeque.__dict__['_members']['methods']['addLast'])
+        self.assertIsNone(ArrayDeque.__dict__['_members']['methods']['missing'])
+        self.assertIsNotNone(Integer.__dict__['_static']['fields']['MAX_VALUE'])
+
+        deque = ArrayDeque()
+        deque.addLast('first')
+        deque.addLast('second')
+        self.assertEqual(deque.size(), 2)
+        self.assertEqual(Integer.MAX_VALUE, 2147483647)
+
+        # Every class is preloaded, even if an earlier class can't be found.
+        future = preload(['org/beeware/rubicon/test/Missing', 'java/util/ArrayDeque'])
+        with self.assertRaises(UnknownClassException):
+            future.result(timeout=10)
+
+        # Preloading can race with first use; only one wrapper is created for
+        # each member, whichever thread resolves it first.
+        JavaClass._class_cache.pop('java/util/LinkedList', None)
+        LinkedList = JavaClass('java/util/LinkedList')
+        future = preload(['java/util/LinkedList'], members={'java/util/LinkedList': ['addFirst', 'size']})
+        add_first = LinkedList.__method__('addFirst')
+        future.result(timeout=10)
+        self.assertIs(LinkedList.__method__('addFirst'), add_first)
+        self.assertIs(LinkedList.__dict__['_members']['methods']['addFirst'], add_first)
+
+    def test_resolution_trace(self):
+        "The resolution of classes and members can be traced, and replayed"
+        trace = ResolutionTrace()
+        previous = set_resolution_trace(trace)
+        try:
+            JavaClass._class_cache.pop('java/util/TreeMap', None)
+            TreeMap = JavaClass('java/util/TreeMap')
+            tree = TreeMap()
+            tree.put('key', 'value')
+            self.assertEqual(tree.size(), 1)
+        finally:
+            set_resolution_trace(previous)
+
+        self.assertEqual(
+            [(entry.kind, entry.name, entry.is_static) for entry in trace if entry.descriptor == 'java/util/TreeMap'],
+            [
+                ('class', None, False),
+                ('constructors', None, False),
+                ('constructor', '', False),
+                ('field', 'put', False),
+                ('method', 'put', False),
+                ('field', 'size', False),
+                ('method', 'size', False),
+            ]
+        )
+        self.assertGreater(trace.total_time, 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'startup.trace')
+            trace.save(path)
+            loaded = ResolutionTrace.load(path)
+            self.assertEqual(
+                [entry[:4] for entry in loaded],
+                [entry[:4] for entry in trace],
+            )
+
+            # Replaying the trace resolves the same classes and members.
+            JavaClass._class_cache.pop('java/util/TreeMap', None)
+            replay(path).result(timeout=10)
+
+        TreeMap = JavaClass('java/util/TreeMap')
+        self.assertIsNotNone(TreeMap.__dict__['_constructors'][b''])
+        self.assertIsNone(TreeMap.__dict__['_members']['fields']['put'])
+        self.assertIsNotNone(TreeMap.__dict__['_members']['methods']['put'])
+        self.assertNotIn('get', TreeMap.__dict__['_members']['methods'])
+        tree = TreeMap()
+        tree.put('key', 'value')
+        self.assertEqual(tree.size(), 1)
+
+    def test_concurrent_class_creation(self):
+        "A Java class is only wrapped once, even if it is wrapped by several threads at once"
+        JavaClass._class_cache.pop('java/util/LinkedList', None)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(JavaClass('java/util/LinkedList'))
+
+        threads = [threading.Thread(target=worker) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(set(map(id, results))), 1)
+
     def test_method_null(self):
         "Null objects can be passed as arguments"
         Example = JavaClass('org/beeware/rubicon/test/Example')
@@ -553,6 +1056,33 @@ class JNITest(TestCase):
         self.assertEqual(ord(b'x'), Example.xor_all_bytes(b'x\x00'))
         self.assertEqual(0, Example.xor_all_bytes(b'xx'))
 
+    def test_pass_buffer(self):
+        """Any object supporting the buffer protocol can be passed as a Java array of the matching type."""
+        Example = JavaClass("org/beeware/rubicon/test/Example")
+        self.assertEqual(ord(b'x'), Example.xor_all_bytes(bytearray(b'x\x00')))
+        self.assertEqual(ord(b'x'), Example.xor_all_bytes(memoryview(b'yyx\x00')[2:]))
+        self.assertEqual(45, Example.sum_all_ints(array.array('i', range(10))))
+        self.assertEqual(20, Example.sum_all_ints(memoryview(array.array('i', range(10)))[::2]))
+        self.assertEqual(3, Example.sum_all_doubles(array.array('d', [1.0, 2.0])))
+        self.assertEqual(3, Example.sum_all_floats(array.array('f', [1.0, 2.0])))
+        self.assertEqual(0, Example.sum_all_ints(array.array('i')))
+
+        # Large buffers are copied in one operation.
+        self.assertEqual(0, Example.xor_all_bytes(bytes(10 * 1024 * 1024)))
+
+        # The item format of the buffer must match the array type.
+        with self.assertRaises(ValueError):
+            Example.sum_all_ints(array.array('d', [1.0, 2.0]))
+
+        # Items in the native byte order are copied as-is; items in the other
+        # byte order can't be copied, and aren't accepted.
+        native_int = ctypes.c_int32
+        swapped_int = native_int.__ctype_be__ if sys.byteorder == 'little' else native_int.__ctype_le__
+        self.assertEqual(6, Example.sum_all_ints((native_int * 3)(1, 2, 3)))
+        with self.assertRaises(ValueError):
+            Example.sum_all_ints((swapped_int * 3)(1, 2, 3))
+        self.assertEqual(6, Example.sum_all_ints(list((swapped_int * 3)(1, 2, 3))))
+
     def test_static_access_non_static(self):
         "An instance field/method cannot be accessed from the static context"
         Example = JavaClass('org/beeware/rubicon/test/Example')
@@ -581,12 +1111,124 @@ class JNITest(TestCase):
         example = Example()
         self.assertEqual(example.duplicate_string("Wagga"), "WaggaWagga")
 
+    def test_string_encoding(self):
+        "Strings of any content survive a round trip to Java."
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        String = JavaClass('java/lang/String')
+        example = Example()
+
+        for value in [
+            "",
+            "ascii",
+            "nul\0byte",
+            "caf\u00e9",
+            "\u65e5\u672c\u8a9e",
+            "emoji \U0001F600 outside the BMP",
+            "unpaired \ud800 surrogate",
+            "long " * 1000 + "\u00e9\U0001F600",
+        ]:
+            self.assertEqual(example.duplicate_string(value), value * 2)
+            self.assertEqual(example.doubler([value]), [value, value])
+
+        # Java sees a character outside the BMP as a surrogate pair.
+        self.assertEqual(String("\U0001F600").length(), 2)
+        self.assertEqual(String("\u00e9").length(), 1)
+
+    def test_string_cache(self):
+        "Short strings passed to Java can be cached"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        System = JavaClass('java/lang/System')
+        example = Example()
+
+        cache = StringCache(maxsize=2, max_length=8)
+        previous = set_string_cache(cache)
+        try:
+            self.assertIsNone(previous)
+
+            # The same Java String is used every time a cached string is passed.
+            first = System.identityHashCode("key")
+            for i in range(10):
+                self.assertEqual(System.identityHashCode("key"), first)
+                self.assertEqual(example.duplicate_string("key"), "keykey")
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(cache.hits, 20)
+            self.assertGreater(cache.hit_rate, 0.9)
+
+            # Long strings aren't cached.
+            self.assertEqual(example.duplicate_string("a long string"), "a long stringa long string")
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.misses, 1)
+
+            # When the cache is full, the least recently used string is evicted.
+            example.duplicate_string("two")
+            example.duplicate_string("key")
+            example.duplicate_string("three")
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.evictions, 1)
+            self.assertEqual(example.doubler(["key", "three"]), ["key", "key", "three", "three"])
+            self.assertEqual(cache.evictions, 1)
+
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+            flush_global_refs()
+        finally:
+            set_string_cache(previous)
+
+        self.assertEqual(example.duplicate_string("key"), "keykey")
+        self.assertEqual(cache.misses, 3)
+
     def test_string_return(self):
         "If a method or field returns a string, you get a Python string back"
         Example = JavaClass('org/beeware/rubicon/test/Example')
         example = Example()
         self.assertEqual(example.toString(), "This is a Java Example object")
 
+    def test_java_string(self):
+        "Strings can be returned as JavaStrings, which are decoded on demand"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        System = JavaClass('java/lang/System')
+        example = Example()
+
+        with string_return_type('JavaString'):
+            value = example.duplicate_string("Wagga")
+            label = example.toString()
+            doubled = example.doubler("caf\u00e9 \U0001F600")
+        # Outside the block, strings are returned as str.
+        self.assertIsInstance(example.toString(), str)
+
+        self.assertIsInstance(value, JavaString)
+        self.assertIsNone(value._value)
+        self.assertEqual(value, "WaggaWagga")
+        self.assertEqual(str(label), "This is a Java Example object")
+        self.assertEqual(str(doubled), "caf\u00e9 \U0001F600caf\u00e9 \U0001F600")
+        self.assertEqual(len(value), 10)
+        self.assertEqual({value: 1}["WaggaWagga"], 1)
+        self.assertNotEqual(value, label)
+
+        # A JavaString is passed back to Java by reference, without being re-encoded.
+        ref = value.__jni__.value
+        self.assertEqual(System.identityHashCode(value), System.identityHashCode(value))
+        self.assertEqual(example.duplicate_string(value), "WaggaWaggaWaggaWagga")
+        self.assertEqual(example.doubler([value, "x"]), ["WaggaWagga", "WaggaWagga", "x", "x"])
+        self.assertEqual(value.__jni__.value, ref)
+
+        # JavaStrings can be created from Python strings.
+        key = JavaString("key")
+        self.assertEqual(key, "key")
+        self.assertEqual(key, JavaString(key.__jni__))
+        self.assertEqual(example.duplicate_string(key), "keykey")
+
+        previous = set_string_return_type('JavaString')
+        try:
+            self.assertEqual(previous, 'str')
+            self.assertIsInstance(example.toString(), JavaString)
+        finally:
+            set_string_return_type(previous)
+
+        with self.assertRaises(ValueError):
+            set_string_return_type('bytes')
+
     def test_float_method(self):
         "A method with a float arguments can be handled."
         Example = JavaClass('org/beeware/rubicon/test/Example')
@@ -623,6 +1265,134 @@ class JNITest(TestCase):
         the_thing = example.get_thing()
         self.assertEqual(the_thing.toString(), "This is thing 2")
 
+    def test_local_frame(self):
+        "Local references can be released in bulk using a local frame"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        example = Example()
+
+        with local_frame(10):
+            for i in range(100):
+                java.NewStringUTF(b"Hello")
+            example.set_thing(Thing('This is thing', 2))
+            the_thing = example.get_thing()
+            cast_thing = Thing.__cast__(the_thing)
+
+        # Objects returned inside the frame remain valid after it has been popped.
+        self.assertEqual(the_thing.toString(), "This is thing 2")
+        self.assertEqual(cast_thing.currentCount(), 2)
+
+        # A cast holds its own reference to the object.
+        del the_thing
+        self.assertEqual(cast_thing.currentCount(), 2)
+
+    def test_release_global_refs(self):
+        "Global references are released when instances are garbage collected"
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        WeakReference = JavaClass('java/lang/ref/WeakReference')
+        System = JavaClass('java/lang/System')
+
+        thing = Thing('This is thing', 2)
+        weak = WeakReference(thing)
+        self.assertEqual(weak.get().toString(), "This is thing 2")
+
+        # Once the Python instance is gone, and its reference has been
+        # released, Java is free to collect the object.
+        del thing
+        flush_global_refs()
+        System.gc()
+        self.assertIsInstance(weak.get(), JavaNull)
+
+        # References released in a batch are deleted together.
+        things = [Thing('This is thing', i) for i in range(100)]
+        flush_global_refs()
+        del things
+        self.assertLessEqual(flush_global_refs(), 100)
+        self.assertEqual(flush_global_refs(), 0)
+
+    def test_scope(self):
+        "Global references created in a scope are released when it exits"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        WeakReference = JavaClass('java/lang/ref/WeakReference')
+        System = JavaClass('java/lang/System')
+
+        example = Example()
+        example.set_thing(Thing('This is thing', 1))
+
+        with scope() as outer:
+            discarded = Thing('This is thing', 2)
+            weak = outer.promote(WeakReference(discarded))
+
+            with scope() as inner:
+                thing = inner.promote(Thing('This is thing', 3))
+                returned = example.get_thing()
+                self.assertEqual(returned.toString(), "This is thing 1")
+
+            # The returned object was released; the promoted object
+            # now belongs to the outer scope.
+            self.assertIsNone(returned.__jni__.value)
+            self.assertEqual(thing.toString(), "This is thing 3")
+
+            kept = outer.promote(Thing('This is thing', 4))
+
+        # Objects in the scope have been released, even though Python
+        # still holds the wrappers.
+        self.assertIsNone(thing.__jni__.value)
+        System.gc()
+        self.assertIsInstance(weak.get(), JavaNull)
+        del discarded
+
+        # Promoted objects outlive the scope.
+        self.assertEqual(kept.toString(), "This is thing 4")
+        self.assertEqual(example.get_thing().toString(), "This is thing 1")
+
+    def test_method_map(self):
+        "A method can be invoked on many instances at once"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        ICallback = JavaInterface('org/beeware/rubicon/test/ICallback')
+
+        things = [Thing('This is thing', i) for i in range(10)]
+        self.assertEqual(Thing.__method__('currentCount').map(things), list(range(10)))
+        self.assertEqual(
+            Thing.__method__('toString').map(things[:3]),
+            ["This is thing 0", "This is thing 1", "This is thing 2"],
+        )
+        self.assertEqual(Thing.__method__('currentCount').map([]), [])
+
+        # Objects are returned as instances; arguments are passed to every call.
+        examples = [Example() for i in range(3)]
+        for example, thing in zip(examples, things):
+            example.set_thing(thing)
+        examples.append(Example())
+
+        results = Example.__method__('get_thing').map(examples)
+        self.assertEqual([thing.currentCount() for thing in results[:3]], [0, 1, 2])
+        self.assertIsInstance(results[3], JavaNull)
+
+        self.assertEqual(
+            Example.__method__('combiner').map(examples[:2], 3, "Pork", things[1], JavaNull(ICallback), [1, 2]),
+            ["3::Pork::This is thing 1::<no callback>::There are 2 values"] * 2,
+        )
+
+        # The unbound method can also be invoked on a single instance.
+        self.assertEqual(Thing.__method__('currentCount')(things[4]), 4)
+
+        with self.assertRaises(AttributeError):
+            Thing.__method__('not_a_method')
+
+        with self.assertRaises(ValueError):
+            Thing.__method__('currentCount').map(things, 1)
+
+        # A Java exception raised by one of the invocations is reported.
+        if native is not None:
+            ArrayList = JavaClass('java/util/ArrayList')
+            lists = [ArrayList(), ArrayList()]
+            lists[0].add('first')
+            with self.assertRaisesRegex(RuntimeError, 'item 1: java.lang.IndexOutOfBoundsException'):
+                ArrayList.__method__('get').map(lists, 0)
+
     def test_interface(self):
         "An Java interface can be defined in Python and proxied."
         ICallback = JavaInterface('org/beeware/rubicon/test/ICallback')
@@ -663,6 +1433,75 @@ class JNITest(TestCase):
         self.assertEqual(results['string'], 'This is a Java Example object')
         self.assertEqual(results['int'], 47)
 
+    def test_interface_lifetime(self):
+        "A Python proxy is kept alive for exactly as long as Java uses it."
+        ICallback = JavaInterface('org/beeware/rubicon/test/ICallback')
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        Thing = JavaClass('org/beeware/rubicon/test/Thing')
+        System = JavaClass('java/lang/System')
+
+        results = {}
+
+        class MyInterface(ICallback):
+            def poke(self, example, value):
+                results['int'] = value
+
+            def peek(self, example, value):
+                results['int'] = value
+
+        def collect(*refs):
+            # Java records collected proxies on a background thread; give it a
+            # chance to run, then release the proxied objects.
+            for attempt in range(100):
+                System.gc()
+                time.sleep(0.01)
+                release_proxies()
+                if all(ref() is None for ref in refs):
+                    break
+
+        example = Example()
+        handler = MyInterface()
+        handler_ref = weakref.ref(handler)
+
+        # Java holds the proxy, so the handler survives without a Python reference.
+        example.set_callback(handler)
+        del handler
+        gc.collect()
+        System.gc()
+        example.test_poke(37)
+        self.assertEqual(results['int'], 37)
+
+        # Once Java releases the proxy, so does Python.
+        example.set_callback(JavaNull(ICallback))
+        collect(handler_ref)
+        self.assertIsNone(handler_ref())
+
+        # Short-lived proxies don't accumulate.
+        listeners = [MyInterface() for i in range(100)]
+        for listener in listeners:
+            example.combiner(3, "Pork", JavaNull(Thing), listener, [1, 2])
+        listener_refs = [weakref.ref(listener) for listener in listeners]
+        del listeners, listener
+        collect(*listener_refs)
+        self.assertTrue(all(ref() is None for ref in listener_refs))
+
+        # A proxy that Java has released can be used again.
+        handler = MyInterface()
+        example.combiner(3, "Pork", JavaNull(Thing), handler, [1, 2])
+        token = handler._token
+        for attempt in range(100):
+            System.gc()
+            time.sleep(0.01)
+            release_proxies()
+            if token not in _proxy_cache:
+                break
+        self.assertNotIn(token, _proxy_cache)
+
+        example.set_callback(handler)
+        self.assertNotEqual(handler._token, token)
+        example.test_peek(42)
+        self.assertEqual(results['int'], 42)
+
     def test_interface_int_return(self):
         """A Java interface with an int-returning method can be defined in Python and proxied,
         including return value."""
@@ -722,7 +1561,7 @@ class JNITest(TestCase):
         Example = JavaClass('org/beeware/rubicon/test/Example')
 
         self.assertEqual(
-            Example.__dict__['_alternates'],
+            _class_alternates(Example),
             [
                 b"Lorg/beeware/rubicon/test/Example;",
                 b"Lorg/beeware/rubicon/test/BaseExample;",
@@ -731,7 +1570,7 @@ class JNITest(TestCase):
 
         AbstractCallback = JavaClass('org/beeware/rubicon/test/AbstractCallback')
         self.assertEqual(
-            AbstractCallback.__dict__['_alternates'],
+            _class_alternates(AbstractCallback),
             [
                 b"Lorg/beeware/rubicon/test/AbstractCallback;",
                 b"Lorg/beeware/rubicon/test/ICallback;",
@@ -740,15 +1579,81 @@ class JNITest(TestCase):
 
         String = JavaClass('java/lang/String')
 
+        # Newer JDKs add interfaces to String (e.g., Constable).
+        alternates = _class_alternates(String)
         self.assertEqual(
-            String.__dict__['_alternates'],
+            alternates[:4],
             [
                 b"Ljava/lang/String;",
                 b"Ljava/io/Serializable;",
                 b"Ljava/lang/Comparable;",
                 b"Ljava/lang/CharSequence;",
-                b"Ljava/lang/Object;",
             ])
+        self.assertEqual(alternates[-1], b"Ljava/lang/Object;")
+
+    def test_lazy_alternates(self):
+        "The alternates of a class are only determined when they are needed"
+        JavaClass._class_cache.pop('java/util/ArrayList', None)
+        ArrayList = JavaClass('java/util/ArrayList')
+        self.assertIsNone(ArrayList.__dict__['_alternates'])
+
+        items = ArrayList()
+        items.add('first')
+        items.add('second')
+        self.assertIsNone(ArrayList.__dict__['_alternates'])
+
+        # ArrayList implements List, which extends Collection; Collection
+        # isn't an alternate of ArrayList, but it is assignable.
+        Collections = JavaClass('java/util/Collections')
+        self.assertNotIn(b"Ljava/util/Collection;", _class_alternates(ArrayList))
+        self.assertEqual(str(Collections.max(items)), "second")
+        self.assertEqual(Collections.unmodifiableCollection(items).size(), 2)
+
+    def test_most_specific_overload(self):
+        "The most specific overload that can accept an object is selected"
+        Example = JavaClass('org/beeware/rubicon/test/Example')
+        ArrayList = JavaClass('java/util/ArrayList')
+        ArrayDeque = JavaClass('java/util/ArrayDeque')
+
+        # Object is an alternate of ArrayList, but Collection is more
+        # specific, even though it is only reachable by assignability.
+        self.assertEqual(Example.overload_kind(ArrayList()), "Collection")
+        self.assertEqual(Example.overload_kind(ArrayDeque()), "Collection")
+
+        # SQLWarning inherits Iterable from SQLException; Iterable isn't an
+        # alternate of SQLWarning, but Object is.
+        SQLWarning = JavaClass('java/sql/SQLWarning')
+        self.assertNotIn(b"Ljava/lang/Iterable;", _class_alternates(SQLWarning))
+        self.assertEqual(Example.overload_kind(SQLWarning()), "Iterable")
+
+        # Other objects use the only overload that accepts them.
+        self.assertEqual(Example.overload_kind(Example()), "Object")
+
+    def test_threads(self):
+        "Java can be used from Python threads"
+        results = {}
+
+        def work(n):
+            try:
+                Example = JavaClass('org/beeware/rubicon/test/Example')
+                for i in range(100):
+                    obj = Example(n, i)
+                    assert obj.get_base_int_field() == n
+                    assert obj.get_int_field() == i
+                Stack = JavaClass('java/util/Stack')
+                stack = Stack()
+                stack.push("Hello %s" % n)
+                results[n] = stack.pop().toString()
+            except Exception as e:
+                results[n] = e
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {n: "Hello %s" % n for n in range(4)})
 
     def test_inner(self):
         "Inner classes can be accessed"